@@ -0,0 +1,72 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Any, Callable, List, Optional
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def bench(name: str, fn: Callable[..., object], repeat: int = 5, setup: Optional[Callable[[], Any]] = None, **params) -> dict:
+    """
+    Run `fn` `repeat` times and return the best wall time in seconds.
+    With `setup`, each run calls `fn(setup())`, and only `fn` is timed.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return {"name": name, "best_s": min(timings), "mean_s": sum(timings) / len(timings), **params}
+
+
+def report(results: List[dict]) -> None:
+    for result in results:
+        extra = ", ".join(
+            f"{key}={value}" for key, value in result.items()
+            if key not in ("name", "best_s", "mean_s")
+        )
+        print(f"{result['name']:<40} best {result['best_s'] * 1000:10.3f} ms   mean {result['mean_s'] * 1000:10.3f} ms   {extra}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_json(results: List[dict], filename: str, **params) -> None:
+    """Save `results` with the commit and interpreter they were measured on, for `compare`."""
+    document = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    with open(filename, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def compare(results: List[dict], baseline_file: str, threshold: float = 0.1) -> List[str]:
+    """Benchmarks whose best time is more than `threshold` slower than in `baseline_file`, described."""
+    with open(baseline_file) as file:
+        baseline = {result["name"]: result for result in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if before and before["best_s"] > 0 and result["best_s"] > before["best_s"] * (1 + threshold):
+            regressions.append(
+                f"{result['name']}: {before['best_s'] * 1000:.3f} ms -> {result['best_s'] * 1000:.3f} ms "
+                f"(+{(result['best_s'] / before['best_s'] - 1) * 100:.0f}%)"
+            )
+    return regressions
@@ -0,0 +1,226 @@
+"""
+Headless benchmarks of the drawing pipeline: StrokeManager, every pen and
+the export code, on offscreen cairo surfaces (no display needed).
+
+Synthetic strokes are smooth random walks; each scenario mirrors what
+MainWindow does for it:
+
+- draw:       fingers draw strokes at once, frame by frame; incremental pens
+              draw onto the tiled cache, translucent ones onto a layer per
+              stroke, temporary ones are redrawn every frame, and damage is
+              repainted when strokes end
+- rebuild:    repaint the whole cache from the completed strokes
+- eraser:     object eraser sweeps across a full page, repainting the damage
+- undo/redo:  undo then redo a run of strokes, repainting after each step
+- export:     SVG, and PNG at 1x, 4x and 8x
+
+    python benchmarks/drawing_suite.py [--strokes 200] [--points 200] [--fingers 2]
+                                       [--output results.json] [--compare baseline.json]
+
+With --compare, exits with status 1 if any benchmark got slower than the
+baseline by more than --threshold.
+"""
+import os
+import sys
+import math
+import random
+import argparse
+import tempfile
+
+import cairo
+
+import common  # noqa: F401  (sets up sys.path)
+from vec2 import Vec2
+from rect import Rect
+from tiles import TiledSurface
+from export import export_png, export_svg
+from drawing import CalligraphyPen, Eraser, Pen, PointerPen, StrokeManager
+
+PAGE = Vec2(1600, 1000)
+STEP = 3  # px between successive touch samples
+
+PENS = {
+    "ballpoint": Pen("ballpoint", color=(1, 0, 0, 1), width=2),
+    "highlighter": Pen("highlighter", color=(1, 1, 0, 0.3), width=18, supports_incremental_drawing=False),
+    "calligraphy": CalligraphyPen(color=(0.1, 0.15, 0.4, 1), width=10, angle=45),
+    "pointer": PointerPen(),
+}
+
+
+def random_walk(n_points: int, rng: random.Random) -> list:
+    """A smooth stroke: the heading drifts a little at each step, and turns back at the page edges."""
+    x, y = rng.uniform(0, PAGE.x), rng.uniform(0, PAGE.y)
+    heading = rng.uniform(0, 2 * math.pi)
+    points = []
+    for _ in range(n_points):
+        heading += rng.gauss(0, 0.15)
+        x += STEP * math.cos(heading)
+        y += STEP * math.sin(heading)
+        if not (0 <= x <= PAGE.x and 0 <= y <= PAGE.y):
+            heading += math.pi
+            x, y = min(max(x, 0), PAGE.x), min(max(y, 0), PAGE.y)
+        points.append(Vec2(x, y))
+    return points
+
+
+class Session:
+    """A StrokeManager with its cache canvas, repainted the way MainWindow does it."""
+
+    def __init__(self) -> None:
+        self.stroke_manager = StrokeManager()
+        self.canvas = TiledSurface(PAGE)
+        self.screen = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, *PAGE))
+
+    def rebuild_damage(self) -> None:
+        damage = self.stroke_manager.take_damage()
+        if not damage:
+            return
+        region = damage.to_pixels().intersection(Rect(0, 0, *PAGE))
+        if region.is_empty():
+            return
+        self.canvas.clear(region)
+        self.stroke_manager.draw_to_canvas(self.canvas, region=region)
+
+    def rebuild_all(self) -> None:
+        self.stroke_manager.take_damage()
+        self.canvas.clear()
+        self.stroke_manager.draw_to_canvas(self.canvas)
+
+    def paint_frame(self) -> None:
+        """
+        What on_draw and on_draw_cursors do: the cache and the layers of
+        in-progress strokes, then temporary pens and cursors.
+        """
+        self.canvas.paint(self.screen)
+        for stroke in self.stroke_manager.current_strokes.values():
+            if not stroke.pen.supports_incremental_drawing and not stroke.pen.is_temporary:
+                stroke.draw_layer(self.screen)
+        for stroke in self.stroke_manager.current_strokes.values():
+            if stroke.pen.is_temporary:
+                stroke.draw(self.screen)
+            stroke.pen.draw_cursor(self.screen, stroke.points[-1])
+
+    def draw(self, strokes: list, pen: Pen, fingers: int = 1) -> None:
+        """Draw `strokes` (lists of points), `fingers` at a time, one frame per sample."""
+        stroke_manager = self.stroke_manager
+        for first in range(0, len(strokes), fingers):
+            group = strokes[first:first + fingers]
+            for slot, points in enumerate(group):
+                stroke_manager.start_stroke(slot, points[0], pen)
+            for i in range(1, max(len(points) for points in group)):
+                for slot, points in enumerate(group):
+                    if i < len(points):
+                        stroke_manager.update_stroke(slot, points[i])
+                        stroke = stroke_manager.current_strokes[slot]
+                        if pen.supports_incremental_drawing:
+                            stroke.draw_new(self.canvas)
+                        elif not pen.is_temporary:
+                            stroke.draw_new_to_layer(PAGE)
+                if stroke_manager.require_redraw:
+                    self.rebuild_damage()
+                self.paint_frame()
+            for slot in range(len(group)):
+                stroke_manager.end_stroke(slot)
+            self.rebuild_damage()
+
+
+def make_strokes(n_strokes: int, n_points: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [random_walk(n_points, rng) for _ in range(n_strokes)]
+
+
+def make_page(strokes: list) -> Session:
+    """A session with `strokes` completed in the ballpoint pen and painted on the cache."""
+    session = Session()
+    pen = PENS["ballpoint"]
+    for points in strokes:
+        session.stroke_manager.start_stroke(0, points[0], pen)
+        for point in points[1:]:
+            session.stroke_manager.update_stroke(0, point)
+        session.stroke_manager.end_stroke(0)
+    session.rebuild_all()
+    return session
+
+
+def eraser_sweep(rows: int) -> list:
+    """Back-and-forth rows over the whole page."""
+    points = []
+    for row in range(rows):
+        y = (row + 0.5) * PAGE.y / rows
+        xs = range(0, int(PAGE.x), STEP * 2)
+        points.extend(Vec2(x, y) for x in (xs if row % 2 == 0 else reversed(xs)))
+    return points
+
+
+def run(n_strokes: int, n_points: int, fingers: int, repeat: int, seed: int = 0) -> list:
+    strokes = make_strokes(n_strokes, n_points, seed)
+    params = dict(strokes=n_strokes, points=n_points)
+    results = []
+
+    for name, pen in PENS.items():
+        results.append(common.bench(
+            f"draw, {name}", lambda session: session.draw(strokes, pen, fingers),
+            repeat=repeat, setup=Session, fingers=fingers, **params,
+        ))
+
+    results.append(common.bench(
+        "full rebuild", Session.rebuild_all,
+        repeat=repeat, setup=lambda: make_page(strokes), **params,
+    ))
+
+    sweep = [eraser_sweep(rows=8)]
+    results.append(common.bench(
+        "eraser sweep", lambda session: session.draw(sweep, Eraser()),
+        repeat=repeat, setup=lambda: make_page(strokes), samples=len(sweep[0]), **params,
+    ))
+
+    def undo_redo_storm(session: Session) -> None:
+        stroke_manager = session.stroke_manager
+        for step in (stroke_manager.undo, stroke_manager.redo):
+            for _ in range(n_strokes):
+                step()
+                session.rebuild_damage()
+
+    results.append(common.bench(
+        "undo/redo storm", undo_redo_storm,
+        repeat=repeat, setup=lambda: make_page(strokes), **params,
+    ))
+
+    page = make_page(strokes)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "export")
+
+        def export(fn, *args) -> None:
+            fn(page.stroke_manager, filename, PAGE, *args)
+
+        results.append(common.bench("export svg", lambda: export(export_svg), repeat=repeat, **params))
+        results[-1]["bytes"] = os.path.getsize(filename)
+        for scale in (1, 4, 8):
+            results.append(common.bench(f"export png {scale}x", lambda: export(export_png, scale), repeat=repeat, **params))
+            results[-1]["bytes"] = os.path.getsize(filename)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strokes", type=int, default=200, help="strokes per page")
+    parser.add_argument("--points", type=int, default=200, help="samples per stroke")
+    parser.add_argument("--fingers", type=int, default=2, help="strokes drawn at once")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="FILE", help="save the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="JSON results of a previous run to check against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    results = run(args.strokes, args.points, args.fingers, args.repeat, args.seed)
+    common.report(results)
+    if args.output:
+        common.write_json(results, args.output, strokes=args.strokes, points=args.points,
+                          fingers=args.fingers, seed=args.seed)
+    if args.compare:
+        regressions = common.compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,95 @@
+"""
+Eraser hit-testing: linear scan over every segment vs the SegmentGrid index.
+
+Builds a page of random-walk strokes with the given total segment counts,
+then times eraser queries at random points.
+
+    python benchmarks/eraser_hit_test.py [--segments 10000 100000 1000000]
+"""
+import random
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+from vec2 import Vec2
+from drawing import Eraser, Pen, StrokeManager
+
+PAGE = Vec2(1600, 1000)
+SEGMENTS_PER_STROKE = 50
+
+
+def make_stroke_manager(n_segments: int, rng: random.Random) -> StrokeManager:
+    stroke_manager = StrokeManager()
+    pen = Pen("bench")
+    for _ in range(n_segments // SEGMENTS_PER_STROKE):
+        x, y = rng.uniform(0, PAGE.x), rng.uniform(0, PAGE.y)
+        stroke_manager.start_stroke(0, Vec2(x, y), pen)
+        for _ in range(SEGMENTS_PER_STROKE):
+            x += rng.uniform(3, 6) * rng.choice((-1, 1))
+            y += rng.uniform(3, 6) * rng.choice((-1, 1))
+            stroke_manager.update_stroke(0, Vec2(x, y))
+        stroke_manager.end_stroke(0)
+    return stroke_manager
+
+
+def linear_first_hit(eraser: Eraser, stroke_manager: StrokeManager, point: Vec2):
+    for stroke in stroke_manager.completed_strokes:
+        if eraser.intersects_stroke(stroke, point):
+            return stroke
+    return None
+
+
+def grid_first_hit(eraser: Eraser, stroke_manager: StrokeManager, point: Vec2):
+    hits = stroke_manager.segment_index.query(point, eraser.width / 2)
+    if not hits:
+        return None
+    return min(hits, key=lambda stroke: stroke.sequence)
+
+
+def per_query(result: dict) -> dict:
+    result["per_query_us"] = round(result["best_s"] / result["queries"] * 1e6, 1)
+    return result
+
+
+def run(segment_counts, queries: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    eraser = Eraser()
+    results = []
+    for n_segments in segment_counts:
+        stroke_manager = None
+
+        def build():
+            nonlocal stroke_manager
+            stroke_manager = make_stroke_manager(n_segments, rng)
+
+        results.append(common.bench(f"build + index {n_segments} segments", build, repeat=1, segments=n_segments))
+
+        points = [Vec2(rng.uniform(0, PAGE.x), rng.uniform(0, PAGE.y)) for _ in range(queries)]
+        # The linear scan is O(total segments); keep its query count sane on big pages
+        linear_points = points[:max(1, queries * 1_000 // n_segments)]
+
+        results.append(per_query(common.bench(
+            f"linear scan, {n_segments} segments",
+            lambda: [linear_first_hit(eraser, stroke_manager, p) for p in linear_points],
+            repeat=3, segments=n_segments, queries=len(linear_points),
+        )))
+        results.append(per_query(common.bench(
+            f"grid query, {n_segments} segments",
+            lambda: [grid_first_hit(eraser, stroke_manager, p) for p in points],
+            repeat=3, segments=n_segments, queries=len(points),
+        )))
+
+        mismatches = sum(
+            linear_first_hit(eraser, stroke_manager, p) is not grid_first_hit(eraser, stroke_manager, p)
+            for p in linear_points
+        )
+        assert mismatches == 0, f"grid and linear scan disagree on {mismatches} queries"
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    common.report(run(args.segments, args.queries))
@@ -0,0 +1,105 @@
+"""
+Stroke point storage: the former list of Vec2 vs the array-backed PointBuffer.
+
+Builds sessions of the given total point counts, reporting the memory taken
+by the points (via tracemalloc) and the time to append them (with the jitter
+check Stroke.add_point does), walk all of them, and read the new tail the
+way incremental drawing does.
+
+    python benchmarks/point_storage.py [--points 100000 1000000]
+"""
+import math
+import random
+import argparse
+import tracemalloc
+
+import common  # noqa: F401  (sets up sys.path)
+from vec2 import Vec2
+from points import PointBuffer
+
+TAIL = 4  # points drawn per incremental update
+
+
+def random_walk(n: int, rng: random.Random) -> list:
+    x, y = 800.0, 500.0
+    samples = []
+    for _ in range(n):
+        x += rng.uniform(2.5, 6) * rng.choice((-1, 1))
+        y += rng.uniform(2.5, 6) * rng.choice((-1, 1))
+        samples.append((x, y))
+    return samples
+
+
+def build_list(samples) -> list:
+    points = []
+    for x, y in samples:
+        point = Vec2(x, y)
+        if not points or points[-1].distance_to(point) > 2:
+            points.append(point)
+    return points
+
+
+def build_buffer(samples) -> PointBuffer:
+    points = PointBuffer()
+    data = points.data
+    for x, y in samples:
+        if not data or math.hypot(x - data[-2], y - data[-1]) > 2:
+            points.append(x, y)
+    return points
+
+
+def walk_list(points) -> float:
+    return sum(p.x + p.y for p in points)
+
+
+def walk_buffer(points: PointBuffer) -> float:
+    return sum(x + y for x, y in points.coords())
+
+
+def tails_list(points) -> None:
+    for end in range(TAIL, len(points), TAIL * 256):
+        for p in points[end - TAIL:end]:
+            p.x, p.y
+
+
+def tails_buffer(points: PointBuffer) -> None:
+    for end in range(TAIL, len(points), TAIL * 256):
+        for _ in points[end - TAIL:end].coords():
+            pass
+
+
+def measure_memory(build, samples) -> int:
+    tracemalloc.start()
+    points = build(samples)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del points
+    return size
+
+
+def run(point_counts, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    results = []
+    for n in point_counts:
+        samples = random_walk(n, rng)
+        for label, build, walk, tails in (
+            ("list[Vec2]", build_list, walk_list, tails_list),
+            ("PointBuffer", build_buffer, walk_buffer, tails_buffer),
+        ):
+            points = build(samples)
+            memory = measure_memory(build, samples)
+            results.append(common.bench(
+                f"{label} append {n}", lambda: build(samples), repeat=3,
+                points=len(points), bytes_per_point=round(memory / len(points), 1),
+            ))
+            results.append(common.bench(f"{label} walk {n}", lambda: walk(points), repeat=3, points=len(points)))
+            results.append(common.bench(f"{label} tails {n}", lambda: tails(points), repeat=3, points=len(points)))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    common.report(run(args.points))
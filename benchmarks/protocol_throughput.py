@@ -0,0 +1,68 @@
+"""
+Throughput of the reader <-> GUI wire protocol, JSON vs binary.
+
+Encodes synthetic touch frames the way `reader.py` does and decodes them
+the way `TouchpadReaderThread` does, through an in-memory stream.
+
+    python benchmarks/protocol_throughput.py [--frames N] [--fingers F] [--delta]
+
+With --delta, frames are sent as touch deltas (see `reader.py --delta`).
+"""
+import io
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+from touchpad.protocol import CODECS, diff_slots, get_codec
+
+
+def make_frames(n_frames: int, n_fingers: int) -> list:
+    return [
+        {
+            slot: {'id': 100 + slot, 'x': 1200 + (i * 7 + slot * 131) % 2000, 'y': 800 + (i * 3 + slot * 57) % 1400}
+            for slot in range(n_fingers)
+        }
+        for i in range(n_frames)
+    ]
+
+
+def to_deltas(frames: list) -> list:
+    sent = {}
+    changes = (diff_slots(fingers, sent, set(sent) | set(fingers)) for fingers in frames)
+    return [change for change in changes if change]
+
+
+def run(n_frames: int, n_fingers: int, delta: bool = False) -> list:
+    frames = make_frames(n_frames, n_fingers)
+    event_name = "touch_update"
+    if delta:
+        frames = to_deltas(frames)
+        event_name = "touch_delta"
+    results = []
+    for name in CODECS:
+        codec = get_codec(name)
+        encoded = [None]
+
+        def encode():
+            encoded[0] = codec.preamble() + b"".join(
+                codec.encode({"event": event_name, "data": fingers}) for fingers in frames
+            )
+
+        def decode():
+            for _ in codec.iter_events(io.BufferedReader(io.BytesIO(encoded[0]))):
+                pass
+
+        encode()
+        results.append(common.bench(f"{name}: encode", encode, frames=n_frames, fingers=n_fingers,
+                                    bytes_per_frame=round(len(encoded[0]) / n_frames, 1), delta=delta))
+        results.append(common.bench(f"{name}: decode", decode, frames=n_frames, fingers=n_fingers))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=50_000)
+    parser.add_argument("--fingers", type=int, default=3)
+    parser.add_argument("--delta", action="store_true")
+    args = parser.parse_args()
+
+    common.report(run(args.frames, args.fingers, args.delta))
@@ -0,0 +1,105 @@
+"""
+Frame times of the two ink renderers: the cairo draw function (the cache
+canvas painted into a cairo node every frame) against render nodes from
+ink_view.py (tiles uploaded as textures once, then reused).
+
+A frame mirrors a touch frame: the strokes in progress get a new point,
+drawn onto the cache or their layer, then the ink is rendered offscreen by
+a GSK renderer.
+
+    python benchmarks/render_backends.py [--strokes 200] [--frames 300] [--renderer cairo|gl|ngl|vulkan]
+
+Needs a display for the GL renderers; headless, run it under e.g.
+`xvfb-run` with Mesa's llvmpipe (LIBGL_ALWAYS_SOFTWARE=1).
+"""
+import random
+import argparse
+
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Gsk', '4.0')
+from gi.repository import Gdk, Gsk, Gtk
+
+import common  # noqa: F401  (sets up sys.path)
+from rect import Rect
+from ink_view import TextureCache, graphene_rect, snapshot_ink
+from drawing_suite import PAGE, PENS, Session, make_page, make_strokes, random_walk
+
+RENDERERS = {
+    "cairo": lambda: Gsk.CairoRenderer.new(),
+    "gl": lambda: Gsk.GLRenderer.new(),
+    "ngl": lambda: Gsk.NglRenderer.new(),
+    "vulkan": lambda: Gsk.VulkanRenderer.new(),
+}
+
+
+def make_renderer(name: str) -> Gsk.Renderer:
+    renderer = RENDERERS[name]()
+    display = Gdk.Display.get_default()
+    if display is not None and hasattr(renderer, "realize_for_display"):
+        renderer.realize_for_display(display)
+    else:
+        renderer.realize(None)
+    return renderer
+
+
+def cairo_frame(snapshot: Gtk.Snapshot, session: Session) -> None:
+    """What MainWindow.on_draw paints, into a cairo node."""
+    cr = snapshot.append_cairo(graphene_rect(Rect(0, 0, *PAGE)))
+    session.canvas.paint(cr)
+    for stroke in session.stroke_manager.current_strokes.values():
+        if not stroke.pen.supports_incremental_drawing and not stroke.pen.is_temporary:
+            stroke.draw_layer(cr)
+
+
+def gsk_frame(snapshot: Gtk.Snapshot, session: Session, textures: TextureCache) -> None:
+    """What MainWindow.on_snapshot appends: texture nodes, uploaded again only for the tiles that changed."""
+    snapshot_ink(snapshot, textures, session.canvas, session.stroke_manager.current_strokes.values())
+
+
+def run(n_strokes: int, n_points: int, frames: int, renderer_name: str) -> list:
+    strokes = make_strokes(n_strokes, n_points, seed=0)
+    renderer = make_renderer(renderer_name)
+    params = dict(strokes=n_strokes, frames=frames, renderer=renderer_name)
+    results = []
+
+    for pen_name in ("ballpoint", "highlighter"):
+        pen = PENS[pen_name]
+        for backend in ("cairo", "gsk"):
+            session = make_page(strokes)
+            textures = TextureCache()
+            walk = random_walk(frames + 1, random.Random(1))
+            session.stroke_manager.start_stroke(0, walk[0], pen)
+            points = iter(walk[1:])
+
+            def frame() -> None:
+                stroke_manager = session.stroke_manager
+                stroke_manager.update_stroke(0, next(points))
+                stroke = stroke_manager.current_strokes[0]
+                if pen.supports_incremental_drawing:
+                    stroke.draw_new(session.canvas)
+                else:
+                    stroke.draw_new_to_layer(PAGE)
+                snapshot = Gtk.Snapshot.new()
+                if backend == "cairo":
+                    cairo_frame(snapshot, session)
+                else:
+                    gsk_frame(snapshot, session, textures)
+                node = snapshot.to_node()
+                if node is not None:
+                    renderer.render_texture(node, None)
+
+            results.append(common.bench(f"frame, {pen_name}, {backend}", frame, repeat=frames, **params))
+    renderer.unrealize()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strokes", type=int, default=200, help="completed strokes on the page")
+    parser.add_argument("--points", type=int, default=200, help="samples per stroke")
+    parser.add_argument("--frames", type=int, default=300, help="frames rendered per backend")
+    parser.add_argument("--renderer", choices=RENDERERS, default="cairo", help="GSK renderer the frames go through")
+    args = parser.parse_args()
+
+    common.report(run(args.strokes, args.points, args.frames, args.renderer))
@@ -0,0 +1,64 @@
+"""
+SVG export: cairo.SVGSurface (the former export path) vs the direct writer
+in svg_writer.py, in output size and time.
+
+    python benchmarks/svg_export.py [--strokes 500] [--points 200] [--precision 2] [--keep DIR]
+
+With --keep, both files are left in DIR to be compared side by side.
+"""
+import os
+import argparse
+import tempfile
+
+import cairo
+
+import common  # noqa: F401  (sets up sys.path)
+from drawing import StrokeManager
+from drawing_suite import PAGE, PENS, make_strokes
+from svg_writer import write_svg
+
+
+def run(n_strokes: int, n_points: int, precision: int, directory: str) -> list:
+    stroke_manager = StrokeManager()
+    pens = [PENS["ballpoint"], PENS["highlighter"], PENS["calligraphy"]]
+    for i, points in enumerate(make_strokes(n_strokes, n_points, seed=0)):
+        stroke_manager.start_stroke(0, points[0], pens[i % len(pens)])
+        for point in points[1:]:
+            stroke_manager.update_stroke(0, point)
+        stroke_manager.end_stroke(0)
+    cairo_file = os.path.join(directory, "cairo.svg")
+    direct_file = os.path.join(directory, "direct.svg")
+
+    def export_cairo() -> None:
+        surface = cairo.SVGSurface(cairo_file, *PAGE)
+        stroke_manager.draw(surface)
+        surface.finish()
+
+    def export_direct() -> None:
+        with open(direct_file, "w", encoding="utf-8") as file:
+            write_svg(file, stroke_manager.completed_strokes, PAGE, precision)
+
+    params = dict(strokes=n_strokes, points=n_points)
+    results = [
+        common.bench("cairo.SVGSurface", export_cairo, repeat=3, **params),
+        common.bench(f"svg_writer, precision {precision}", export_direct, repeat=3, **params),
+    ]
+    results[0]["bytes"] = os.path.getsize(cairo_file)
+    results[1]["bytes"] = os.path.getsize(direct_file)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strokes", type=int, default=500)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--precision", type=int, default=2)
+    parser.add_argument("--keep", metavar="DIR", help="leave both SVG files in DIR")
+    args = parser.parse_args()
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        common.report(run(args.strokes, args.points, args.precision, args.keep))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            common.report(run(args.strokes, args.points, args.precision, directory))
@@ -19,8 +19,8 @@
         pygobject-stubs # for autocompletion
         pycairo
         evdev
-        psutil
         setuptools
+        pytest
       ]);
       pythonPackages = python.pkgs;
 
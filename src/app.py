@@ -1,5 +1,8 @@
+import os
+import sys
 import cairo
 import copy
+import itertools
 
 import gi
 gi.require_version('Gtk', '4.0')
@@ -7,7 +10,26 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gdk, GLib, Gio
 
 from drawing import *
+from snapshots import SnapshotCache
+from tiles import TiledSurface
+from export import ExportCancelled, ExportJob, export_png, export_svg
+from document import Document
+from instrumentation import instruments
+from prediction import StrokePredictor
+from points import PointBuffer
 from touchpad.thread import TouchpadReaderThread
+from ink_view import InkView, TextureCache, graphene_rect, snapshot_ink
+
+
+RECORD_ENV = "TRACEPAD_RECORD"
+REPLAY_ENV = "TRACEPAD_REPLAY"
+REPLAY_SPEED_ENV = "TRACEPAD_REPLAY_SPEED"
+RENDERER_ENV = "TRACEPAD_RENDERER"  # one of RENDERERS, "cairo" by default
+RENDERERS = ["cairo", "gsk"]  # see set_renderer
+
+CROP_PADDING = 16  # units of blank margin kept around the ink by "Crop to content" exports
+PNG_SCALES = ["1", "2", "4", "8"]  # pixels per unit offered for PNG exports
+SNAPSHOT_STROKES_PER_IDLE = 8  # strokes drawn into a checkpoint per idle callback, so input isn't held up
 
 
 class MainWindow(Gtk.ApplicationWindow):
@@ -28,7 +50,11 @@ class MainWindow(Gtk.ApplicationWindow):
             valign=Gtk.Align.START
         )
 
-        # Only Save button (top left, with text)
+        # Open and Save buttons (top left, with text)
+        open_btn = Gtk.Button(label="Open")
+        open_btn.connect("clicked", self.on_open_clicked)
+        self.header_bar.pack_start(open_btn)
+
         save_btn = Gtk.Button(label="Save")  # Removed icon_name=None to avoid Gtk-CRITICAL
         save_btn.connect("clicked", self.on_save_clicked)
         self.header_bar.pack_start(save_btn)
@@ -75,6 +101,9 @@ class MainWindow(Gtk.ApplicationWindow):
             revealed=True,
             css_classes=["big-banner-radius"]
         )
+        self.banner.connect("button-clicked", self.on_banner_button_clicked)
+        self.export_job = None  # the export running in the background, shown in the banner
+        self.export_progress = 0.0
 
         self.top_overlay_box.append(self.header_bar)
         self.top_overlay_box.append(self.banner)
@@ -82,11 +111,13 @@ class MainWindow(Gtk.ApplicationWindow):
 
 
         # [[ PENS ]]
+        ink_smoothing = {"type": "one_euro", "min_cutoff": 1.0, "beta": 0.007}
         self.pens = [
-            Pen("red ballpoint", color=(1, 0, 0, 1), width=2),
-            Pen("white ballpoint", color=(1, 1, 1, 1), width=2),
-            Pen("yellow highlighter", color=(1, 1, 0, 0.3), width=18, supports_incremental_drawing=False),
-            CalligraphyPen(color=(0.1, 0.15, 0.4, 1), width=10, angle=45),
+            Pen("red ballpoint", color=(1, 0, 0, 1), width=2, simplify_tolerance=0.5, smoothing=ink_smoothing),
+            Pen("white ballpoint", color=(1, 1, 1, 1), width=2, simplify_tolerance=0.5, smoothing=ink_smoothing),
+            Pen("yellow highlighter", color=(1, 1, 0, 0.3), width=18, supports_incremental_drawing=False, simplify_tolerance=1,
+                smoothing={"type": "one_euro", "min_cutoff": 0.5, "beta": 0.004}),
+            CalligraphyPen(color=(0.1, 0.15, 0.4, 1), width=10, angle=45, simplify_tolerance=0.5, smoothing=ink_smoothing),
             PointerPen(color=(0, 1, 0, 1), width=16),
             Eraser(),
         ]
@@ -109,9 +140,14 @@ class MainWindow(Gtk.ApplicationWindow):
         # [[ TOUCHPAD THREAD ]]
         self.touchpad_reader = TouchpadReaderThread(
             self.handle_device_init,
-            self.handle_touchpad_event,
-            self.handle_touchpad_error
+            self.handle_touchpad_frames_ready,
+            self.handle_touchpad_error,
+            replay=os.environ.get(REPLAY_ENV),
+            replay_speed=float(os.environ.get(REPLAY_SPEED_ENV, 1)),
+            record=os.environ.get(RECORD_ENV),
         )
+        self._frame_tick_id = None
+        self.update_pen_smoothing()
         self.touchpad_reader.start()
 
 
@@ -127,12 +163,23 @@ class MainWindow(Gtk.ApplicationWindow):
             can_focus=True,
             focus_on_click=True
         )
+        # The same ink as render nodes, see set_renderer
+        self.ink_view = InkView()
+        self.ink_textures = TextureCache()
+
+        # Cursors, predictions and temporary pens change on every touch frame; on a
+        # layer of their own, the committed ink under them is only repainted when it changes
+        self.cursor_area = Gtk.DrawingArea(can_target=False)
+        self.canvas_overlay = Gtk.Overlay(child=self.drawing_area)
+        self.canvas_overlay.add_overlay(self.cursor_area)
+        self.renderer = "cairo"
+
         # Remove make_drawing_area_controller, use click gesture inline
         click_controller = Gtk.GestureClick.new()
         def on_drawing_area_click(controller, n_press, x, y):
             self.set_drawing_mode(True)
         click_controller.connect("pressed", on_drawing_area_click)
-        self.drawing_area.add_controller(click_controller)
+        self.canvas_overlay.add_controller(click_controller)
 
 
         # [[ FRAME AROUND DRAWING AREA ]]
@@ -141,7 +188,7 @@ class MainWindow(Gtk.ApplicationWindow):
             valign=Gtk.Align.CENTER,
             css_classes=["drawing-frame"]
         )
-        self.frame.set_child(self.drawing_area)
+        self.frame.set_child(self.canvas_overlay)
         self.overlay.set_child(self.frame)
 
 
@@ -151,9 +198,18 @@ class MainWindow(Gtk.ApplicationWindow):
 
 
         # [[ STROKE MANAGER ]]
-        self.stroke_manager = StrokeManager()
-        self.strokes_surface = None
+        self.stroke_manager = StrokeManager(
+            undo_horizon=500,
+            on_simplified=lambda: GLib.idle_add(self.handle_strokes_simplified)
+        )
+        self.strokes_canvas = None
         self.surface_size = None
+        self.snapshots = None
+        self._snapshot_idle_id = None
+        self.document = None  # the .tpad file last opened or saved, see save_document
+        self.predictor = StrokePredictor(horizon_frames=1)  # display frames of latency to hide; 0 disables
+        self._unpainted_times = []  # kernel timestamps (µs) of frames applied but not yet painted
+        self.show_latency_overlay = False
 
 
     def set_drawing_mode(self, drawing: bool):
@@ -164,13 +220,29 @@ class MainWindow(Gtk.ApplicationWindow):
         if drawing:
             self.set_cursor(Gdk.Cursor.new_from_name("none"))
             self.frame.set_css_classes(["drawing-frame", "drawing-frame-active"])
-            self.banner.set_title("🖱️ Mouse captured! Press Esc to exit.")
         else:
             self.set_cursor(Gdk.Cursor.new_from_name("default"))
             self.frame.set_css_classes(["drawing-frame", "drawing-frame-inactive"])
+        self.update_banner()
+
+        self.queue_ink_draw()
+        self.cursor_area.queue_draw()
+
+    def update_banner(self) -> None:
+        if self.export_job:
+            name = os.path.basename(self.export_job.filename)
+            self.banner.set_title(f"Exporting {name}… {self.export_progress:.0%}")
+            self.banner.set_button_label("Cancel")
+        elif self.drawing_mode:
+            self.banner.set_title("🖱️ Mouse captured! Press Esc to exit.")
+            self.banner.set_button_label(None)
+        else:
             self.banner.set_title("Click anywhere on the pad to start drawing ✏️")
+            self.banner.set_button_label(None)
 
-        self.drawing_area.queue_draw()
+    def on_banner_button_clicked(self, banner) -> None:
+        if self.export_job:
+            self.export_job.cancel()
 
     def update_pen_selector(self):
         for i, child in enumerate(self.pen_selector_box):
@@ -178,12 +250,24 @@ class MainWindow(Gtk.ApplicationWindow):
                 child.set_css_classes(["pen-selected"])
             else:
                 child.set_css_classes(["pen"])
+        self.update_pen_smoothing()
+
+    def update_pen_smoothing(self):
+        # The pen selector is built before the touchpad reader exists
+        reader = getattr(self, "touchpad_reader", None)
+        if reader and self.pen_index < len(self.pens):
+            reader.set_smoothing(self.pens[self.pen_index].smoothing)
 
     def on_pen_selected(self, btn, idx):
         self.pen_index = idx
         self.update_pen_selector()
 
     def handle_device_init(self) -> None:
+        renderer = os.environ.get(RENDERER_ENV, self.renderer)
+        if renderer not in RENDERERS:
+            print(f"Unknown {RENDERER_ENV} '{renderer}', expected one of {', '.join(RENDERERS)}; using cairo", file=sys.stderr)
+            renderer = "cairo"
+
         # Get window size (fullscreen, so only set once)
         win_size = Vec2(
             self.get_size(orientation=Gtk.Orientation.HORIZONTAL),
@@ -202,72 +286,181 @@ class MainWindow(Gtk.ApplicationWindow):
             width = int(win_size.x * self.coverage)
             height = int(width / aspect)
         self.drawing_area.set_size_request(width, height)
+        self.ink_view.set_size_request(width, height)
 
         # show only after the resize
         self.drawing_area.set_draw_func(self.on_draw)
+        self.ink_view.set_snapshot_func(self.on_snapshot)
+        self.cursor_area.set_draw_func(self.on_draw_cursors)
         # self.set_child(self.frame)  # REMOVE this line, overlay is always the window child
 
-        # Create the cache surface
-        self.strokes_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        # Create the cache canvas; its tiles are allocated as strokes reach them
         self.surface_size = Vec2(width, height)
-
-    def handle_touchpad_event(self, data) -> None:
-        if not self.drawing_mode:
-            return
-        
-        # data: {slot: {x, y}}
-        current_slots = set(self.stroke_manager.current_strokes.keys())
-        new_slots = set(data.keys())
-
-        # End strokes for slots that disappeared
-        ended = current_slots - new_slots
-        if ended:
-            for slot in ended:
+        self.strokes_canvas = TiledSurface(self.surface_size)
+        self.snapshots = SnapshotCache(self.surface_size)
+        self.set_renderer(renderer)
+
+    def handle_touchpad_frames_ready(self) -> None:
+        # Drain the reader queue once per display refresh rather than once per touch frame
+        if self._frame_tick_id is None:
+            self._frame_tick_id = self.cursor_area.add_tick_callback(self._on_frame_tick)
+
+    def _on_frame_tick(self, widget, frame_clock) -> bool:
+        frames = self.touchpad_reader.frames.drain()
+        if not frames:
+            # Input stopped: don't leave ink predicted ahead of the fingers
+            if self.predictor.predictions:
+                self.predictor.clear()
+                self.cursor_area.queue_draw()
+            self._frame_tick_id = None
+            return GLib.SOURCE_REMOVE
+
+        self._record_latency("latency.dispatch", frames)
+        self.handle_touchpad_frames(frames)
+        self.update_predictions(frame_clock)
+        return GLib.SOURCE_CONTINUE
+
+    def update_predictions(self, frame_clock: Gdk.FrameClock) -> None:
+        refresh_interval, _ = frame_clock.get_refresh_info(frame_clock.get_frame_time())
+        now = frame_clock.get_frame_time() / 1e6
+        for slot, stroke in self.stroke_manager.current_strokes.items():
+            self.predictor.observe(slot, stroke.points[-1], now, (refresh_interval or 16667) / 1e6)
+
+    def handle_touchpad_frames(self, frames) -> None:
+        ink_changed = False
+        for changes in frames:
+            # Lifted contacts are applied even outside drawing mode, so no stroke is left dangling
+            for slot in changes['up']:
                 self.stroke_manager.end_stroke(slot)
-
-        if ended or self.stroke_manager.require_redraw:
-            # Redraw cache surface only once after all ended strokes or stroke_manager.require_redraw
+                self.predictor.remove(slot)
+
+            if not self.drawing_mode:
+                continue
+
+            # Start strokes for new contacts, then extend the moving ones
+            for slot, pos in itertools.chain(changes['down'].items(), changes['move'].items()):
+                abs_point = Vec2(pos['x'], pos['y'])
+                draw_point = abs_point.transform_to_space(self.touchpad_reader.max, self.surface_size)
+                if slot not in self.stroke_manager.current_strokes:
+                    pen = self.pens[self.pen_index]
+                    self.stroke_manager.start_stroke(slot, draw_point, pen, changes.get('time'))
+                else:
+                    self.stroke_manager.update_stroke(slot, draw_point, changes.get('time'))
+
+                # Draw incrementally, onto the cache or, for translucent ink, the stroke's own layer.
+                # Temporary pens trim their points from the start, so they are redrawn whole.
+                stroke : Stroke = self.stroke_manager.current_strokes[slot]
+                if stroke.pen.supports_incremental_drawing:
+                    stroke.draw_new(self.strokes_canvas)
+                    ink_changed = True
+                elif not stroke.pen.is_temporary:
+                    stroke.draw_new_to_layer(self.surface_size)
+                    ink_changed = True
+
+            self._record_latency("latency.update", [changes])
+            if 'time' in changes:
+                self._unpainted_times.append(changes['time'])
+
+        if self.stroke_manager.require_redraw:
+            # Redraw cache surface only once per batch, after all ended strokes and erasures
             self.rebuild_surface_from_strokes()
-        
-        # Start or update strokes for active slots
-        for slot, pos in data.items():
-            abs_point = Vec2(pos['x'], pos['y'])
-            draw_point = abs_point.transform_to_space(self.touchpad_reader.max, self.surface_size)
-            if slot not in self.stroke_manager.current_strokes:
-                pen = self.pens[self.pen_index]
-                self.stroke_manager.start_stroke(slot, draw_point, pen)
-            else:
-                self.stroke_manager.update_stroke(slot, draw_point)
-
-            # Draw incrementally for Strokes that support that
-            stroke : Stroke = self.stroke_manager.current_strokes[slot]
-            if stroke.pen.supports_incremental_drawing:
-                cr = cairo.Context(self.strokes_surface)
-                stroke.draw(cr, True)
-        
-        self.drawing_area.queue_draw()
+        if ink_changed:
+            self.queue_ink_draw()
+        self.cursor_area.queue_draw()
+
+    @staticmethod
+    def _record_latency(name: str, frames) -> None:
+        now = GLib.get_monotonic_time()
+        for frame in frames:
+            if 'time' in frame:
+                instruments.record(name, now - frame['time'])
+
+    def handle_strokes_simplified(self) -> bool:
+        if self.stroke_manager.apply_simplified():
+            self.rebuild_surface_from_strokes()
+        return GLib.SOURCE_REMOVE
 
     def on_draw(self, area, cr: cairo.Context, width: int, height: int) -> None:
-        # Paint the cached surface (completed strokes)
-        if self.strokes_surface:
-            cr.set_source_surface(self.strokes_surface, 0, 0)
-            cr.paint()
+        """The committed ink layer: only queued when ink is added or repainted, see on_draw_cursors."""
+        # Paint the cached canvas (completed strokes)
+        if self.strokes_canvas:
+            self.strokes_canvas.paint(cr)
         
         # Draw current (in-progress) strokes on top
         for stroke in self.stroke_manager.current_strokes.values():
-            if not stroke.pen.supports_incremental_drawing:
-                stroke.draw(cr)
-        
-        # Draw pointers
-        for stroke in self.stroke_manager.current_strokes.values():
-            stroke.pen.draw_cursor(cr, stroke.points[-1])
+            if not stroke.pen.supports_incremental_drawing and not stroke.pen.is_temporary:
+                stroke.draw_layer(cr)
         
-        # Glassy blur/dim effect when not in drawing mode
+        # Glassy blur/dim effect when not in drawing mode (there are no cursors then)
         if not self.drawing_mode:
             cr.set_source_rgba(0, 0, 0, 0.55)
             cr.rectangle(0, 0, width, height)
             cr.fill()
 
+    def on_snapshot(self, snapshot: Gtk.Snapshot, width: int, height: int) -> None:
+        """`on_draw` for the "gsk" renderer: tiles are uploaded as textures once, then reused every frame."""
+        snapshot_ink(snapshot, self.ink_textures, self.strokes_canvas, self.stroke_manager.current_strokes.values())
+        if not self.drawing_mode:
+            snapshot.append_color(Gdk.RGBA(red=0, green=0, blue=0, alpha=0.55), graphene_rect(Rect(0, 0, width, height)))
+
+    def set_renderer(self, renderer: str) -> None:
+        """Paint the ink with cairo ("cairo"), or as render nodes composited by GTK's renderer ("gsk")."""
+        widgets = {"cairo": self.drawing_area, "gsk": self.ink_view}
+        if renderer not in widgets:
+            raise ValueError(f"Unknown renderer '{renderer}', expected one of {', '.join(widgets)}")
+        self.renderer = renderer
+        self.canvas_overlay.set_child(widgets[renderer])
+        self.queue_ink_draw()
+
+    def queue_ink_draw(self) -> None:
+        self.canvas_overlay.get_child().queue_draw()
+
+    def on_draw_cursors(self, area, cr: cairo.Context, width: int, height: int) -> None:
+        """The layer over the ink, redrawn every touch frame: temporary pens, predictions and cursors."""
+        for stroke in self.stroke_manager.current_strokes.values():
+            if stroke.pen.is_temporary:
+                stroke.draw(cr)
+
+        # Draw the predicted continuation of each stroke, then pointers (ahead, where predicted)
+        predictions = self.predictor.predictions
+        for slot, stroke in self.stroke_manager.current_strokes.items():
+            if slot in predictions:
+                stroke.pen.draw(cr, PointBuffer((stroke.points[-1], predictions[slot])))
+        for slot, stroke in self.stroke_manager.current_strokes.items():
+            stroke.pen.draw_cursor(cr, predictions.get(slot, stroke.points[-1]))
+
+        if self.show_latency_overlay:
+            self.draw_latency_overlay(cr)
+
+        # Input-to-paint latency; the frame reaches the screen at the next vblank
+        now = GLib.get_monotonic_time()
+        for time in self._unpainted_times:
+            instruments.record("latency.paint", now - time)
+        self._unpainted_times.clear()
+
+    def draw_latency_overlay(self, cr: cairo.Context) -> None:
+        lines = []
+        for stage in ("emit", "receive", "dispatch", "update", "paint"):
+            summary = instruments.histogram_summary(f"latency.{stage}")
+            if summary["count"]:
+                lines.append(
+                    f"{stage:<8} p50 {summary['p50']:6.2f}  p95 {summary['p95']:6.2f}  p99 {summary['p99']:6.2f} ms"
+                )
+        if not lines:
+            lines.append("no latency samples yet")
+
+        cr.save()
+        cr.select_font_face("monospace")
+        cr.set_font_size(12)
+        cr.set_source_rgba(0, 0, 0, 0.6)
+        cr.rectangle(8, 8, 420, 18 * len(lines) + 10)
+        cr.fill()
+        cr.set_source_rgb(1, 1, 1)
+        for i, line in enumerate(lines):
+            cr.move_to(16, 26 + 18 * i)
+            cr.show_text(line)
+        cr.restore()
+
     def handle_touchpad_error(self, message: str) -> None:
         dialog = Gtk.MessageDialog(
             transient_for=self,
@@ -290,13 +483,66 @@ class MainWindow(Gtk.ApplicationWindow):
         self.update_pen_selector()
 
     def rebuild_surface_from_strokes(self) -> None:
+        """Repaint the part of the cache canvas damaged since the last rebuild."""
         if not self.surface_size:
             return
-        self.strokes_surface = cairo.ImageSurface(
-            cairo.FORMAT_ARGB32, int(self.surface_size.x), int(self.surface_size.y)
-        )
-        self.stroke_manager.draw(self.strokes_surface)
-        self.drawing_area.queue_draw()
+        self._sync_snapshots()
+        damage = self.stroke_manager.take_damage()
+        if not damage:
+            return
+
+        region = damage.to_pixels().intersection(Rect(0, 0, *self.surface_size))
+        if region.is_empty():
+            return
+
+        # Restore only the damaged rectangle from the nearest checkpoint (or clear it),
+        # then repaint the strokes after that checkpoint that overlap it
+        first, snapshot = self.snapshots.nearest(len(self.stroke_manager.completed_strokes))
+        if snapshot:
+            self.strokes_canvas.restore(region, snapshot)
+        else:
+            self.strokes_canvas.clear(region)
+
+        self.stroke_manager.draw_to_canvas(self.strokes_canvas, region=region, first=first)
+        self.queue_ink_draw()
+        self._schedule_snapshot_maintenance()
+
+    def _sync_snapshots(self) -> None:
+        index = self.stroke_manager.take_invalidated_from()
+        if index is not None and self.snapshots:
+            self.snapshots.invalidate_from(index)
+
+    def _schedule_snapshot_maintenance(self) -> None:
+        if self._snapshot_idle_id is None:
+            self._snapshot_idle_id = GLib.idle_add(self._maintain_snapshots)
+
+    def _maintain_snapshots(self) -> bool:
+        """
+        Idle handler: flatten the strokes that can no longer be undone into the
+        base layer, or take the next checkpoint, a few strokes per call.
+        """
+        self._sync_snapshots()
+        snapshots = self.snapshots
+        if not snapshots.rendering:
+            count = len(self.stroke_manager.completed_strokes)
+            stable = self.stroke_manager.undoable_from()
+            base = snapshots.base[0] if snapshots.base else 0
+            checkpoint = snapshots.next_checkpoint(count)
+            if stable - base >= snapshots.interval:
+                snapshots.begin(stable, base=True)
+            elif checkpoint is not None:
+                snapshots.begin(checkpoint)
+            else:
+                self._snapshot_idle_id = None
+                return GLib.SOURCE_REMOVE
+
+        if snapshots.step(self._draw_completed_strokes, SNAPSHOT_STROKES_PER_IDLE):
+            return GLib.SOURCE_CONTINUE
+        self._snapshot_idle_id = None
+        return GLib.SOURCE_REMOVE
+
+    def _draw_completed_strokes(self, canvas: TiledSurface, first: int, last: int) -> None:
+        StrokeManager.draw_strokes_to_canvas(canvas, self.stroke_manager.completed_strokes[first:last])
 
     def undo_last_stroke(self) -> None:
         if self.stroke_manager.undo():
@@ -311,19 +557,125 @@ class MainWindow(Gtk.ApplicationWindow):
             self.stroke_manager.clear()
             self.rebuild_surface_from_strokes()
 
-    def export(self, filename: str, filetype: str) -> None:
+    def export(self, filename: str, filetype: str, crop: bool = False, scale: float = 4) -> None:
+        padding = CROP_PADDING if crop else None
         if filetype == "svg":
-            surface = cairo.SVGSurface(filename, *self.surface_size)
-            self.stroke_manager.draw(surface)
-            surface.finish()
+            self.start_export(export_svg, filename, self.surface_size, padding=padding)
         elif filetype == "png":
-            scale = 4
-            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, *(self.surface_size * scale))
-            self.stroke_manager.draw(surface, scale=scale)
-            surface.write_to_png(filename)
+            self.start_export(export_png, filename, self.surface_size, scale, padding=padding)
+        elif filetype == "tpad":
+            self.save_document(filename)
         else:
             raise ValueError("Unsupported filetype")
 
+    def start_export(self, export, filename: str, *args, **kwargs) -> None:
+        """
+        Export a snapshot of the drawing on a worker thread, so drawing can go
+        on meanwhile; progress is shown in the banner, which can cancel it.
+        """
+        if self.export_job:
+            self.export_job.cancel()
+
+        last_percent = [0]
+
+        def on_progress(fraction: float) -> None:
+            # one update per percent is plenty for the banner
+            percent = int(fraction * 100)
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                GLib.idle_add(self.on_export_progress, job, fraction)
+
+        job = ExportJob(
+            export, self.stroke_manager.snapshot(), filename, *args, **kwargs,
+            on_progress=on_progress,
+            on_done=lambda error: GLib.idle_add(self.on_export_done, job, error),
+        )
+        self.export_job = job
+        self.export_progress = 0.0
+        self.update_banner()
+        job.start()
+
+    def on_export_progress(self, job: ExportJob, fraction: float) -> bool:
+        if job is self.export_job:
+            self.export_progress = fraction
+            self.update_banner()
+        return GLib.SOURCE_REMOVE
+
+    def on_export_done(self, job: ExportJob, error) -> bool:
+        if job is self.export_job:
+            self.export_job = None
+            self.update_banner()
+        if error and not isinstance(error, ExportCancelled):
+            self.show_error("Could not export drawing", str(error))
+        return GLib.SOURCE_REMOVE
+
+    def show_error(self, text: str, secondary_text: str) -> None:
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            modal=True,
+            buttons=Gtk.ButtonsType.CLOSE,
+            message_type=Gtk.MessageType.ERROR,
+            text=text,
+            secondary_text=secondary_text
+        )
+        dialog.connect("response", lambda dialog, response: dialog.destroy())
+        dialog.present()
+
+    def save_document(self, filename: str) -> None:
+        if not self.surface_size:
+            self.show_error("Could not save drawing", "The drawing area is not ready yet.")
+            return
+        # Saving to the file last opened or saved only appends the strokes that changed
+        if self.document is None or self.document.filename != filename:
+            self.document = Document(filename)
+        try:
+            self.document.save(self.stroke_manager.completed_strokes, self.surface_size)
+        except OSError as e:
+            self.document = None  # the file may be half written: start afresh next time
+            self.show_error("Could not save drawing", str(e))
+
+    def open_document(self, filename: str) -> None:
+        if not self.surface_size:
+            self.show_error("Could not open drawing", "The drawing area is not ready yet.")
+            return
+        try:
+            # drawings saved on another screen or touchpad are scaled to this page
+            document = Document.open(filename, self.pens, self.surface_size)
+        except (OSError, ValueError) as e:
+            self.show_error("Could not open drawing", str(e))
+            return
+
+        # Strokes are decoded as they are first drawn or erased
+        self.document = document
+        self.predictor.clear()
+        self.stroke_manager.load(document.strokes)
+        self.rebuild_surface_from_strokes()
+
+    def on_open_clicked(self, btn=None) -> None:
+        self.set_drawing_mode(False)
+
+        dialog = Gtk.FileChooserDialog(
+            title="Open Drawing",
+            transient_for=self,
+            modal=True,
+            action=Gtk.FileChooserAction.OPEN
+        )
+        dialog.add_buttons(
+            "_Cancel", Gtk.ResponseType.CANCEL,
+            "_Open", Gtk.ResponseType.ACCEPT
+        )
+        dialog.add_filter(Gtk.FileFilter(name="tpad", patterns=["*.tpad"]))
+
+        def on_file_open_response(dialog, response):
+            if response == Gtk.ResponseType.ACCEPT:
+                file = dialog.get_file()
+                if file:
+                    self.open_document(file.get_path())
+            dialog.destroy()
+
+        dialog.connect("response", on_file_open_response)
+        dialog.present()
+
     def on_save_clicked(self, btn=None) -> None:
         self.set_drawing_mode(False)  # Switch to normal mode when saving
 
@@ -353,8 +705,18 @@ class MainWindow(Gtk.ApplicationWindow):
         )
         dialog.add_filter(png_filter)
 
+        tpad_filter = Gtk.FileFilter(
+            name="tpad",
+            patterns=["*.tpad"]
+        )
+        dialog.add_filter(tpad_filter)
+
         # Suggest a default file name
         dialog.set_current_name("drawing")
+        # Images only; documents always keep the whole page
+        dialog.add_choice("crop", "Crop to content", None, None)
+        dialog.add_choice("scale", "PNG scale", PNG_SCALES, [f"{scale}x" for scale in PNG_SCALES])
+        dialog.set_choice("scale", "4")
 
         def on_file_save_response(dialog, response):
             if response == Gtk.ResponseType.ACCEPT:
@@ -366,7 +728,11 @@ class MainWindow(Gtk.ApplicationWindow):
                     selected_filter = dialog.get_filter()
                     filetype = selected_filter.get_name() if selected_filter else "svg"
 
-                    self.export(filename, filetype)
+                    self.export(
+                        filename, filetype,
+                        crop=dialog.get_choice("crop") == "true",
+                        scale=float(dialog.get_choice("scale") or 4),
+                    )
             dialog.destroy()
         
         dialog.connect("response", on_file_save_response)
@@ -384,6 +750,8 @@ class MainWindow(Gtk.ApplicationWindow):
                 self.redo_last_stroke()
             case (True, 's', _) :
                 self.on_save_clicked()
+            case (True, 'o', _) :
+                self.on_open_clicked()
             case (True, 'q', _) :
                 self.touchpad_reader.stop()
                 self.get_application().quit()
@@ -399,6 +767,13 @@ class MainWindow(Gtk.ApplicationWindow):
             # Clear
             case (_, 'c', _):
                 self.clear_drawing()
+            # Latency overlay
+            case (_, _, Gdk.KEY_F12):
+                self.show_latency_overlay = not self.show_latency_overlay
+                self.cursor_area.queue_draw()
+            # Renderer
+            case (_, _, Gdk.KEY_F11):
+                self.set_renderer("gsk" if self.renderer == "cairo" else "cairo")
             case _:
                 pass
 
@@ -425,11 +800,14 @@ class MainWindow(Gtk.ApplicationWindow):
         group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Normal mode", accelerator="Escape"))
         group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Shortcuts", accelerator="F1 question"))
         group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Preferences", accelerator="<Ctrl>comma"))
+        group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Latency overlay", accelerator="F12"))
+        group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Switch renderer (cairo/GSK)", accelerator="F11"))
         group_general.add_shortcut(Gtk.ShortcutsShortcut(title="Quit", accelerator="<Ctrl>Q"))
         section.add_group(group_general)
 
         # File group
         group_file = Gtk.ShortcutsGroup(title="File")
+        group_file.add_shortcut(Gtk.ShortcutsShortcut(title="Open", accelerator="<Ctrl>O"))
         group_file.add_shortcut(Gtk.ShortcutsShortcut(title="Save", accelerator="<Ctrl>S"))
         section.add_group(group_file)
 
@@ -608,6 +986,8 @@ class MainWindow(Gtk.ApplicationWindow):
                     new_pen.name = pen.name
                 else:
                     raise RuntimeError("Unknown pen type selected in preferences dialog")
+                new_pen.simplify_tolerance = pen.simplify_tolerance
+                new_pen.smoothing = pen.smoothing
                 edited_pens[idx] = new_pen
             # Update list label
             pens_list.get_row_at_index(idx).get_child().set_label(edited_pens[idx].name)
@@ -717,6 +1097,7 @@ class MyApp(Adw.Application):
         )
 
 def main():
+    instruments.dump_at_exit()
     app = MyApp()
     app.run()
 
@@ -0,0 +1,347 @@
+"""
+TracePad's native document format (.tpad): the strokes themselves, so a
+drawing can be reopened and edited rather than only its rendering kept.
+
+Layout, little-endian:
+
+    header   b"TPAD", u16 version, u16 reserved, u64 index offset, u32 index length
+    strokes  one record per stroke, anywhere after the header: u32 point
+             count, zigzag varint deltas of x and y in 1/16 px, then (if
+             timed) zigzag varint deltas of the point times in µs
+    index    u32 metadata length, metadata (JSON: page size and pen table),
+             u32 stroke count, then per stroke, in drawing order:
+             u64 offset, u32 length, u32 points, u16 pen, u16 flags,
+             f32 x0, y0, x1, y1 (ink bounds)
+
+Saving appends the records of new or changed strokes and a new index, then
+points the header at it; until then the file still reads as the previous
+save. Records of strokes no longer in the drawing and old indexes are dead
+space, reclaimed by rewriting the file once they make up half of it.
+
+Opening maps the file and reads the index only: the points of a stroke are
+decoded the first time it is drawn or hit-tested.
+"""
+import os
+import json
+import mmap
+import struct
+from array import array
+from dataclasses import dataclass
+from functools import partial
+from itertools import accumulate
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+from vec2 import Vec2
+from rect import Rect
+from points import PointBuffer
+from drawing import ANTIALIAS_MARGIN, CalligraphyPen, Pen, Stroke
+
+
+MAGIC = b"TPAD"
+VERSION = 1
+QUANTUM = 16  # coordinate units per px
+
+HEADER = struct.Struct("<4sHHQI")
+LENGTH = struct.Struct("<I")
+ENTRY = struct.Struct("<QIIHH4f")
+
+TIMED = 1  # the record has a time per point
+NO_INK = 2  # the stroke paints nothing, its bounds are meaningless
+
+
+def pen_to_dict(pen: Pen) -> dict:
+    if isinstance(pen, CalligraphyPen):
+        return {
+            "type": "calligraphy",
+            "color": list(pen.color),
+            "width": pen.width,
+            "angle": pen.angle,
+            "simplify_tolerance": pen.simplify_tolerance,
+            "smoothing": pen.smoothing,
+        }
+    return {
+        "type": "pen",
+        "name": pen.name,
+        "color": list(pen.color),
+        "width": pen.width,
+        "supports_incremental_drawing": pen.supports_incremental_drawing,
+        "simplify_tolerance": pen.simplify_tolerance,
+        "smoothing": pen.smoothing,
+    }
+
+
+def pen_from_dict(data: dict) -> Pen:
+    params = dict(data)
+    kind = params.pop("type", None)
+    params["color"] = tuple(params.get("color", (0, 0, 0, 1)))
+    try:
+        if kind == "calligraphy":
+            return CalligraphyPen(**params)
+        if kind == "pen":
+            return Pen(**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for pen '{kind}': {e}")
+    raise ValueError(f"Unknown pen type '{kind}'")
+
+
+def _encode_deltas(out: bytearray, values: Sequence[int], stride: int = 1) -> None:
+    """Zigzag varints of the differences between each value and the one `stride` before it."""
+    previous = [0] * stride
+    for i, value in enumerate(values):
+        delta = value - previous[i % stride]
+        previous[i % stride] = value
+        delta = delta << 1 if delta >= 0 else (~delta << 1) | 1
+        while delta >= 0x80:
+            out.append(delta & 0x7f | 0x80)
+            delta >>= 7
+        out.append(delta)
+
+
+def _decode_varints(data, offset: int, count: int) -> Tuple[List[int], int]:
+    """`count` zigzag varints from `offset`, and the offset after them."""
+    values = []
+    append = values.append
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        append((value >> 1) ^ -(value & 1))
+    return values, offset
+
+
+def _encode_record(stroke: Stroke) -> Tuple[bytes, int]:
+    """The record of `stroke`, and its flags."""
+    data = stroke.points.data
+    times = stroke.times
+    n = len(data) // 2
+    flags = TIMED if times is not None and n and len(times) == n else 0
+
+    out = bytearray(LENGTH.pack(n))
+    _encode_deltas(out, [round(value * QUANTUM) for value in data], stride=2)
+    if flags & TIMED:
+        _encode_deltas(out, times)
+    return bytes(out), flags
+
+
+def _decode_record(data, offset: int, flags: int) -> Tuple[PointBuffer, Optional[array]]:
+    (n,) = LENGTH.unpack_from(data, offset)
+    deltas, offset = _decode_varints(data, offset + LENGTH.size, 2 * n)
+    coords = array('f')
+    for x, y in zip(accumulate(deltas[0::2]), accumulate(deltas[1::2])):
+        coords.append(x / QUANTUM)
+        coords.append(y / QUANTUM)
+
+    times = None
+    if flags & TIMED:
+        deltas, _ = _decode_varints(data, offset, n)
+        times = array('q', accumulate(deltas))
+    return PointBuffer.from_array(coords), times
+
+
+def _decode_scaled(data, offset: int, flags: int, factor: float) -> Tuple[PointBuffer, Optional[array]]:
+    points, times = _decode_record(data, offset, flags)
+    return PointBuffer.from_array(array('f', (value * factor for value in points.data))), times
+
+
+def _scale_ink_bounds(bounds: Rect, pen: Pen, factor: float) -> Rect:
+    """
+    Ink bounds of a stroke whose points are scaled by `factor`, its pen
+    unchanged: the part of the ink past the points (at most a miter, 10 half
+    widths, in cairo) doesn't scale, so it is added back when shrinking.
+    """
+    scaled = bounds.scale(factor)
+    if factor < 1:
+        scaled = scaled.inflate((1 - factor) * (5 * pen.width + ANTIALIAS_MARGIN))
+    return scaled
+
+
+@dataclass
+class _Entry:
+    offset: int
+    length: int
+    points: int
+    flags: int
+    bounds: Optional[Rect]
+    revision: int  # of the stroke when it was written
+
+
+class Document:
+    """
+    A drawing kept in a .tpad file. `open` reads one; `save` writes the
+    current strokes, appending to the file when it was opened or last saved
+    through this object, writing it anew otherwise.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.size: Optional[Vec2] = None
+        self.strokes: List[Stroke] = []  # as opened
+        self._saved: Dict[Stroke, _Entry] = {}  # strokes in the file, as of the last open or save
+        self._end: Optional[int] = None  # size of the file as we left it; None if we never wrote or read it
+        self._index_length = 0
+
+    @classmethod
+    def open(cls, filename: str, pens: Sequence[Pen] = (), size: Optional[Vec2] = None) -> 'Document':
+        """
+        Read the index of `filename`. Pens of the document equal to one of
+        `pens` are replaced by it. With `size`, a document saved at another
+        page size has its strokes scaled to fit it, keeping their aspect ratio
+        (`size` then becomes the document's). Raises ValueError if the file is
+        not a valid document.
+        """
+        document = cls(filename)
+        with open(filename, "rb") as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise ValueError("Not a TracePad document: file too short")
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, index_offset, index_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a TracePad document: bad magic")
+        if version != VERSION:
+            raise ValueError(f"Unsupported document version {version}, expected {VERSION}")
+        if index_offset + index_length > len(data):
+            raise ValueError("Truncated TracePad document")
+
+        try:
+            offset = index_offset
+            (metadata_length,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            metadata = json.loads(data[offset:offset + metadata_length])
+            offset += metadata_length
+
+            document.size = Vec2(*metadata["size"])
+            factor = None
+            if size is not None and size != document.size:
+                factor = min(size.x / document.size.x, size.y / document.size.y)
+                document.size = size
+            known = [(pen_to_dict(pen), pen) for pen in pens if not pen.is_temporary]
+            document_pens = [
+                next((pen for params, pen in known if params == pen_params), None) or pen_from_dict(pen_params)
+                for pen_params in metadata["pens"]
+            ]
+
+            (count,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            for _ in range(count):
+                record_offset, length, n, pen, flags, x0, y0, x1, y1 = ENTRY.unpack_from(data, offset)
+                offset += ENTRY.size
+                if record_offset + length > len(data):
+                    raise ValueError("Truncated TracePad document")
+                bounds = None if flags & NO_INK else Rect(x0, y0, x1, y1)
+                if factor is None:
+                    stroke = Stroke.lazy(document_pens[pen], bounds, partial(_decode_record, data, record_offset, flags))
+                    document._saved[stroke] = _Entry(record_offset, length, n, flags, bounds, stroke.revision)
+                else:
+                    # the records hold the unscaled points: the strokes are written anew on save
+                    bounds = bounds and _scale_ink_bounds(bounds, document_pens[pen], factor)
+                    stroke = Stroke.lazy(document_pens[pen], bounds, partial(_decode_scaled, data, record_offset, flags, factor))
+                document.strokes.append(stroke)
+        except (struct.error, KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Corrupt TracePad document: {e}")
+
+        document._end = len(data)
+        document._index_length = index_length
+        return document
+
+    def save(self, strokes: Sequence[Stroke], size: Vec2) -> None:
+        """Write `strokes`, the completed strokes in drawing order, and the page size."""
+        strokes = [stroke for stroke in strokes if not stroke.pen.is_temporary]
+        try:
+            unchanged = self._end is not None and os.path.getsize(self.filename) == self._end
+        except OSError:
+            unchanged = False
+
+        if unchanged:
+            self._append(strokes, size)
+            live = HEADER.size + self._index_length + sum(entry.length for entry in self._saved.values())
+            if self._end - live > live:
+                self._rewrite(strokes, size)
+        else:
+            self._saved = {}
+            self._rewrite(strokes, size)
+
+    def _append(self, strokes: List[Stroke], size: Vec2) -> None:
+        with open(self.filename, "r+b") as file:
+            file.seek(self._end)
+            saved = {}
+            for stroke in strokes:
+                entry = self._saved.get(stroke)
+                if entry is None or entry.revision != stroke.revision:
+                    entry = self._write_record(file, stroke)
+                saved[stroke] = entry
+            self._write_index(file, strokes, saved, size)
+        self._saved = saved
+
+    def _rewrite(self, strokes: List[Stroke], size: Vec2) -> None:
+        """Write every stroke to a new file, then move it over the old one."""
+        temporary = self.filename + ".tmp"
+        source = open(self.filename, "rb") if self._saved else None
+        try:
+            with open(temporary, "wb") as file:
+                file.write(bytes(HEADER.size))
+                saved = {}
+                for stroke in strokes:
+                    entry = self._saved.get(stroke)
+                    if entry is None or entry.revision != stroke.revision:
+                        saved[stroke] = self._write_record(file, stroke)
+                        continue
+                    # Copy the record as is, without decoding the stroke
+                    offset = file.tell()
+                    file.write(os.pread(source.fileno(), entry.length, entry.offset))
+                    saved[stroke] = _Entry(offset, entry.length, entry.points, entry.flags, entry.bounds, entry.revision)
+                self._write_index(file, strokes, saved, size)
+        finally:
+            if source:
+                source.close()
+        os.replace(temporary, self.filename)
+        self._saved = saved
+
+    @staticmethod
+    def _write_record(file: BinaryIO, stroke: Stroke) -> _Entry:
+        record, flags = _encode_record(stroke)
+        bounds = stroke.ink_bounds()
+        if bounds is None:
+            flags |= NO_INK
+        offset = file.tell()
+        file.write(record)
+        return _Entry(offset, len(record), len(stroke.points), flags, bounds, stroke.revision)
+
+    def _write_index(self, file: BinaryIO, strokes: List[Stroke], saved: Dict[Stroke, _Entry], size: Vec2) -> None:
+        """Append the index of `strokes`, then point the header at it once it is on disk."""
+        pens: Dict[int, int] = {}  # id(pen) -> index in the pen table
+        pen_table = []
+        for stroke in strokes:
+            if id(stroke.pen) not in pens:
+                pens[id(stroke.pen)] = len(pen_table)
+                pen_table.append(pen_to_dict(stroke.pen))
+
+        metadata = json.dumps({"size": list(size), "pens": pen_table}).encode()
+        index = bytearray(LENGTH.pack(len(metadata)))
+        index += metadata
+        index += LENGTH.pack(len(strokes))
+        for stroke in strokes:
+            entry = saved[stroke]
+            # rounded outwards, so float32 can't shrink them
+            bounds = entry.bounds.to_pixels() if entry.bounds else Rect(0, 0, 0, 0)
+            index += ENTRY.pack(
+                entry.offset, entry.length, entry.points, pens[id(stroke.pen)], entry.flags,
+                bounds.x0, bounds.y0, bounds.x1, bounds.y1,
+            )
+
+        index_offset = file.tell()
+        file.write(index)
+        self._end = file.tell()
+        self._index_length = len(index)
+        file.flush()
+        os.fsync(file.fileno())
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, index_offset, len(index)))
+        file.flush()
+        os.fsync(file.fileno())
@@ -1,8 +1,13 @@
 import math  # Global import for math
+import copy
 import cairo
 import itertools
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Callable, Optional, List, Any, Tuple, Union
+from typing import Callable, Iterator, Optional, List, Tuple
 
 import gi
 gi.require_version('Gtk', '4.0')
@@ -10,6 +15,33 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gdk, GLib, Gio
 
 from vec2 import Vec2
+from rect import Rect
+from points import PointBuffer, PointSequence
+from simplify import simplify
+from instrumentation import instruments
+from spatial_index import SegmentGrid
+from tiles import Progress, TiledSurface
+
+
+ANTIALIAS_MARGIN = 1
+
+_measure = threading.local()  # one context per thread, exports trace paths off the main thread
+
+def _measure_context() -> cairo.Context:
+    """Scratch context for path extents queries; nothing is ever painted on it."""
+    cr = getattr(_measure, "cr", None)
+    if cr is None:
+        cr = _measure.cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+    return cr
+
+
+def _svg_paint(prop: str, color: Tuple[float, float, float, float]) -> str:
+    """CSS for painting `prop` ('fill' or 'stroke') with an RGBA color."""
+    r, g, b, a = (max(0, min(255, round(c * 255))) for c in color)
+    css = f"{prop}:#{r:02x}{g:02x}{b:02x}"
+    if a < 255:
+        css += f";{prop}-opacity:{color[3]:.3g}"
+    return css
 
 
 @dataclass
@@ -20,23 +52,48 @@ class Pen:
     supports_incremental_drawing: bool = True
     is_temporary: bool = False
     stroke_add_point_handler: Optional[Callable[['Stroke'], None]] = None
+    simplify_tolerance: float = 0  # max deviation in px of the simplified stroke; 0 keeps every point
+    smoothing: Optional[dict] = None  # filter the touchpad reader applies to this pen's input, see touchpad.filters
 
     def set_style(self, cr: cairo.Context) -> None:
         cr.set_source_rgba(*self.color)
         cr.set_line_width(self.width)
         # cr.set_line_cap(cairo.LINE_CAP_ROUND)
 
-    def draw(self, cr: cairo.Context, points: List[Vec2]) -> None:
+    def trace_path(self, cr: cairo.Context, points: PointSequence) -> None:
+        coords = points.coords()
+        cr.move_to(*next(coords))
+        for x, y in coords:
+            cr.line_to(x, y)
+
+    def draw(self, cr: cairo.Context, points: PointSequence) -> None:
         if len(points) < 2:
             return
         
-        self.set_style(cr)
+        self.trace_path(cr, points)
+        self.paint_path(cr)
 
-        cr.move_to(*points[0])
-        for pt in points[1:]:
-            cr.line_to(*pt)
+    def paint_path(self, cr: cairo.Context) -> None:
+        """Paint the current path of `cr`, as traced by `trace_path`."""
+        self.set_style(cr)
         cr.stroke()
 
+    def svg_style(self) -> str:
+        """CSS declarations painting the traced path as `paint_path` does (cairo's miter limit is 10, SVG's 4)."""
+        return f"fill:none;{_svg_paint('stroke', self.color)};stroke-width:{self.width:g};stroke-miterlimit:10"
+
+    def ink_extents(self, points: PointSequence) -> Optional[Rect]:
+        """Area painted by `draw(points)`, including line width, joins and antialiasing."""
+        if len(points) < 2:
+            return None
+
+        cr = _measure_context()
+        self.set_style(cr)
+        self.trace_path(cr, points)
+        extents = Rect(*cr.stroke_extents())
+        cr.new_path()
+        return extents.inflate(ANTIALIAS_MARGIN)
+
     def draw_cursor(self, cr: cairo.Context, point: Vec2) -> None:
         cr.set_source_rgba(*self.color)
         cursor_radius = max(5, (self.width/2) * 1.25)  # Make the cursor clearly larger than the pen
@@ -66,31 +123,88 @@ class Pen:
         
     
 class CalligraphyPen(Pen):
-    def __init__(self, color: Tuple[float, float, float, float] = (0, 0, 0, 1), width: int = 10, angle: float = 45) -> None:
-        super().__init__("calligraphy pen", color, width, supports_incremental_drawing=True)
+    def __init__(
+        self,
+        color: Tuple[float, float, float, float] = (0, 0, 0, 1),
+        width: int = 10,
+        angle: float = 45,
+        simplify_tolerance: float = 0,
+        smoothing: Optional[dict] = None,
+    ) -> None:
+        super().__init__(
+            "calligraphy pen",
+            color,
+            width,
+            supports_incremental_drawing=True,
+            simplify_tolerance=simplify_tolerance,
+            smoothing=smoothing,
+        )
         self.angle = angle
         self.angle_rad = math.radians(angle)
 
-    def draw(self, cr: cairo.Context, points: List[Vec2]) -> None:
+    def draw(self, cr: cairo.Context, points: PointSequence) -> None:
         if len(points) < 2:
             return
-        
-        perp = Vec2.from_polar_coordinates(self.angle_rad, self.width / 2)
 
+        self.trace_path(cr, points)
+        self.paint_path(cr)
+
+    def paint_path(self, cr: cairo.Context) -> None:
         cr.set_source_rgba(*self.color)
-        cr.set_line_width(1)
-        for i in range(len(points) - 1):
-            p1 = points[i]
-            p2 = points[i + 1]
-
-            # Four corners of the quadrilateral
-            cr.move_to(*(p1 - perp))
-            cr.line_to(*(p2 - perp))
-            cr.line_to(*(p2 + perp))
-            cr.line_to(*(p1 + perp))
-            cr.close_path()
-            cr.fill_preserve()
-            cr.stroke()
+        cr.fill()
+
+    def svg_style(self) -> str:
+        return _svg_paint('fill', self.color)
+
+    def trace_path(self, cr: cairo.Context, points: PointSequence) -> None:
+        """
+        Trace the area swept by the nib along `points` (the Minkowski sum of
+        the polyline and the nib segment) as a few closed outlines, to be
+        filled once with the nonzero rule.
+
+        The polyline is split wherever it crosses over to the other side of
+        the nib; each run is a ribbon: the points offset by -nib going
+        forward, then offset by +nib coming back. Runs are all traced with
+        the same orientation, so their overlaps don't cancel out.
+        """
+        px, py = Vec2.from_polar_coordinates(self.angle_rad, self.width / 2)
+        coords = points.coords()
+        x1, y1 = next(coords)
+        run = [(x1, y1)]
+        side = 0
+        for x2, y2 in coords:
+            cross = (x2 - x1) * py - (y2 - y1) * px
+            direction = (cross > 0) - (cross < 0)
+            if direction and side and direction != side:
+                self._trace_run(cr, run, side, px, py)
+                run = [run[-1]]
+            if direction:
+                side = direction
+            run.append((x2, y2))
+            x1, y1 = x2, y2
+        self._trace_run(cr, run, side, px, py)
+
+    @staticmethod
+    def _trace_run(cr: cairo.Context, run: List[Tuple[float, float]], side: int, px: float, py: float) -> None:
+        if side < 0:
+            run = run[::-1]
+        x, y = run[0]
+        cr.move_to(x - px, y - py)
+        for x, y in run[1:]:
+            cr.line_to(x - px, y - py)
+        for x, y in reversed(run):
+            cr.line_to(x + px, y + py)
+        cr.close_path()
+
+    def ink_extents(self, points: PointSequence) -> Optional[Rect]:
+        if len(points) < 2:
+            return None
+
+        cr = _measure_context()
+        self.trace_path(cr, points)
+        extents = Rect(*cr.fill_extents())
+        cr.new_path()
+        return extents.inflate(ANTIALIAS_MARGIN)
 
     def draw_cursor(self, cr: cairo.Context, point: Vec2) -> None:
         cr.translate(*point)
@@ -104,6 +218,8 @@ class PointerPen(Pen):
         def stroke_add_point_handler(str: Stroke):
             if len(str.points) > max_length:
                 del str.points[0]
+                if str.times is not None:
+                    del str.times[0]
 
         super().__init__(
             "pointer",
@@ -134,12 +250,18 @@ class Eraser(Pen):
             is_temporary=True,
         )
 
-    def draw(self, cr: cairo.Context, points: List[Vec2]) -> None:
+    def draw(self, cr: cairo.Context, points: PointSequence) -> None:
         """
         No draw functionality, so that it doesn't leave trace
         """
         pass
 
+    def paint_path(self, cr: cairo.Context) -> None:
+        cr.new_path()
+
+    def ink_extents(self, points: PointSequence) -> Optional[Rect]:
+        return None
+
     def draw_cursor(self, cr: cairo.Context, point: Vec2, scaling_ratio=1) -> None:
         cr.set_source_rgba(*self.color)
         cr.arc(*point, self.width / 2 * scaling_ratio, 0, 2 * math.pi)
@@ -164,30 +286,151 @@ class Eraser(Pen):
         Remove the first completed stroke in the stroke_manager that is intersected by the eraser at the point.
         Returns the stroke if erased, else None.
         """
-        for i, stroke in enumerate(stroke_manager.completed_strokes):
-            if self.intersects_stroke(stroke, point):
-                stroke_manager.require_redraw = True
-                return stroke_manager.completed_strokes.pop(i)
-        return None
+        hits = stroke_manager.segment_index.query(point, self.width / 2)
+        if not hits:
+            return None
+
+        first = min(hits, key=lambda stroke: stroke.sequence)
+        return stroke_manager.remove_completed_stroke(stroke_manager.completed_index(first))
 
 class Stroke:
     def __init__(self, pen: Pen) -> None:
-        self.points : List[Vec2] = []
+        self._points: Optional[PointBuffer] = PointBuffer()
+        self._times: Optional[array] = array('q')  # µs per point, while every point has come with one
+        self._load: Optional[Callable[[], Tuple[PointBuffer, Optional[array]]]] = None
         self.last_drawn_index = 0
         self.pen = pen
-
-    def add_point(self, point: Vec2) -> None:
+        self.bounds: Optional[Rect] = None  # of the points, without the pen width
+        self._ink_bounds: Optional[Rect] = None
+        self.finished = False  # set once the stroke is committed; its path is then cached
+        self.revision = 0  # bumped whenever the points of the stroke are replaced
+        self.sequence = -1  # increases along completed_strokes, see StrokeManager.completed_index
+        self._path: Optional[cairo.Path] = None
+        self.layer: Optional[TiledSurface] = None  # in progress, opaque ink of pens that can't draw onto the cache
+        self._opaque_pen: Optional[Pen] = None
+
+    @classmethod
+    def lazy(cls, pen: Pen, ink_bounds: Optional[Rect], load: Callable[[], Tuple[PointBuffer, Optional[array]]]) -> 'Stroke':
+        """A finished stroke whose points and times come from `load()`, called when they are first needed."""
+        stroke = cls(pen)
+        stroke._points = stroke._times = None
+        stroke._load = load
+        stroke._ink_bounds = ink_bounds
+        stroke.finished = True
+        return stroke
+
+    @property
+    def loaded(self) -> bool:
+        return self._load is None
+
+    @property
+    def points(self) -> PointBuffer:
+        if self._load is not None:
+            self._set_points(*self._take_load())
+        return self._points
+
+    @property
+    def times(self) -> Optional[array]:
+        if self._load is not None:
+            self._set_points(*self._take_load())
+        return self._times
+
+    def _take_load(self) -> Tuple[PointBuffer, Optional[array]]:
+        load, self._load = self._load, None
+        return load()
+
+    def add_point(self, point: Vec2, time: Optional[int] = None) -> None:
+        x, y = point
         # to prevent jitter
-        if not self.points or self.points[-1].distance_to(point) > 2:
-            self.points.append(point)
+        data = self.points.data
+        accept = not data or math.hypot(x - data[-2], y - data[-1]) > 2
+
+        if accept:
+            self.points.append(x, y)
+            if self._times is not None:
+                if time is None:
+                    self._times = None
+                else:
+                    self._times.append(time)
+            self._ink_bounds = None
+            self._path = None
+            if self.bounds is None:
+                self.bounds = Rect(x, y, x, y)
+            else:
+                self.bounds.include_point(x, y)
         
         if self.pen.stroke_add_point_handler:
             self.pen.stroke_add_point_handler(self)
+            self._ink_bounds = None
+            self._path = None
 
-        # TODO: (LATER) add smoothening, if needed
+        # smoothing is done by the touchpad reader, see Pen.smoothing
             
 
+    def ink_bounds(self) -> Optional[Rect]:
+        """Area painted by `draw`, or None if it paints nothing."""
+        if self._ink_bounds is None:
+            self._ink_bounds = self.pen.ink_extents(self.points)
+        return self._ink_bounds
+
+    def replace_points(self, points: PointBuffer, times: Optional[array] = None) -> None:
+        self._load = None
+        self._set_points(points, times)
+        self.revision += 1
+        self._ink_bounds = None
+        self._path = None
+
+    def _set_points(self, points: PointBuffer, times: Optional[array]) -> None:
+        self._points = points
+        self._times = times
+        self.last_drawn_index = max(len(points) - 1, 0)
+        self.bounds = None
+        for x, y in points.coords():
+            if self.bounds is None:
+                self.bounds = Rect(x, y, x, y)
+            else:
+                self.bounds.include_point(x, y)
+
+    def snapshot(self, pen: Pen) -> 'Stroke':
+        """
+        A finished copy of the stroke in `pen`, unaffected by later changes to
+        this one. Points of finished strokes are shared: they are only ever
+        replaced, never modified in place.
+        """
+        if self._load is not None:
+            return Stroke.lazy(pen, self._ink_bounds, self._load)
+        stroke = Stroke(pen)
+        if self.finished:
+            stroke._points, stroke._times = self._points, self._times
+        else:
+            stroke._points = PointBuffer.from_array(array('f', self._points.data))
+            stroke._times = None if self._times is None else array('q', self._times)
+        stroke.bounds = self.bounds and self.bounds.copy()
+        stroke._ink_bounds = self._ink_bounds
+        stroke._path = self._path
+        stroke.last_drawn_index = self.last_drawn_index
+        stroke.revision = self.revision
+        stroke.finished = True
+        return stroke
+
+    def path(self) -> Optional[cairo.Path]:
+        """The pen's path for the whole stroke, traced once and kept; None if there is nothing to trace."""
+        if self._path is None and len(self.points) >= 2:
+            cr = _measure_context()
+            self.pen.trace_path(cr, self.points)
+            self._path = cr.copy_path()
+            cr.new_path()
+        return self._path
+
     def draw(self, cr: cairo.Context, new_only: bool = False) -> None:
+        if self.finished and not new_only:
+            # Replay the cached path instead of walking the points again
+            path = self.path()
+            if path is not None:
+                cr.append_path(path)
+                self.pen.paint_path(cr)
+            return
+
         start = self.last_drawn_index if new_only else 0
         points = self.points[start:]
 
@@ -196,33 +439,81 @@ class Stroke:
         if new_only:
             self.last_drawn_index = len(self.points) - 1
 
+    def draw_new(self, canvas: TiledSurface) -> None:
+        """Draw the points added since the last call, touching only the tiles they cover."""
+        points = self.points[self.last_drawn_index:]
+        bounds = self.pen.ink_extents(points)
+        if bounds:
+            canvas.draw(bounds, lambda cr: self.pen.draw(cr, points))
+        self.last_drawn_index = len(self.points) - 1
+
+    def draw_new_to_layer(self, size: Vec2) -> None:
+        """
+        `draw_new` for pens that can't draw onto the shared cache: translucent
+        segments would build up where they overlap. They are drawn opaque onto
+        the stroke's own `layer` instead, which `draw_layer` paints with the
+        pen's alpha, so each frame only draws the new points.
+        """
+        if self.layer is None:
+            self.layer = TiledSurface(size)
+            self._opaque_pen = copy.copy(self.pen)
+            self._opaque_pen.color = (*self.pen.color[:3], 1)
+        points = self.points[self.last_drawn_index:]
+        bounds = self._opaque_pen.ink_extents(points)
+        if bounds:
+            self.layer.draw(bounds, lambda cr: self._opaque_pen.draw(cr, points))
+        self.last_drawn_index = len(self.points) - 1
+
+    def draw_layer(self, cr: cairo.Context) -> None:
+        """Paint the ink drawn by `draw_new_to_layer`; the whole stroke is drawn if there is none."""
+        if self.layer is None:
+            self.draw(cr)
+        else:
+            self.layer.paint(cr, alpha=self.pen.color[3])
+
 @dataclass
 class StrokeAction:
     stroke: 'Stroke'
     is_add : bool # false for deleted stroke, true for added stroke
 
 class StrokeManager:
-    def __init__(self) -> None:
+    def __init__(self, undo_horizon: Optional[int] = None, on_simplified: Optional[Callable[[], None]] = None) -> None:
+        """
+        undo_horizon: how many actions can be undone; None for unlimited.
+        on_simplified: called from a worker thread when simplified strokes are
+            ready; the owner should then call `apply_simplified` on its own thread.
+        """
         self.current_strokes = {}      # slot -> Stroke
-        self.completed_strokes = []    # List[Stroke]
+        self.completed_strokes = []    # List[Stroke], only ever appended to through _append_completed
+        self._sequence = itertools.count()
         self.undo_stack: list[StrokeAction] = []
         self.redo_stack: list[StrokeAction] = []
-        self.require_redraw = False
-
-    def start_stroke(self, slot: int, point: Vec2, pen: Pen) -> None:
+        self.undo_horizon = undo_horizon
+        self.damage: Optional[Rect] = None  # area of the cache surface that is out of date
+        self.invalidated_from: Optional[int] = None  # lowest index in completed_strokes that changed
+        self.segment_index = SegmentGrid()  # segments of non-temporary strokes, for the eraser
+        self.on_simplified = on_simplified
+        self._simplifier: Optional[ThreadPoolExecutor] = None
+        self._simplified: List[Tuple['Stroke', Tuple[PointBuffer, Optional[array]]]] = []
+        self._simplified_lock = threading.Lock()
+
+    def start_stroke(self, slot: int, point: Vec2, pen: Pen, time: Optional[int] = None) -> None:
         stroke = Stroke(pen)
-        stroke.add_point(point)
+        stroke.add_point(point, time)
         self.current_strokes[slot] = stroke
+        if not pen.is_temporary:
+            self.segment_index.add(stroke)
 
-    def update_stroke(self, slot: int, point: Vec2) -> None:
+    def update_stroke(self, slot: int, point: Vec2, time: Optional[int] = None) -> None:
         if slot in self.current_strokes:
             stroke = self.current_strokes[slot]
-            stroke.add_point(point)
+            stroke.add_point(point, time)
+            self.segment_index.extend(stroke)
             # Eraser: erase intersecting strokes
             if isinstance(stroke.pen, Eraser):
                 deletedStroke = stroke.pen.erase_stroke_at_point(point, self)
                 if deletedStroke:
-                    self.undo_stack.append(StrokeAction(deletedStroke, False))
+                    self._push_undo(StrokeAction(deletedStroke, False))
                     self.redo_stack.clear()
 
     def end_stroke(self, slot: int) -> None:
@@ -230,20 +521,203 @@ class StrokeManager:
             # temporary pen: just gets erased
             if not self.current_strokes[slot].pen.is_temporary:
                 stroke = self.current_strokes[slot]
-                self.completed_strokes.append(stroke)
-                self.undo_stack.append(StrokeAction(stroke, True))
+                stroke.finished = True
+                stroke.layer = stroke._opaque_pen = None
+                self._append_completed(stroke)
+                self.segment_index.commit(stroke)
+                self._push_undo(StrokeAction(stroke, True))
                 self.redo_stack.clear()
+                # repaint it in one go, replacing the incremental segments or the on-screen preview
+                self.add_damage(stroke)
+                if stroke.pen.simplify_tolerance > 0 and len(stroke.points) > 2:
+                    self._simplify_later(stroke)
             del self.current_strokes[slot]
 
+    def _simplify_later(self, stroke: 'Stroke') -> None:
+        if self._simplifier is None:
+            self._simplifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simplify")
+        # the worker gets its own copy, the stroke can be redrawn meanwhile
+        data = array('f', stroke.points.data)
+        times = array('q', stroke.times) if stroke.times is not None else None
+        future = self._simplifier.submit(simplify, data, stroke.pen.simplify_tolerance, times)
+        future.add_done_callback(lambda future: self._on_simplify_done(stroke, future))
+
+    def _on_simplify_done(self, stroke: 'Stroke', future: Future) -> None:
+        with self._simplified_lock:
+            self._simplified.append((stroke, future.result()))
+        if self.on_simplified:
+            self.on_simplified()
+
+    def apply_simplified(self) -> bool:
+        """
+        Swap in the geometry of strokes simplified since the last call.
+        Returns True if a completed stroke changed, and the damage needs repainting.
+        """
+        with self._simplified_lock:
+            simplified, self._simplified = self._simplified, []
+
+        changed = False
+        for stroke, (points, times) in simplified:
+            instruments.count("simplify.strokes")
+            instruments.count("simplify.points_in", len(stroke.points))
+            instruments.count("simplify.points_out", len(points))
+
+            index = self.completed_index(stroke)
+            indexed = stroke in self.segment_index
+            if index is not None:
+                self.add_damage(stroke)
+                self._invalidate_from(index)
+            self.segment_index.remove(stroke)
+
+            stroke.replace_points(points, times)
+
+            if indexed:
+                self.segment_index.add(stroke, committed=True)
+            if index is not None:
+                self.add_damage(stroke)
+                changed = True
+        return changed
+
     def get_all_strokes(self) -> list['Stroke']:
         return self.completed_strokes + list(self.current_strokes.values())
+
+    def content_bounds(self) -> Optional[Rect]:
+        """Area painted by the strokes, from their cached ink bounds; None if nothing is painted."""
+        bounds = None
+        for stroke in self.get_all_strokes():
+            if not stroke.pen.is_temporary:
+                ink = stroke.ink_bounds()
+                if ink:
+                    bounds = ink.union(bounds)
+        return bounds
+
+    def snapshot(self) -> 'StrokeManager':
+        """
+        A copy of the drawing, strokes in progress included as completed
+        (but not those of temporary pens), that can be read from another
+        thread (e.g. to export it) while this one is still drawn on. Pens are
+        copied too, since they can be edited.
+        """
+        pens = {}  # id(pen) -> copy
+        snapshot = StrokeManager()
+        for stroke in self.get_all_strokes():
+            if stroke.pen.is_temporary:
+                continue
+            pen = pens.get(id(stroke.pen))
+            if pen is None:
+                pen = pens[id(stroke.pen)] = copy.copy(stroke.pen)
+            snapshot._append_completed(stroke.snapshot(pen))
+        return snapshot
+
+    @property
+    def require_redraw(self) -> bool:
+        return self.damage is not None
+
+    def add_damage(self, stroke: 'Stroke') -> None:
+        bounds = stroke.ink_bounds()
+        if bounds:
+            self.damage = bounds.union(self.damage)
+
+    def take_damage(self) -> Optional[Rect]:
+        damage, self.damage = self.damage, None
+        return damage
+
+    def _invalidate_from(self, index: int) -> None:
+        if self.invalidated_from is None or index < self.invalidated_from:
+            self.invalidated_from = index
+
+    def take_invalidated_from(self) -> Optional[int]:
+        index, self.invalidated_from = self.invalidated_from, None
+        return index
+
+    def undoable_from(self) -> int:
+        """
+        Lowest index in completed_strokes that undo or redo can still remove.
+        Strokes below it only change through the eraser.
+        """
+        removable = {id(action.stroke) for action in self.undo_stack if action.is_add}
+        removable.update(id(action.stroke) for action in self.redo_stack if not action.is_add)
+        for i, stroke in enumerate(self.completed_strokes):
+            if id(stroke) in removable:
+                return i
+        return len(self.completed_strokes)
+
+    def _push_undo(self, action: StrokeAction) -> None:
+        self.undo_stack.append(action)
+        if self.undo_horizon is not None and len(self.undo_stack) > self.undo_horizon:
+            del self.undo_stack[:-self.undo_horizon]
+
+    def _append_completed(self, stroke: 'Stroke') -> None:
+        stroke.sequence = next(self._sequence)
+        self.completed_strokes.append(stroke)
+
+    def completed_index(self, stroke: 'Stroke') -> Optional[int]:
+        """Index of `stroke` in completed_strokes, or None; a binary search on the sequence numbers."""
+        i = bisect_left(self.completed_strokes, stroke.sequence, key=lambda stroke: stroke.sequence)
+        if i < len(self.completed_strokes) and self.completed_strokes[i] is stroke:
+            return i
+        return None
+
+    def remove_completed_stroke(self, index: int) -> 'Stroke':
+        stroke = self.completed_strokes.pop(index)
+        self.segment_index.remove(stroke)
+        self.add_damage(stroke)
+        self._invalidate_from(index)
+        return stroke
     
-    def draw(self, surface, scale=1) -> None:
+    def cached_strokes(self, first: int = 0) -> Iterator['Stroke']:
+        """
+        The strokes whose ink belongs on the cache canvas: completed ones from
+        index `first`, then the current ones drawn onto it as they grow.
+        Strokes in progress with a layer, or temporary, are painted over the
+        cache instead: drawn into it too, their alpha would apply twice.
+        """
+        current = (stroke for stroke in self.current_strokes.values()
+                   if stroke.pen.supports_incremental_drawing and not stroke.pen.is_temporary)
+        return itertools.chain(self.completed_strokes[first:], current)
+
+    def draw(self, surface, scale=1, region: Optional[Rect] = None, first: int = 0) -> None:
+        """
+        Draw the `cached_strokes(first)`. With `region` (in unscaled
+        coordinates), drawing is clipped to it and strokes that don't overlap
+        it are skipped.
+        """
         cr = cairo.Context(surface)
         cr.scale(scale, scale)
-        for stroke in self.get_all_strokes():
+        if region:
+            cr.rectangle(region.x0, region.y0, region.width, region.height)
+            cr.clip()
+
+        self.draw_strokes(cr, self.cached_strokes(first), region)
+
+    def draw_to_canvas(self, canvas: TiledSurface, region: Optional[Rect] = None, first: int = 0, progress: Progress = None) -> None:
+        """Same as `draw`, onto the tiles of `canvas`."""
+        self.draw_strokes_to_canvas(canvas, list(self.cached_strokes(first)), region, progress)
+
+    @staticmethod
+    def draw_strokes(cr: cairo.Context, strokes, region: Optional[Rect] = None) -> None:
+        for stroke in strokes:
+            if region:
+                bounds = stroke.ink_bounds()
+                if not bounds or not bounds.intersects(region):
+                    continue
             stroke.draw(cr)
-        self.require_redraw = False
+
+    @staticmethod
+    def draw_strokes_to_canvas(canvas: TiledSurface, strokes: List['Stroke'], region: Optional[Rect] = None, progress: Progress = None) -> None:
+        """
+        Draw `strokes` within `region` (default: wherever they have ink).
+        Each tile only replays the strokes that overlap it.
+        """
+        if region is None:
+            for stroke in strokes:
+                bounds = stroke.ink_bounds()
+                if bounds:
+                    region = bounds.union(region)
+            if region is None:
+                return
+
+        canvas.draw(region, lambda cr: StrokeManager.draw_strokes(cr, strokes, Rect(*cr.clip_extents())), progress)
 
     def undo(self) -> bool:
         if not self.undo_stack:
@@ -251,14 +725,16 @@ class StrokeManager:
         action = self.undo_stack.pop()
         if action.is_add:
             stroke = action.stroke
-            if stroke in self.completed_strokes:
-                idx = self.completed_strokes.index(stroke)
-                self.completed_strokes.pop(idx)
+            idx = self.completed_index(stroke)
+            if idx is not None:
+                self.remove_completed_stroke(idx)
                 self.redo_stack.append(StrokeAction(stroke, True))
                 return True
         else:
             stroke = action.stroke
-            self.completed_strokes.append(stroke)  # Always add to top
+            self._append_completed(stroke)  # Always add to top
+            self.segment_index.add(stroke, committed=True)
+            self.add_damage(stroke)
             self.redo_stack.append(StrokeAction(stroke, False))
             return True
         return False
@@ -269,19 +745,42 @@ class StrokeManager:
         action = self.redo_stack.pop()
         if action.is_add:
             stroke = action.stroke
-            self.completed_strokes.append(stroke)
-            self.undo_stack.append(StrokeAction(stroke, True))
+            self._append_completed(stroke)
+            self.segment_index.add(stroke, committed=True)
+            self.add_damage(stroke)
+            self._push_undo(StrokeAction(stroke, True))
             return True
         else:
             stroke = action.stroke
-            if stroke in self.completed_strokes:
-                self.completed_strokes.remove(stroke)
-            self.undo_stack.append(StrokeAction(stroke, False))
+            idx = self.completed_index(stroke)
+            if idx is not None:
+                self.remove_completed_stroke(idx)
+            self._push_undo(StrokeAction(stroke, False))
             return True
         return False
 
     def clear(self) -> None:
+        for stroke in self.get_all_strokes():
+            self.add_damage(stroke)
         self.completed_strokes.clear()
         self.current_strokes.clear()
+        self.segment_index.clear()
+        self._invalidate_from(0)
         self.undo_stack.clear()
         self.redo_stack.clear()
+
+    def load(self, strokes: List['Stroke']) -> None:
+        """
+        Replace the drawing with `strokes` (e.g. opened from a document), as
+        completed strokes that can't be undone. Strokes whose points aren't
+        loaded yet are indexed for the eraser by their bounds only.
+        """
+        self.clear()
+        for stroke in strokes:
+            self._append_completed(stroke)
+            bounds = stroke.ink_bounds()
+            if stroke.loaded or bounds is None:
+                self.segment_index.add(stroke, committed=True)
+            else:
+                self.segment_index.defer(stroke, bounds)
+            self.add_damage(stroke)
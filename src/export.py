@@ -0,0 +1,135 @@
+import os
+import uuid
+import threading
+from typing import Callable, Optional
+
+from vec2 import Vec2
+from rect import Rect
+from tiles import TiledSurface
+from drawing import StrokeManager
+from svg_writer import write_svg
+
+
+Progress = Optional[Callable[[float], None]]  # called with the fraction done; may raise to abort the export
+
+
+def export_area(stroke_manager: StrokeManager, size: Vec2, padding: Optional[float] = None) -> Rect:
+    """
+    The page of `size`, or with `padding`, the area the strokes paint grown by
+    `padding` on every side, within the page and on whole units. Found from
+    the ink bounds of the strokes, without rendering anything.
+    """
+    page = Rect(0, 0, *size)
+    if padding is None:
+        return page
+    content = stroke_manager.content_bounds()
+    if content is None:
+        return page
+    area = content.inflate(padding).to_pixels().intersection(page)
+    return page if area.is_empty() else area
+
+
+def export_svg(stroke_manager: StrokeManager, filename: str, size: Vec2, precision: int = 2, progress: Progress = None, padding: Optional[float] = None) -> None:
+    """
+    One <path> per stroke, coordinates rounded to `precision` decimals. With
+    `padding`, the document is cropped to the strokes, see `export_area`.
+    """
+    area = export_area(stroke_manager, size, padding)
+    with open(filename, "w", encoding="utf-8") as file:
+        write_svg(file, stroke_manager.get_all_strokes(), Vec2(area.width, area.height), precision,
+                  progress=progress and (lambda done, total: progress(done / total)),
+                  origin=Vec2(area.x0, area.y0))
+
+
+def export_png(stroke_manager: StrokeManager, filename: str, size: Vec2, scale: float = 4, compression_level: int = 6, progress: Progress = None, padding: Optional[float] = None) -> None:
+    """
+    Render at `scale` (any factor, e.g. 8 for print) one band of tiles at a
+    time, each streamed to the file as soon as it is drawn, so memory doesn't
+    grow with the size of the image. With `padding`, the image is cropped to
+    the strokes, see `export_area`.
+    """
+    area = export_area(stroke_manager, size, padding)
+    canvas = TiledSurface(Vec2(area.width, area.height), scale, origin=Vec2(area.x0, area.y0))
+    content = stroke_manager.content_bounds()
+
+    def render(band: Rect) -> None:
+        # bands without ink are written blank, without allocating tiles
+        if content and content.intersects(band):
+            stroke_manager.draw_to_canvas(canvas, region=content.intersection(band))
+
+    with open(filename, "wb") as file:
+        canvas.write_png(file, compression_level, progress=progress and (lambda done, total: progress(done / total)),
+                         render=render)
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportJob:
+    """
+    Runs `export(stroke_manager, filename, *args, **kwargs)` on a worker thread.
+    `stroke_manager` must not change meanwhile: pass a snapshot.
+
+    on_progress(fraction) and on_done(error) are called from the worker; error
+    is None on success, ExportCancelled after `cancel`. The export is written
+    to a temporary file of its own, moved over `filename` once complete: a
+    failed or cancelled export leaves no file behind, and can't clobber the
+    file another job writes.
+    """
+
+    def __init__(
+        self,
+        export: Callable[..., None],
+        stroke_manager: StrokeManager,
+        filename: str,
+        *args,
+        on_progress: Optional[Callable[[float], None]] = None,
+        on_done: Optional[Callable[[Optional[Exception]], None]] = None,
+        **kwargs,
+    ) -> None:
+        self.export = export
+        self.stroke_manager = stroke_manager
+        self.filename = filename
+        self.args = args
+        self.kwargs = kwargs
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Stop the export at its next progress step."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _progress(self, fraction: float) -> None:
+        if self._cancelled.is_set():
+            raise ExportCancelled()
+        if self.on_progress:
+            self.on_progress(fraction)
+
+    def _run(self) -> None:
+        error = None
+        # next to the target, so the rename stays on one filesystem
+        directory, name = os.path.split(os.path.abspath(self.filename))
+        temporary = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            self.export(self.stroke_manager, temporary, *self.args, progress=self._progress, **self.kwargs)
+            if self._cancelled.is_set():
+                raise ExportCancelled()
+            os.replace(temporary, self.filename)
+        except Exception as e:
+            error = e
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+        if self.on_done:
+            self.on_done(error)
@@ -0,0 +1,83 @@
+"""
+Render-node backend for the ink: a widget that builds its content in
+`do_snapshot` instead of a cairo draw function, so the GTK renderer (GL,
+Vulkan or cairo) composites it and can reuse nodes across frames.
+
+Tiles of the cache canvas become texture nodes, uploaded again only when
+the tile changes; strokes with a layer are its tiles under an opacity node.
+Anything else falls back to a cairo node.
+"""
+import weakref
+from typing import Callable, Dict, Iterable, Optional
+
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Graphene', '1.0')
+from gi.repository import Gtk, Gdk, Graphene
+
+from rect import Rect
+from tiles import TiledSurface, TileKey
+from png_writer import surface_to_texture
+from drawing import Stroke
+
+
+def graphene_rect(rect: Rect) -> Graphene.Rect:
+    return Graphene.Rect().init(rect.x0, rect.y0, rect.width, rect.height)
+
+
+class TextureCache:
+    """A texture per tile of the surfaces it is given, kept until the tile changes."""
+
+    def __init__(self) -> None:
+        self._textures: 'weakref.WeakKeyDictionary[TiledSurface, Dict[TileKey, Gdk.Texture]]' = weakref.WeakKeyDictionary()
+
+    def append(self, snapshot: Gtk.Snapshot, canvas: TiledSurface) -> None:
+        """Append the tiles of `canvas` to `snapshot`, as texture nodes in canvas units."""
+        textures = self._textures.setdefault(canvas, {})
+        for key in canvas.take_changed():
+            tile = canvas.tiles.get(key)
+            if tile is None:
+                textures.pop(key, None)
+            else:
+                textures[key] = surface_to_texture(tile)
+
+        for key, texture in textures.items():
+            area = canvas.tile_rect(key).scale(1 / canvas.scale).translate(*canvas.origin)
+            snapshot.append_texture(texture, graphene_rect(area))
+
+
+def snapshot_ink(snapshot: Gtk.Snapshot, textures: TextureCache, canvas: Optional[TiledSurface], strokes: Iterable[Stroke]) -> None:
+    """What `MainWindow.on_draw` paints, as render nodes: the cache canvas, then the in-progress `strokes`."""
+    if canvas:
+        textures.append(snapshot, canvas)
+
+    for stroke in strokes:
+        if stroke.pen.supports_incremental_drawing or stroke.pen.is_temporary:
+            continue
+        if stroke.layer is not None:
+            snapshot.push_opacity(stroke.pen.color[3])
+            textures.append(snapshot, stroke.layer)
+            snapshot.pop()
+            continue
+        bounds = stroke.ink_bounds()
+        if bounds:
+            stroke.draw(snapshot.append_cairo(graphene_rect(bounds)))
+
+
+class InkView(Gtk.Widget):
+    """
+    Gtk.DrawingArea's counterpart for render nodes: `set_snapshot_func(fn)`
+    has `fn(snapshot, width, height)` called whenever the widget is drawn.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._snapshot_func: Optional[Callable[[Gtk.Snapshot, int, int], None]] = None
+
+    def set_snapshot_func(self, snapshot_func: Optional[Callable[[Gtk.Snapshot, int, int], None]]) -> None:
+        self._snapshot_func = snapshot_func
+        self.queue_draw()
+
+    def do_snapshot(self, snapshot: Gtk.Snapshot) -> None:
+        if self._snapshot_func:
+            self._snapshot_func(snapshot, self.get_width(), self.get_height())
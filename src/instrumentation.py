@@ -0,0 +1,124 @@
+import os
+import json
+import atexit
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+
+METRICS_ENV = "TRACEPAD_METRICS"
+
+
+class Histogram:
+    """
+    HDR-style histogram of non-negative integers: log-linear buckets with a
+    relative precision of 1/`2**precision_bits` (under 1% by default), so
+    recording is O(1) and memory stays bounded whatever the value range.
+    """
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        self.precision_bits = precision_bits
+        self.counts: Dict[Tuple[int, int], int] = defaultdict(int)  # (exponent, mantissa) -> count
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.sum = 0
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        exponent = max(value.bit_length() - self.precision_bits - 1, 0)
+        self.counts[(exponent, value >> exponent)] += 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p: float) -> Optional[int]:
+        """Lowest value of the bucket holding the `p`-th percentile, p in [0, 100]."""
+        if not self.total:
+            return None
+        rank = max(1, round(p / 100 * self.total))
+        seen = 0
+        for exponent, mantissa in sorted(self.counts, key=lambda key: key[1] << key[0]):
+            seen += self.counts[(exponent, mantissa)]
+            if seen >= rank:
+                return mantissa << exponent
+        return self.max
+
+    def summary(self, scale: float = 1) -> dict:
+        """count, min, mean, p50, p95, p99 and max, each value multiplied by `scale`."""
+        if not self.total:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "min": self.min * scale,
+            "mean": self.sum / self.total * scale,
+            "p50": self.percentile(50) * scale,
+            "p95": self.percentile(95) * scale,
+            "p99": self.percentile(99) * scale,
+            "max": self.max * scale,
+        }
+
+
+class Instrumentation:
+    """
+    Process-wide counters and histograms, safe to update from any thread.
+    Ratios between two counters (e.g. points in / points out) are derived
+    when reported. Histogram values are recorded as integers (e.g. µs) and
+    reported multiplied by the scale set for their name prefix (e.g. to ms).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = defaultdict(int)
+        self.ratios: Dict[str, Tuple[str, str]] = {}
+        self.histograms: Dict[str, Histogram] = defaultdict(Histogram)
+        self.histogram_scales: Dict[str, float] = {}
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def record(self, name: str, value: int) -> None:
+        with self._lock:
+            self.histograms[name].record(value)
+
+    def add_ratio(self, name: str, numerator: str, denominator: str) -> None:
+        self.ratios[name] = (numerator, denominator)
+
+    def set_histogram_scale(self, prefix: str, scale: float) -> None:
+        """Report histograms whose name starts with `prefix` multiplied by `scale`."""
+        self.histogram_scales[prefix] = scale
+
+    def histogram_summary(self, name: str) -> dict:
+        scale = next((s for prefix, s in self.histogram_scales.items() if name.startswith(prefix)), 1)
+        with self._lock:
+            return self.histograms[name].summary(scale)
+
+    def report(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            names = list(self.histograms)
+        ratios = {
+            name: counters.get(numerator, 0) / counters[denominator]
+            for name, (numerator, denominator) in self.ratios.items()
+            if counters.get(denominator)
+        }
+        histograms = {name: self.histogram_summary(name) for name in names}
+        return {"counters": counters, "ratios": ratios, "histograms": histograms}
+
+    def dump(self, filename: str) -> None:
+        with open(filename, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def dump_at_exit(self) -> None:
+        """If $TRACEPAD_METRICS names a file, write the report there when the process exits."""
+        filename = os.environ.get(METRICS_ENV)
+        if filename:
+            atexit.register(self.dump, filename)
+
+
+instruments = Instrumentation()
+instruments.add_ratio("simplify.compression_ratio", "simplify.points_in", "simplify.points_out")
+instruments.add_ratio("prediction.mean_error_px", "prediction.error_px", "prediction.samples")
+instruments.set_histogram_scale("latency.", 1e-3)  # recorded in µs, reported in ms
@@ -0,0 +1,90 @@
+import sys
+import zlib
+import struct
+from typing import BinaryIO
+
+import cairo
+import gi
+gi.require_version('Gdk', '4.0')
+from gi.repository import Gdk, GLib
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# cairo's ARGB32 is a native-endian 32-bit word, premultiplied
+CAIRO_ARGB32_FORMAT = (
+    Gdk.MemoryFormat.B8G8R8A8_PREMULTIPLIED if sys.byteorder == "little"
+    else Gdk.MemoryFormat.A8R8G8B8_PREMULTIPLIED
+)
+
+
+class PngWriter:
+    """
+    Streaming 8-bit RGBA PNG encoder: rows are compressed and written as
+    they come, so the whole image never has to be in memory at once.
+    """
+
+    def __init__(self, file: BinaryIO, width: int, height: int, compression_level: int = 6) -> None:
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression_level)
+        self._blank_row = b"\x00" + bytes(width * 4)
+
+        file.write(PNG_SIGNATURE)
+        # bit depth 8, color type 6 (RGBA), default compression/filter, no interlace
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+    def write_rows(self, rgba: bytes, stride: int, rows: int) -> None:
+        """Write `rows` rows of non-premultiplied RGBA, `stride` bytes apart."""
+        row_size = self.width * 4
+        data = bytearray()
+        for i in range(rows):
+            data += b"\x00"  # filter type: none
+            data += rgba[i * stride:i * stride + row_size]
+        self._write_data(data)
+
+    def write_blank_rows(self, rows: int) -> None:
+        self._write_data(self._blank_row * rows)
+
+    def close(self) -> None:
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}")
+        self._write_chunk(b"IDAT", self._compressor.flush())
+        self._write_chunk(b"IEND", b"")
+
+    def _write_data(self, data: bytes) -> None:
+        self.rows_written += len(data) // (self.width * 4 + 1)
+        compressed = self._compressor.compress(bytes(data))
+        if compressed:
+            self._write_chunk(b"IDAT", compressed)
+
+    def _write_chunk(self, kind: bytes, payload: bytes) -> None:
+        self.file.write(struct.pack(">I", len(payload)))
+        self.file.write(kind)
+        self.file.write(payload)
+        self.file.write(struct.pack(">I", zlib.crc32(payload, zlib.crc32(kind))))
+
+
+def surface_to_texture(surface: cairo.ImageSurface) -> Gdk.Texture:
+    """A copy of a cairo ARGB32 surface as a GDK texture."""
+    surface.flush()
+    return Gdk.MemoryTexture.new(
+        surface.get_width(),
+        surface.get_height(),
+        CAIRO_ARGB32_FORMAT,
+        GLib.Bytes.new(bytes(surface.get_data())),
+        surface.get_stride(),
+    )
+
+
+def surface_to_rgba(surface: cairo.ImageSurface):
+    """
+    Convert a cairo ARGB32 surface to non-premultiplied RGBA bytes.
+    Returns (data, stride). The conversion runs in GDK, not per pixel in Python.
+    """
+    downloader = Gdk.TextureDownloader.new(surface_to_texture(surface))
+    downloader.set_format(Gdk.MemoryFormat.R8G8B8A8)
+    data, stride = downloader.download_bytes()
+    return data.get_data(), stride
@@ -0,0 +1,124 @@
+from array import array
+from typing import Iterable, Iterator, Tuple, Union
+
+from vec2 import Vec2
+
+
+class PointSequence:
+    """
+    Read-only sequence of points backed by an interleaved x, y array.
+
+    Indexing returns a `Vec2`; slicing returns a `PointSlice` view without
+    copying. Hot paths should use `coords()` / `coord()`, which yield plain
+    (x, y) tuples and allocate no `Vec2` at all.
+    """
+    __slots__ = ()
+
+    def _span(self) -> Tuple[array, int, int]:
+        """(backing array, first point, end point)"""
+        raise NotImplementedError
+
+    def _buffer(self) -> 'PointBuffer':
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        _, start, stop = self._span()
+        return stop - start
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Vec2, 'PointSlice']:
+        if isinstance(index, slice):
+            _, start, stop = self._span()
+            first, last, step = index.indices(stop - start)
+            if step != 1:
+                raise ValueError("point slices must be contiguous")
+            return PointSlice(self._buffer(), start + first, start + max(first, last))
+        return Vec2(*self.coord(index))
+
+    def __iter__(self) -> Iterator[Vec2]:
+        for x, y in self.coords():
+            yield Vec2(x, y)
+
+    def coord(self, index: int) -> Tuple[float, float]:
+        data, start, stop = self._span()
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError("point index out of range")
+        i = 2 * (start + index)
+        return data[i], data[i + 1]
+
+    def coords(self) -> Iterator[Tuple[float, float]]:
+        """
+        (x, y) pairs, read straight from the backing array. The buffer cannot
+        grow while the iterator is alive, so consume it right away.
+        """
+        data, start, stop = self._span()
+        values = iter(memoryview(data)[2 * start:2 * stop])
+        return zip(values, values)
+
+
+class PointBuffer(PointSequence):
+    """
+    Growable point storage: two float32 values per point, no object per point.
+    Slices taken from it are views, and go stale once points are removed.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, points: Iterable[Vec2] = ()) -> None:
+        self.data = array('f')
+        for x, y in points:
+            self.append(x, y)
+
+    @classmethod
+    def from_array(cls, data: array) -> 'PointBuffer':
+        """Wrap `data`, interleaved x, y float32 values, without copying it."""
+        buffer = cls()
+        buffer.data = data
+        return buffer
+
+    def _span(self) -> Tuple[array, int, int]:
+        return self.data, 0, len(self.data) // 2
+
+    def _buffer(self) -> 'PointBuffer':
+        return self
+
+    def append(self, x: float, y: float) -> None:
+        self.data.append(x)
+        self.data.append(y)
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        n = len(self)
+        if isinstance(index, slice):
+            first, last, step = index.indices(n)
+            if step != 1:
+                raise ValueError("point slices must be contiguous")
+            del self.data[2 * first:2 * max(first, last)]
+            return
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("point index out of range")
+        del self.data[2 * index:2 * index + 2]
+
+    @property
+    def memory_used(self) -> int:
+        return self.data.buffer_info()[1] * self.data.itemsize
+
+
+class PointSlice(PointSequence):
+    """Contiguous view of points [start, stop) of a `PointBuffer`."""
+    __slots__ = ("buffer", "start", "stop")
+
+    def __init__(self, buffer: PointBuffer, start: int, stop: int) -> None:
+        self.buffer = buffer
+        self.start = start
+        self.stop = stop
+
+    def _span(self) -> Tuple[array, int, int]:
+        return self.buffer.data, self.start, self.stop
+
+    def _buffer(self) -> PointBuffer:
+        return self.buffer
@@ -0,0 +1,94 @@
+import math
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from vec2 import Vec2
+from instrumentation import instruments
+
+
+Sample = Tuple[float, float, float]  # time (s), x, y
+
+
+class StrokePredictor:
+    """
+    Extrapolates each active contact a little ahead of its last known
+    position, from its velocity and acceleration over the last samples, to
+    hide the input-to-ink latency. Predictions are display-only: they are
+    drawn over the in-progress strokes and never become stroke points.
+
+    horizon_frames: how far ahead to predict, in display frames; 0 disables.
+    max_distance: cap on the predicted segment length, in px.
+
+    Every prediction is checked against the position actually reached at
+    its target time; the error is counted in the instrumentation.
+    """
+
+    def __init__(self, horizon_frames: float = 1, max_distance: float = 40) -> None:
+        self.horizon_frames = horizon_frames
+        self.max_distance = max_distance
+        self._samples: Dict[int, Deque[Sample]] = {}
+        self._pending: Dict[int, Deque[Sample]] = {}  # predictions not yet checked: target time, x, y
+        self.predictions: Dict[int, Vec2] = {}
+
+    def observe(self, slot: int, point: Vec2, time: float, frame_interval: float) -> None:
+        """Record where `slot` is at `time` (seconds) and predict where it will be."""
+        samples = self._samples.setdefault(slot, deque(maxlen=3))
+        if samples and time <= samples[-1][0]:
+            return
+        samples.append((time, point.x, point.y))
+        self._check(slot, samples)
+
+        predicted = self._extrapolate(samples, self.horizon_frames * frame_interval)
+        if predicted is None:
+            self.predictions.pop(slot, None)
+            return
+        self.predictions[slot] = predicted
+        self._pending.setdefault(slot, deque(maxlen=8)).append(
+            (time + self.horizon_frames * frame_interval, predicted.x, predicted.y)
+        )
+
+    def remove(self, slot: int) -> None:
+        self._samples.pop(slot, None)
+        self._pending.pop(slot, None)
+        self.predictions.pop(slot, None)
+
+    def clear(self) -> None:
+        """Drop the displayed predictions, e.g. once input stops arriving."""
+        self.predictions.clear()
+        self._pending.clear()
+
+    def _extrapolate(self, samples: Deque[Sample], horizon: float) -> Optional[Vec2]:
+        if horizon <= 0 or len(samples) < 2:
+            return None
+
+        t1, x1, y1 = samples[-2]
+        t2, x2, y2 = samples[-1]
+        vx, vy = (x2 - x1) / (t2 - t1), (y2 - y1) / (t2 - t1)
+        ax = ay = 0.0
+        if len(samples) == 3:
+            t0, x0, y0 = samples[0]
+            v0x, v0y = (x1 - x0) / (t1 - t0), (y1 - y0) / (t1 - t0)
+            dt = (t2 - t0) / 2
+            ax, ay = (vx - v0x) / dt, (vy - v0y) / dt
+
+        dx = vx * horizon + ax * horizon * horizon / 2
+        dy = vy * horizon + ay * horizon * horizon / 2
+        distance = math.hypot(dx, dy)
+        if distance > self.max_distance:
+            dx, dy = dx * self.max_distance / distance, dy * self.max_distance / distance
+        return Vec2(x2 + dx, y2 + dy)
+
+    def _check(self, slot: int, samples: Deque[Sample]) -> None:
+        pending = self._pending.get(slot)
+        if not pending or len(samples) < 2:
+            return
+
+        t1, x1, y1 = samples[-2]
+        t2, x2, y2 = samples[-1]
+        while pending and pending[0][0] <= t2:
+            target, px, py = pending.popleft()
+            # actual position at the target time, interpolated between the samples around it
+            f = max(0.0, min(1.0, (target - t1) / (t2 - t1)))
+            error = math.hypot(x1 + (x2 - x1) * f - px, y1 + (y2 - y1) * f - py)
+            instruments.count("prediction.samples")
+            instruments.count("prediction.error_px", error)
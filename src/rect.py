@@ -0,0 +1,59 @@
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class Rect:
+    """Axis-aligned rectangle given by its min (x0, y0) and max (x1, y1) corners."""
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+    def __repr__(self) -> str:
+        return f"Rect(x0={self.x0}, y0={self.y0}, x1={self.x1}, y1={self.y1})"
+
+    @property
+    def width(self) -> float:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> float:
+        return self.y1 - self.y0
+
+    def is_empty(self) -> bool:
+        return self.x1 <= self.x0 or self.y1 <= self.y0
+
+    def copy(self) -> 'Rect':
+        return Rect(self.x0, self.y0, self.x1, self.y1)
+
+    def include_point(self, x: float, y: float) -> None:
+        """Grow this rectangle in place to contain (x, y)."""
+        self.x0 = min(self.x0, x)
+        self.y0 = min(self.y0, y)
+        self.x1 = max(self.x1, x)
+        self.y1 = max(self.y1, y)
+
+    def union(self, other: Optional['Rect']) -> 'Rect':
+        if other is None:
+            return self.copy()
+        return Rect(min(self.x0, other.x0), min(self.y0, other.y0), max(self.x1, other.x1), max(self.y1, other.y1))
+
+    def intersection(self, other: 'Rect') -> 'Rect':
+        return Rect(max(self.x0, other.x0), max(self.y0, other.y0), min(self.x1, other.x1), min(self.y1, other.y1))
+
+    def intersects(self, other: 'Rect') -> bool:
+        return self.x0 < other.x1 and other.x0 < self.x1 and self.y0 < other.y1 and other.y0 < self.y1
+
+    def inflate(self, margin: float) -> 'Rect':
+        return Rect(self.x0 - margin, self.y0 - margin, self.x1 + margin, self.y1 + margin)
+
+    def translate(self, dx: float, dy: float) -> 'Rect':
+        return Rect(self.x0 + dx, self.y0 + dy, self.x1 + dx, self.y1 + dy)
+
+    def scale(self, factor: float) -> 'Rect':
+        return Rect(self.x0 * factor, self.y0 * factor, self.x1 * factor, self.y1 * factor)
+
+    def to_pixels(self) -> 'Rect':
+        """Smallest rectangle with integer corners that contains this one."""
+        return Rect(math.floor(self.x0), math.floor(self.y0), math.ceil(self.x1), math.ceil(self.y1))
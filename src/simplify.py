@@ -0,0 +1,57 @@
+from array import array
+from typing import List, Optional, Tuple
+
+from points import PointBuffer
+
+
+def rdp_indices(data: array, tolerance: float) -> List[int]:
+    """
+    Ramer–Douglas–Peucker over interleaved x, y values: indices of the points
+    to keep so that no dropped point is further than `tolerance` from the
+    simplified polyline. Distances are to the segment, not its line, so
+    strokes that double back on themselves keep their turning points.
+    """
+    n = len(data) // 2
+    if n < 3:
+        return list(range(n))
+
+    keep = bytearray(n)
+    keep[0] = keep[n - 1] = 1
+    tolerance2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = data[2 * first], data[2 * first + 1]
+        abx, aby = data[2 * last] - ax, data[2 * last + 1] - ay
+        ab_len2 = abx * abx + aby * aby
+
+        farthest, farthest_d2 = -1, tolerance2
+        for i in range(first + 1, last):
+            apx, apy = data[2 * i] - ax, data[2 * i + 1] - ay
+            if ab_len2:
+                t = max(0, min(1, (apx * abx + apy * aby) / ab_len2))
+                apx, apy = apx - abx * t, apy - aby * t
+            d2 = apx * apx + apy * apy
+            if d2 > farthest_d2:
+                farthest, farthest_d2 = i, d2
+
+        if farthest >= 0:
+            keep[farthest] = 1
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [i for i in range(n) if keep[i]]
+
+
+def simplify(data: array, tolerance: float, times: Optional[array] = None) -> Tuple[PointBuffer, Optional[array]]:
+    """
+    The points of `data` (interleaved x, y) that `rdp_indices` keeps, and
+    their entries of `times` (one per point) if given.
+    """
+    indices = rdp_indices(data, tolerance)
+    simplified = PointBuffer()
+    for i in indices:
+        simplified.append(data[2 * i], data[2 * i + 1])
+    if times is not None:
+        times = array(times.typecode, (times[i] for i in indices))
+    return simplified, times
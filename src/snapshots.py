@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from vec2 import Vec2
+from tiles import TiledSurface
+
+
+@dataclass
+class _Render:
+    """A checkpoint being rendered, see `SnapshotCache.begin`."""
+    count: int
+    base: bool
+    canvas: TiledSurface
+    drawn: int  # strokes on `canvas` so far
+
+
+class SnapshotCache:
+    """
+    Raster checkpoints of the committed strokes.
+
+    A checkpoint at `k` is the cache canvas as rendered from the first `k`
+    completed strokes, so a rebuild can start from the nearest checkpoint and
+    replay only the strokes after it. Checkpoints are taken every `interval`
+    strokes and evicted least-recently-used once they exceed `memory_budget`
+    bytes. The base layer is a checkpoint that is never evicted: it flattens
+    the strokes that can no longer be undone.
+
+    Checkpoints are built on one another copy-on-write, so tiles that did not
+    change between two checkpoints are stored (and counted) once.
+    """
+
+    def __init__(self, size: Vec2, interval: int = 32, memory_budget: int = 128 * 1024 * 1024) -> None:
+        self.size = size
+        self.interval = interval
+        self.memory_budget = memory_budget
+        self.base: Optional[Tuple[int, TiledSurface]] = None
+        self._checkpoints: 'OrderedDict[int, TiledSurface]' = OrderedDict()  # least recently used first
+        self._render: Optional[_Render] = None
+        self._rejected: Optional[int] = None  # count of the last checkpoint too large for the budget
+
+    @property
+    def memory_used(self) -> int:
+        canvases = list(self._checkpoints.values())
+        if self.base:
+            canvases.append(self.base[1])
+        tiles = {id(tile): tile for canvas in canvases for tile in canvas.tiles.values()}
+        return sum(tile.get_stride() * tile.get_height() for tile in tiles.values())
+
+    def nearest(self, count: int) -> Tuple[int, Optional[TiledSurface]]:
+        """The checkpoint covering the most strokes, but no more than `count`; (0, None) if none."""
+        best_k, best = self.base if self.base and self.base[0] <= count else (0, None)
+        for k in self._checkpoints:
+            if best_k < k <= count:
+                best_k, best = k, self._checkpoints[k]
+        if best_k in self._checkpoints:
+            self._checkpoints.move_to_end(best_k)
+        return best_k, best
+
+    def latest(self) -> int:
+        return max(self._checkpoints, default=self.base[0] if self.base else 0)
+
+    def next_checkpoint(self, count: int) -> Optional[int]:
+        """
+        The checkpoint to take with `count` strokes, or None if the latest is
+        recent enough. Once one was too large for the budget, none is taken
+        until strokes before it change: later ones would only be larger.
+        """
+        if self._rejected is not None or count - self.latest() < self.interval:
+            return None
+        return count - count % self.interval
+
+    def store(self, count: int, canvas: TiledSurface) -> bool:
+        """
+        Returns False if the budget is too small to keep even this checkpoint;
+        `next_checkpoint` then stops asking for more.
+        """
+        self._checkpoints[count] = canvas
+        self._checkpoints.move_to_end(count)
+        while self._checkpoints and self.memory_used > self.memory_budget:
+            self._checkpoints.popitem(last=False)
+        if count not in self._checkpoints:
+            self._rejected = count
+            return False
+        return True
+
+    def set_base(self, count: int, canvas: TiledSurface) -> None:
+        self.base = (count, canvas)
+        # checkpoints below the base are never the nearest one again
+        for k in [k for k in self._checkpoints if k <= count]:
+            del self._checkpoints[k]
+
+    def invalidate_from(self, index: int) -> None:
+        """Drop every checkpoint that includes the stroke at `index` or any after it."""
+        for k in [k for k in self._checkpoints if k > index]:
+            del self._checkpoints[k]
+        if self.base and self.base[0] > index:
+            self.base = None
+        if self._render and self._render.count > index:
+            self._render = None
+        if self._rejected is not None and self._rejected > index:
+            self._rejected = None
+
+    def clear(self) -> None:
+        self._checkpoints.clear()
+        self.base = None
+        self._render = None
+        self._rejected = None
+
+    @property
+    def rendering(self) -> bool:
+        return self._render is not None
+
+    def begin(self, count: int, base: bool = False) -> None:
+        """
+        Start rendering the checkpoint for the first `count` strokes (the base
+        layer if `base`) from the nearest checkpoint; `step` draws the rest.
+        """
+        k, snapshot = self.nearest(count)
+        canvas = snapshot.snapshot() if snapshot else TiledSurface(self.size)
+        self._render = _Render(count, base, canvas, k)
+
+    def step(self, draw_strokes: Callable[[TiledSurface, int, int], None], max_strokes: int) -> bool:
+        """
+        `draw_strokes(canvas, first, last)` at most `max_strokes` more strokes
+        of the checkpoint begun, then keep it once complete. Returns False if
+        it was complete but the budget is too small to keep it.
+        """
+        render = self._render
+        last = min(render.count, render.drawn + max_strokes)
+        draw_strokes(render.canvas, render.drawn, last)
+        render.drawn = last
+        if last < render.count:
+            return True
+
+        self._render = None
+        if render.base:
+            self.set_base(render.count, render.canvas)
+            return True
+        return self.store(render.count, render.canvas)
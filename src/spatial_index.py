@@ -0,0 +1,163 @@
+import math
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set, Tuple
+
+from vec2 import Vec2
+from rect import Rect
+
+if TYPE_CHECKING:
+    from drawing import Stroke
+
+
+Cell = Tuple[int, int]
+
+
+class SegmentGrid:
+    """
+    Uniform grid over the segments of strokes, for eraser hit-testing.
+
+    Every segment (points[i], points[i+1]) is registered in each cell its
+    bounding box overlaps, so a query only looks at segments in the cells
+    around the query point instead of every segment of every stroke.
+
+    Strokes can be indexed while they are still being drawn (`add`, then
+    `extend` as points arrive); only strokes marked with `commit` are
+    returned by `query`.
+
+    Committed strokes can also be deferred: registered by their bounds only,
+    their segments are indexed (and their points loaded) the first time a
+    query comes near them.
+    """
+
+    def __init__(self, cell_size: float = 32) -> None:
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Dict['Stroke', List[int]]] = defaultdict(dict)
+        self._stroke_cells: Dict['Stroke', Set[Cell]] = {}
+        self._indexed_points: Dict['Stroke', int] = {}
+        self._committed: Set['Stroke'] = set()
+        self._deferred_cells: Dict[Cell, Set['Stroke']] = defaultdict(set)
+        self._deferred: Dict['Stroke', List[Cell]] = {}
+
+    def __contains__(self, stroke: 'Stroke') -> bool:
+        return stroke in self._indexed_points or stroke in self._deferred
+
+    def __len__(self) -> int:
+        return len(self._indexed_points) + len(self._deferred)
+
+    def defer(self, stroke: 'Stroke', bounds: Rect) -> None:
+        """Index a committed stroke by `bounds`, a rectangle containing all its segments."""
+        if stroke in self:
+            return
+        cells = list(self._cells_for(bounds.x0, bounds.y0, bounds.x1, bounds.y1))
+        for cell in cells:
+            self._deferred_cells[cell].add(stroke)
+        self._deferred[stroke] = cells
+
+    def _undefer(self, stroke: 'Stroke') -> None:
+        for cell in self._deferred.pop(stroke):
+            bucket = self._deferred_cells[cell]
+            bucket.discard(stroke)
+            if not bucket:
+                del self._deferred_cells[cell]
+
+    def add(self, stroke: 'Stroke', committed: bool = False) -> None:
+        if stroke in self._indexed_points:
+            return
+        if stroke in self._deferred:
+            self._undefer(stroke)
+        self._indexed_points[stroke] = 0
+        self._stroke_cells[stroke] = set()
+        self.extend(stroke)
+        if committed:
+            self.commit(stroke)
+
+    def extend(self, stroke: 'Stroke') -> None:
+        """Index the segments added to `stroke` since the last call."""
+        indexed = self._indexed_points.get(stroke)
+        if indexed is None:
+            return
+
+        n = len(stroke.points)
+        if n <= indexed:
+            return
+
+        data = stroke.points.data
+        stroke_cells = self._stroke_cells[stroke]
+        for i in range(max(indexed - 1, 0), n - 1):
+            x1, y1, x2, y2 = data[2 * i:2 * i + 4]
+            for cell in self._cells_for(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+                self._cells[cell].setdefault(stroke, []).append(i)
+                stroke_cells.add(cell)
+        self._indexed_points[stroke] = n
+
+    def commit(self, stroke: 'Stroke') -> None:
+        if stroke in self._indexed_points:
+            self.extend(stroke)
+            self._committed.add(stroke)
+
+    def remove(self, stroke: 'Stroke') -> None:
+        if stroke in self._deferred:
+            self._undefer(stroke)
+        for cell in self._stroke_cells.pop(stroke, ()):
+            bucket = self._cells[cell]
+            bucket.pop(stroke, None)
+            if not bucket:
+                del self._cells[cell]
+        self._indexed_points.pop(stroke, None)
+        self._committed.discard(stroke)
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._stroke_cells.clear()
+        self._indexed_points.clear()
+        self._committed.clear()
+        self._deferred_cells.clear()
+        self._deferred.clear()
+
+    def query(self, point: Vec2, radius: float) -> Set['Stroke']:
+        """Committed strokes having a segment within `radius` of `point`."""
+        hits = set()
+        px, py = point.x, point.y
+        radius2 = radius * radius
+        cells = self._cells
+        query_cells = list(self._cells_for(px - radius, py - radius, px + radius, py + radius))
+        if self._deferred:
+            nearby = set()
+            for cell in query_cells:
+                nearby.update(self._deferred_cells.get(cell, ()))
+            for stroke in nearby:
+                self._undefer(stroke)
+                self.add(stroke, committed=True)
+        for cell in query_cells:
+            bucket = cells.get(cell)
+            if not bucket:
+                continue
+            for stroke, segments in bucket.items():
+                if stroke in hits or stroke not in self._committed:
+                    continue
+                data = stroke.points.data
+                for i in segments:
+                    if _segment_distance2(px, py, *data[2 * i:2 * i + 4]) <= radius2:
+                        hits.add(stroke)
+                        break
+        return hits
+
+    def _cells_for(self, x0: float, y0: float, x1: float, y1: float) -> Iterator[Cell]:
+        size = self.cell_size
+        cx0, cy0 = math.floor(x0 / size), math.floor(y0 / size)
+        cx1, cy1 = math.floor(x1 / size), math.floor(y1 / size)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield (cx, cy)
+
+
+def _segment_distance2(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """Squared distance from (px, py) to segment ab; `Vec2.distance_to_segment` without allocations."""
+    abx, aby = bx - ax, by - ay
+    apx, apy = px - ax, py - ay
+    ab_len2 = abx * abx + aby * aby
+    if ab_len2 == 0:
+        return apx * apx + apy * apy
+    t = max(0, min(1, (apx * abx + apy * aby) / ab_len2))
+    dx, dy = apx - abx * t, apy - aby * t
+    return dx * dx + dy * dy
@@ -0,0 +1,113 @@
+from typing import Dict, List, Sequence, TextIO
+
+from vec2 import Vec2
+from tiles import Progress
+from drawing import Stroke
+
+
+class SvgPathData:
+    """
+    Records the path a pen traces, through the subset of the cairo.Context
+    API that `Pen.trace_path` uses, as SVG path data in relative coordinates.
+
+    Coordinates are rounded to `precision` decimals before taking the
+    differences, so rounding errors don't accumulate along the path.
+    """
+
+    def __init__(self, precision: int = 2) -> None:
+        self.precision = precision
+        self.scale = 10 ** precision
+        self._format = f"{{:.{precision}f}}".format
+        self.parts: List[str] = []
+        self._x = self._y = 0  # current point, in 1/scale units
+        self._start = (0, 0)  # of the current subpath
+        self._command = None
+        self._after_number = False
+
+    def move_to(self, x: float, y: float) -> None:
+        self._to("m", x, y)
+        self._start = (self._x, self._y)
+        self._command = "l"  # coordinate pairs after a moveto are implicit linetos
+
+    def line_to(self, x: float, y: float) -> None:
+        self._to("l", x, y)
+
+    def close_path(self) -> None:
+        self.parts.append("z")
+        self._x, self._y = self._start
+        self._command = None
+        self._after_number = False
+
+    def new_path(self) -> None:
+        pass
+
+    def _to(self, command: str, x: float, y: float) -> None:
+        scale = self.scale
+        qx, qy = round(x * scale), round(y * scale)
+        parts = self.parts
+        if command != self._command:
+            parts.append(command)
+            self._command = command
+            self._after_number = False
+
+        for value in (qx - self._x, qy - self._y):
+            if value % scale:
+                text = self._format(value / scale).rstrip("0")
+            else:
+                text = str(value // scale)
+            # a minus sign separates numbers by itself
+            if self._after_number and text[0] != "-":
+                text = " " + text
+            parts.append(text)
+            self._after_number = True
+        self._x, self._y = qx, qy
+
+    def __str__(self) -> str:
+        return "".join(self.parts)
+
+
+def write_svg(
+    file: TextIO,
+    strokes: Sequence[Stroke],
+    size: Vec2,
+    precision: int = 2,
+    chunk_size: int = 1 << 16,
+    progress: Progress = None,
+    origin: Vec2 = Vec2(0, 0),
+) -> None:
+    """
+    Write `strokes` as an SVG document of `size` units from `origin`, one
+    <path> per stroke, styled by a CSS class per pen. Paths are traced and
+    written in chunks of about `chunk_size` characters as they go. Strokes of
+    temporary pens are skipped.
+    """
+    strokes = [stroke for stroke in strokes if not stroke.pen.is_temporary]
+    classes: Dict[int, str] = {}  # id(pen) -> class name
+    styles = []
+    for stroke in strokes:
+        if id(stroke.pen) not in classes:
+            classes[id(stroke.pen)] = f"p{len(classes)}"
+            styles.append(f".{classes[id(stroke.pen)]}{{{stroke.pen.svg_style()}}}\n")
+
+    width, height = size
+    chunk = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:g}" height="{height:g}" '
+        f'viewBox="{origin.x:g} {origin.y:g} {width:g} {height:g}">\n',
+        "<style>\n", *styles, "</style>\n",
+    ]
+    length = 0
+    for i, stroke in enumerate(strokes):
+        if progress:
+            progress(i, len(strokes))
+        if len(stroke.points) < 2:
+            continue
+        data = SvgPathData(precision)
+        stroke.pen.trace_path(data, stroke.points)
+        path = f'<path class="{classes[id(stroke.pen)]}" d="{data}"/>\n'
+        chunk.append(path)
+        length += len(path)
+        if length >= chunk_size:
+            file.write("".join(chunk))
+            chunk, length = [], 0
+    chunk.append("</svg>\n")
+    file.write("".join(chunk))
@@ -0,0 +1,252 @@
+import math
+import cairo
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from vec2 import Vec2
+from rect import Rect
+from png_writer import PngWriter, surface_to_rgba
+
+
+TILE_SIZE = 256
+
+TileKey = Tuple[int, int]
+Progress = Optional[Callable[[int, int], None]]  # called with (done, total) steps; may raise to abort
+
+
+class TiledSurface:
+    """
+    Canvas backing store made of fixed-size tiles, only allocated once ink
+    touches them, so memory follows the inked area rather than the canvas area.
+
+    Coordinates passed in are canvas (user) units; `scale` is the number of
+    device pixels per unit, e.g. 4 for a 4x export. The surface covers `size`
+    units from `origin`, e.g. only the inked area of the page for a cropped
+    export.
+
+    `snapshot()` shares tiles copy-on-write: a shared tile is cloned by
+    whichever side writes to it first.
+    """
+
+    def __init__(self, size: Vec2, scale: float = 1, tile_size: int = TILE_SIZE, origin: Vec2 = Vec2(0, 0)) -> None:
+        self.size = size
+        self.origin = origin
+        self.scale = scale
+        self.tile_size = tile_size
+        self.pixel_width = math.ceil(size.x * scale)
+        self.pixel_height = math.ceil(size.y * scale)
+        self.tiles: Dict[TileKey, cairo.ImageSurface] = {}
+        self._shared: Set[TileKey] = set()
+        self._changed: Optional[Set[TileKey]] = None  # tracked from the first take_changed()
+
+    @property
+    def memory_used(self) -> int:
+        return sum(tile.get_stride() * tile.get_height() for tile in self.tiles.values())
+
+    def tile_rect(self, key: TileKey) -> Rect:
+        """The tile's area, in device pixels."""
+        x, y = key[0] * self.tile_size, key[1] * self.tile_size
+        return Rect(x, y, min(x + self.tile_size, self.pixel_width), min(y + self.tile_size, self.pixel_height))
+
+    def tile_keys(self, rect: Optional[Rect] = None) -> Iterator[TileKey]:
+        """Keys of the tiles (allocated or not) overlapping `rect`, or the whole canvas."""
+        pixels = Rect(0, 0, self.pixel_width, self.pixel_height)
+        if rect is not None:
+            pixels = self._to_pixels(rect).intersection(pixels)
+            if pixels.is_empty():
+                return
+        size = self.tile_size
+        for ty in range(int(pixels.y0) // size, (int(pixels.y1) - 1) // size + 1):
+            for tx in range(int(pixels.x0) // size, (int(pixels.x1) - 1) // size + 1):
+                yield (tx, ty)
+
+    def draw(self, rect: Rect, draw_fn: Callable[[cairo.Context], None], progress: Progress = None) -> None:
+        """
+        Call `draw_fn(cr)` once for every tile overlapping `rect`, allocating
+        them as needed. `cr` is in canvas units and clipped to `rect`.
+        """
+        keys = list(self.tile_keys(rect))
+        for i, key in enumerate(keys):
+            cr = self._context(key, self._writable_tile(key))
+            cr.rectangle(rect.x0, rect.y0, rect.width, rect.height)
+            cr.clip()
+            draw_fn(cr)
+            if progress:
+                progress(i + 1, len(keys))
+
+    def clear(self, rect: Optional[Rect] = None) -> None:
+        """Clear `rect` (or everything); tiles it fully covers are freed."""
+        if rect is None:
+            if self._changed is not None:
+                self._changed.update(self.tiles)
+            self.tiles.clear()
+            self._shared.clear()
+            return
+
+        pixels = self._to_pixels(rect)
+        for key in list(self.tile_keys(rect)):
+            if key not in self.tiles:
+                continue
+            if self._covers(pixels, key):
+                self._drop(key)
+                continue
+            cr = self._context(key, self._writable_tile(key))
+            cr.rectangle(rect.x0, rect.y0, rect.width, rect.height)
+            cr.clip()
+            cr.set_operator(cairo.OPERATOR_CLEAR)
+            cr.paint()
+
+    def restore(self, rect: Rect, source: 'TiledSurface') -> None:
+        """Replace `rect` with the content of `source`, a surface of the same geometry."""
+        pixels = self._to_pixels(rect)
+        for key in list(self.tile_keys(rect)):
+            src = source.tiles.get(key)
+            if self._covers(pixels, key):
+                # Whole tile: share it instead of copying pixels
+                self._drop(key)
+                if src is not None:
+                    self.tiles[key] = src
+                    self._mark_changed(key)
+                    self._shared.add(key)
+                    source._shared.add(key)
+                continue
+
+            if src is None and key not in self.tiles:
+                continue
+            cr = self._context(key, self._writable_tile(key))
+            cr.rectangle(rect.x0, rect.y0, rect.width, rect.height)
+            cr.clip()
+            if src is not None:
+                # Both tiles share the same pixel grid
+                cr.identity_matrix()
+                cr.set_source_surface(src, 0, 0)
+                cr.set_operator(cairo.OPERATOR_SOURCE)
+            else:
+                cr.set_operator(cairo.OPERATOR_CLEAR)
+            cr.paint()
+
+    def paint(self, cr: cairo.Context, alpha: float = 1) -> None:
+        """Composite the allocated tiles onto `cr`, which is in canvas units, with opacity `alpha`."""
+        cr.save()
+        cr.translate(*self.origin)
+        cr.scale(1 / self.scale, 1 / self.scale)
+        for key, tile in self.tiles.items():
+            area = self.tile_rect(key)
+            cr.set_source_surface(tile, area.x0, area.y0)
+            cr.rectangle(area.x0, area.y0, area.width, area.height)
+            if alpha < 1:
+                cr.save()
+                cr.clip()
+                cr.paint_with_alpha(alpha)
+                cr.restore()
+            else:
+                cr.fill()
+        cr.restore()
+
+    def snapshot(self) -> 'TiledSurface':
+        """A copy of this surface; tiles are shared until either side writes to them."""
+        copy = TiledSurface(self.size, self.scale, self.tile_size, self.origin)
+        copy.tiles = dict(self.tiles)
+        copy._shared = set(self.tiles)
+        self._shared.update(self.tiles)
+        return copy
+
+    def take_changed(self) -> Set[TileKey]:
+        """
+        Keys of the tiles written, allocated or freed since the last call
+        (every allocated tile on the first), e.g. to update copies of them.
+        """
+        changed = set(self.tiles) if self._changed is None else self._changed
+        self._changed = set()
+        return changed
+
+    def write_png(
+        self,
+        file: BinaryIO,
+        compression_level: int = 6,
+        progress: Progress = None,
+        render: Optional[Callable[[Rect], None]] = None,
+    ) -> None:
+        """
+        Stream the surface as a PNG, one row of tiles at a time. Missing tiles
+        are transparent.
+
+        With `render`, rows are drawn just before they are written instead:
+        `render(area)` draws the row covering `area` (canvas units), and its
+        tiles are freed once written, so memory stays that of one row of tiles
+        whatever the size or scale of the image.
+        """
+        writer = PngWriter(file, self.pixel_width, self.pixel_height, compression_level)
+        size = self.tile_size
+        columns = range(math.ceil(self.pixel_width / size))
+        tile_rows = math.ceil(self.pixel_height / size)
+        for ty in range(tile_rows):
+            area = self.tile_rect((0, ty))
+            if render:
+                # tiles drawn past the row by rounding are dropped with it, and redrawn in their turn
+                self.clear()
+                render(Rect(0, area.y0, self.pixel_width, area.y1).scale(1 / self.scale).translate(*self.origin))
+            self._write_row(writer, ty, columns, area.height)
+            if progress:
+                progress(ty + 1, tile_rows)
+        if render:
+            self.clear()
+        writer.close()
+
+    def _write_row(self, writer: PngWriter, ty: int, columns: range, rows: int) -> None:
+        row_tiles = [self.tiles.get((tx, ty)) for tx in columns]
+        if not any(row_tiles):
+            writer.write_blank_rows(rows)
+            return
+
+        converted = [surface_to_rgba(tile) if tile else None for tile in row_tiles]
+        band = bytearray()
+        for y in range(rows):
+            for tx, tile in zip(columns, converted):
+                width = self.tile_rect((tx, ty)).width * 4
+                if tile is None:
+                    band += bytes(width)
+                else:
+                    data, stride = tile
+                    band += data[y * stride:y * stride + width]
+        writer.write_rows(band, self.pixel_width * 4, rows)
+
+    def _to_pixels(self, rect: Rect) -> Rect:
+        """Device pixels covering `rect`."""
+        return rect.translate(-self.origin.x, -self.origin.y).scale(self.scale).to_pixels()
+
+    def _covers(self, pixels: Rect, key: TileKey) -> bool:
+        area = self.tile_rect(key)
+        return pixels.x0 <= area.x0 and pixels.y0 <= area.y0 and pixels.x1 >= area.x1 and pixels.y1 >= area.y1
+
+    def _mark_changed(self, key: TileKey) -> None:
+        if self._changed is not None:
+            self._changed.add(key)
+
+    def _drop(self, key: TileKey) -> None:
+        self.tiles.pop(key, None)
+        self._shared.discard(key)
+        self._mark_changed(key)
+
+    def _writable_tile(self, key: TileKey) -> cairo.ImageSurface:
+        self._mark_changed(key)
+        tile = self.tiles.get(key)
+        if tile is not None and key not in self._shared:
+            return tile
+
+        area = self.tile_rect(key)
+        copy = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(area.width), int(area.height))
+        if tile is not None:
+            cr = cairo.Context(copy)
+            cr.set_source_surface(tile, 0, 0)
+            cr.set_operator(cairo.OPERATOR_SOURCE)
+            cr.paint()
+            self._shared.discard(key)
+        self.tiles[key] = copy
+        return copy
+
+    def _context(self, key: TileKey, tile: cairo.ImageSurface) -> cairo.Context:
+        cr = cairo.Context(tile)
+        cr.translate(-key[0] * self.tile_size, -key[1] * self.tile_size)
+        cr.scale(self.scale, self.scale)
+        cr.translate(-self.origin.x, -self.origin.y)
+        return cr
@@ -0,0 +1,199 @@
+"""
+Real-time smoothing of touch positions, applied in the reader before frames
+are sent, so the UI receives filtered points for free.
+
+Filters run per axis and per contact, in touchpad units, and cost O(1) per
+sample. A smoothing config is a dict such as
+`{"type": "one_euro", "min_cutoff": 1.0, "beta": 0.007}`; None turns it off.
+"""
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al., 2012): a low-pass filter whose cutoff
+    frequency rises with speed, so slow movements are steadied while fast
+    ones keep up with little lag.
+
+    min_cutoff: cutoff in Hz at rest; lower removes more jitter.
+    beta: cutoff increase per unit/s of speed; higher reduces lag.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.007, d_cutoff: float = 1.0) -> None:
+        if min_cutoff <= 0 or d_cutoff <= 0 or beta < 0:
+            raise ValueError("One Euro cutoffs must be positive and beta non-negative")
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._x: Optional[float] = None
+        self._dx = 0.0
+        self._t = 0.0
+
+    @staticmethod
+    def _alpha(dt: float, cutoff: float) -> float:
+        tau = 1 / (2 * math.pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def __call__(self, x: float, t: float) -> float:
+        if self._x is None:
+            self._x, self._t = x, t
+            return x
+        dt = t - self._t
+        if dt <= 0:
+            return self._x
+        self._t = t
+
+        a_d = self._alpha(dt, self.d_cutoff)
+        self._dx += a_d * ((x - self._x) / dt - self._dx)
+        a = self._alpha(dt, self.min_cutoff + self.beta * abs(self._dx))
+        self._x += a * (x - self._x)
+        return self._x
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter for one axis.
+
+    process_noise: variance of the acceleration, in units²/s⁴; higher follows turns faster.
+    measurement_noise: variance of a sample, in units².
+    """
+
+    def __init__(self, process_noise: float = 1e6, measurement_noise: float = 4.0) -> None:
+        if process_noise <= 0 or measurement_noise <= 0:
+            raise ValueError("Kalman noise variances must be positive")
+        self.q = process_noise
+        self.r = measurement_noise
+        self._x: Optional[float] = None
+        self._v = 0.0
+        self._t = 0.0
+        # covariance [[p00, p01], [p01, p11]]
+        self._p00, self._p01, self._p11 = measurement_noise, 0.0, 0.0
+
+    def __call__(self, x: float, t: float) -> float:
+        if self._x is None:
+            self._x, self._t = x, t
+            return x
+        dt = t - self._t
+        if dt <= 0:
+            return self._x
+        self._t = t
+
+        # predict
+        px = self._x + self._v * dt
+        dt2 = dt * dt
+        p00 = self._p00 + dt * (2 * self._p01 + dt * self._p11) + self.q * dt2 * dt2 / 4
+        p01 = self._p01 + dt * self._p11 + self.q * dt2 * dt / 2
+        p11 = self._p11 + self.q * dt2
+
+        # update
+        k0 = p00 / (p00 + self.r)
+        k1 = p01 / (p00 + self.r)
+        residual = x - px
+        self._x = px + k0 * residual
+        self._v += k1 * residual
+        self._p00, self._p01, self._p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+        return self._x
+
+
+FILTERS = {
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+AxisFilter = Callable[[float, float], float]
+
+
+def filter_factory(config: Optional[dict]) -> Optional[Callable[[], AxisFilter]]:
+    """Validate a smoothing config and return a factory of axis filters, or None for no smoothing."""
+    if not config:
+        return None
+    params = dict(config)
+    kind = params.pop("type", None)
+    if kind not in FILTERS:
+        raise ValueError(f"Unknown smoothing filter '{kind}', expected one of: {', '.join(FILTERS)}")
+    try:
+        FILTERS[kind](**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for '{kind}' smoothing: {e}")
+    return lambda: FILTERS[kind](**params)
+
+
+class SlotSmoother:
+    """
+    Smooths touch frames in place, with one pair of axis filters per contact.
+    A new config applies to contacts that start after it is set.
+
+    The filters lag behind the finger, so before a contact lifts, the
+    smoother returns a frame that moves it to its last unfiltered position:
+    strokes end where the finger left the pad.
+    """
+
+    def __init__(self, config: Optional[dict] = None) -> None:
+        self._factory = filter_factory(config)
+        self._filters: Dict[int, Tuple[AxisFilter, AxisFilter]] = {}
+        self._raw: Dict[int, Tuple[int, int]] = {}  # last unfiltered position of the smoothed contacts
+        self._sent: Dict[int, dict] = {}  # last state sent of every contact
+
+    def configure(self, config: Optional[dict]) -> None:
+        self._factory = filter_factory(config)
+
+    def _start(self, slot: int) -> None:
+        if self._factory is None:
+            self._filters.pop(slot, None)
+        else:
+            self._filters[slot] = (self._factory(), self._factory())
+
+    def _apply(self, slot: int, data: dict, t: float) -> None:
+        filters = self._filters.get(slot)
+        if filters:
+            self._raw[slot] = (data['x'], data['y'])
+            data['x'] = round(filters[0](data['x'], t))
+            data['y'] = round(filters[1](data['y'], t))
+
+    def _lift(self, slots) -> Dict[int, dict]:
+        """Forget the filters of `slots`; the moves to their last unfiltered position, where it differs."""
+        moves = {}
+        for slot in slots:
+            self._filters.pop(slot, None)
+            raw = self._raw.pop(slot, None)
+            sent = self._sent.pop(slot, None)
+            if raw and sent and raw != (sent['x'], sent['y']):
+                moves[slot] = {'x': raw[0], 'y': raw[1]}
+        return moves
+
+    def smooth_update(self, fingers: dict, t: float) -> Optional[dict]:
+        """
+        Full-state frame, `{slot: {id, x, y}}`. Returns the full-state frame
+        to send before it for the contacts it lifts, or None.
+        """
+        lifted = [slot for slot in self._sent
+                  if slot not in fingers or fingers[slot].get('id') != self._sent[slot].get('id')]
+        previous = {slot: dict(data) for slot, data in self._sent.items()}
+        moves = self._lift(lifted)
+        for slot, data in fingers.items():
+            if slot not in self._sent:
+                self._start(slot)
+            self._apply(slot, data, t)
+            self._sent[slot] = dict(data)
+        if not moves:
+            return None
+        for slot, move in moves.items():
+            previous[slot].update(move)
+        return previous
+
+    def smooth_delta(self, changes: dict, t: float) -> Optional[dict]:
+        """
+        Delta frame, `{'down', 'move', 'up'}`. Returns the delta frame to send
+        before it for the contacts it lifts, or None.
+        """
+        moves = self._lift(changes['up'])
+        for slot, data in changes['down'].items():
+            self._start(slot)
+            self._apply(slot, data, t)
+            self._sent[slot] = dict(data)
+        for slot, data in changes['move'].items():
+            self._apply(slot, data, t)
+            if slot in self._sent:
+                self._sent[slot].update(data)
+        return {'down': {}, 'move': moves, 'up': []} if moves else None
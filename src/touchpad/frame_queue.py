@@ -0,0 +1,117 @@
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+DROP_OLDEST = "drop_oldest"    # evict the oldest pending frame that can be dropped
+DROP_NEWEST = "drop_newest"    # refuse incoming frames that can be dropped
+MERGE = "merge"                # fold the incoming frame into the newest pending one
+
+BACKPRESSURE_POLICIES = (DROP_OLDEST, DROP_NEWEST, MERGE)
+
+
+class TouchFrameQueue:
+    """
+    Bounded, lock-protected queue of touch frames between the reader thread
+    (producer) and the GTK frame clock (consumer).
+
+    Frames are touch deltas (see `touchpad.protocol`). A frame that puts down
+    or lifts a contact is pinned: it is never dropped, even if that means going
+    over `max_frames`, so no stroke loses its start, tracking id or end.
+    Merging keeps downs, so frames that only put contacts down may be merged.
+    """
+
+    def __init__(self, max_frames: int = 64, policy: str = MERGE) -> None:
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of: {', '.join(BACKPRESSURE_POLICIES)}")
+        if max_frames < 1:
+            raise ValueError("max_frames must be at least 1")
+
+        self.max_frames = max_frames
+        self.policy = policy
+        self.dropped = 0
+        self.merged = 0
+        self._frames: Deque[Tuple[dict, bool]] = deque()  # (frame, pinned)
+        self._armed = False
+        self._lock = threading.Lock()
+
+    def push(self, frame: dict) -> bool:
+        """
+        Queue a frame. Returns True when the consumer has to be woken up,
+        i.e. the first push since the consumer last found the queue empty.
+        """
+        with self._lock:
+            pinned = bool(frame['up'] or frame['down'])
+
+            if len(self._frames) < self.max_frames or not self._apply_backpressure(frame, pinned):
+                self._frames.append((frame, pinned))
+
+            wake = not self._armed
+            self._armed = True
+            return wake
+
+    def drain(self) -> List[dict]:
+        """
+        Take every pending frame, oldest first. Returns an empty list (and
+        disarms, so the next push asks for a wakeup again) if there was none.
+        """
+        with self._lock:
+            frames = [frame for frame, _ in self._frames]
+            self._frames.clear()
+            if not frames:
+                self._armed = False
+            return frames
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+    def _apply_backpressure(self, frame: dict, pinned: bool) -> bool:
+        """Make room for `frame` on a full queue. Returns True if `frame` was consumed."""
+        if self.policy == DROP_OLDEST:
+            index = self._first_droppable()
+            if index is not None:
+                del self._frames[index]
+                self.dropped += 1
+            return False
+
+        if self.policy == DROP_NEWEST:
+            if pinned:
+                return False
+            self.dropped += 1
+            return True
+
+        # MERGE: fold into the tail, unless either lifts a contact (the other may reuse its slot)
+        newest, newest_pinned = self._frames[-1]
+        if frame['up'] or newest['up']:
+            return False
+        self._frames[-1] = (self._merge(newest, frame), newest_pinned or pinned)
+        self.merged += 1
+        return True
+
+    def _first_droppable(self) -> Optional[int]:
+        for i, (_, pinned) in enumerate(self._frames):
+            if not pinned:
+                return i
+        return None
+
+    @staticmethod
+    def _merge(older: dict, newer: dict) -> dict:
+        """
+        Neither frame lifts a contact, so `newer` cannot put down a slot that
+        `older` already uses: downs are disjoint and moves only update positions.
+        The merged frame keeps the older timestamp, if any, so latency traces
+        measure from the oldest input it carries.
+        """
+        down = dict(older['down'])
+        move = dict(older['move'])
+        down.update(newer['down'])
+        for slot, pos in newer['move'].items():
+            if slot in down:
+                down[slot] = {**down[slot], 'x': pos['x'], 'y': pos['y']}
+            else:
+                move[slot] = pos
+        merged = {'down': down, 'move': move, 'up': []}
+        if 'time' in older:
+            merged['time'] = older['time']
+        return merged
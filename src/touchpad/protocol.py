@@ -0,0 +1,280 @@
+"""
+Wire protocol between `reader.py` (privileged, runs under pkexec) and
+`TouchpadReaderThread`.
+
+Two codecs produce and consume the same event dicts:
+
+- "json":   one JSON object per line (the original protocol, kept as fallback).
+- "binary": a versioned, length-prefixed framing. The stream starts with
+            MAGIC + version, then every message is `<type:u8><length:u32>`
+            followed by `length` bytes of payload. Touch updates are two
+            timestamps followed by packed slot/id/x/y records; the rare
+            control messages (device_info, error, shutdown) carry a small
+            JSON payload.
+
+Touch data comes in two shapes, both with int slots:
+
+- "touch_update": full state, `{slot: {'id', 'x', 'y'}}`
+- "touch_delta":  transitions only, `{'down': {slot: {'id', 'x', 'y'}},
+                  'move': {slot: {'x', 'y'}}, 'up': [slot]}`. Consumers apply
+                  'up', then 'down', then 'move'.
+
+Touch events may carry `'time': {'kernel': µs, 'emit': µs}`: the evdev
+timestamp of the frame and the moment the reader sent it, both on the
+CLOCK_MONOTONIC timeline, for latency tracing.
+
+In the other direction, the reader takes commands on its stdin, one JSON
+object per line whatever the codec, e.g. `{"command": "set_smoothing", ...}`.
+"""
+import json
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+
+PROTOCOL_VERSION = 3
+
+MAGIC = b"TPB"
+
+MSG_TOUCH_UPDATE = 0x01
+MSG_TOUCH_DELTA = 0x02
+MSG_DEVICE_INFO = 0x10
+MSG_ERROR = 0x11
+MSG_SHUTDOWN = 0x12
+
+HEADER = struct.Struct("<BI")           # message type, payload length (u32: error messages can be long)
+TIMESTAMPS = struct.Struct("<qq")       # kernel, emit; µs, 0 if unknown
+TOUCH_RECORD = struct.Struct("<hiii")   # slot, tracking id (-1 if unknown), x, y
+DELTA_RECORD = struct.Struct("<Bhiii")  # kind, then as TOUCH_RECORD
+
+NO_TRACKING_ID = -1
+
+CONTACT_DOWN = 1
+CONTACT_MOVE = 2
+CONTACT_UP = 3
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def diff_slots(frame_data: dict, sent: dict, slots: Iterable[int]) -> Optional[dict]:
+    """
+    Compare `slots` of `frame_data` against `sent` (slot -> (id, x, y)),
+    update `sent` and return the contact transitions, or None if there are none.
+    """
+    down, move, up = {}, {}, []
+    for slot in slots:
+        data = frame_data.get(slot)
+        previous = sent.get(slot)
+        current = None
+        if data and 'x' in data and 'y' in data:
+            current = (data.get('id', NO_TRACKING_ID), data['x'], data['y'])
+
+        # A vanished finger, or a new tracking id in the same slot, lifts the old contact
+        if previous is not None and (current is None or current[0] != previous[0]):
+            up.append(slot)
+            del sent[slot]
+            previous = None
+
+        if current is None:
+            continue
+        if previous is None:
+            down[slot] = {'id': current[0], 'x': current[1], 'y': current[2]}
+        elif current != previous:
+            move[slot] = {'x': current[1], 'y': current[2]}
+        sent[slot] = current
+
+    if not (down or move or up):
+        return None
+    return {'down': down, 'move': move, 'up': up}
+
+
+class JsonCodec:
+    name = "json"
+
+    def preamble(self) -> bytes:
+        return b""
+
+    def encode(self, event: dict) -> bytes:
+        return json.dumps(event).encode() + b"\n"
+
+    def iter_events(self, stream: BinaryIO) -> Iterator[dict]:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                event = json.loads(line)
+            except Exception:
+                rest = stream.read().decode(errors="replace")
+                raise ProtocolError(f"Invalid JSON: {line.decode(errors='replace')}\n{rest}")
+
+            # JSON object keys are always strings; match the binary codec
+            if event.get('event') == 'touch_update':
+                event['data'] = {int(slot): pos for slot, pos in event['data'].items()}
+            elif event.get('event') == 'touch_delta':
+                data = event['data']
+                data['down'] = {int(slot): pos for slot, pos in data['down'].items()}
+                data['move'] = {int(slot): pos for slot, pos in data['move'].items()}
+            yield event
+
+
+class BinaryCodec:
+    name = "binary"
+
+    _CONTROL_TYPES = {
+        'device_info': MSG_DEVICE_INFO,
+        'shutdown': MSG_SHUTDOWN,
+    }
+
+    def preamble(self) -> bytes:
+        return MAGIC + bytes((PROTOCOL_VERSION,))
+
+    def encode(self, event: dict) -> bytes:
+        if event.get('event') == 'touch_update':
+            return self.encode_touch_update(event['data'], event.get('time'))
+        if event.get('event') == 'touch_delta':
+            return self.encode_touch_delta(event['data'], event.get('time'))
+
+        if 'error' in event:
+            msg_type = MSG_ERROR
+        else:
+            msg_type = self._CONTROL_TYPES[event['event']]
+        payload = json.dumps(event).encode()
+        return HEADER.pack(msg_type, len(payload)) + payload
+
+    @staticmethod
+    def _pack_time(time: Optional[dict]) -> bytes:
+        if not time:
+            return TIMESTAMPS.pack(0, 0)
+        return TIMESTAMPS.pack(time['kernel'], time['emit'])
+
+    def encode_touch_update(self, fingers: dict, time: Optional[dict] = None) -> bytes:
+        pack = TOUCH_RECORD.pack
+        payload = self._pack_time(time) + b"".join(
+            pack(slot, data.get('id', NO_TRACKING_ID), data['x'], data['y'])
+            for slot, data in fingers.items()
+        )
+        return HEADER.pack(MSG_TOUCH_UPDATE, len(payload)) + payload
+
+    def encode_touch_delta(self, changes: dict, time: Optional[dict] = None) -> bytes:
+        pack = DELTA_RECORD.pack
+        records = [self._pack_time(time)] + [
+            pack(CONTACT_DOWN, slot, data['id'], data['x'], data['y'])
+            for slot, data in changes['down'].items()
+        ]
+        records.extend(
+            pack(CONTACT_MOVE, slot, NO_TRACKING_ID, data['x'], data['y'])
+            for slot, data in changes['move'].items()
+        )
+        records.extend(pack(CONTACT_UP, slot, NO_TRACKING_ID, 0, 0) for slot in changes['up'])
+        payload = b"".join(records)
+        return HEADER.pack(MSG_TOUCH_DELTA, len(payload)) + payload
+
+    def iter_events(self, stream: BinaryIO) -> Iterator[dict]:
+        preamble = self._read_exact(stream, len(MAGIC) + 1)
+        if preamble is None:
+            return
+        if preamble[:len(MAGIC)] != MAGIC:
+            raise ProtocolError(self._garbage_message("Invalid binary stream", preamble, stream))
+        if preamble[len(MAGIC)] != PROTOCOL_VERSION:
+            raise ProtocolError(
+                f"Unsupported protocol version {preamble[len(MAGIC)]} (expected {PROTOCOL_VERSION})"
+            )
+
+        iter_unpack = TOUCH_RECORD.iter_unpack
+        while True:
+            header = self._read_exact(stream, HEADER.size)
+            if header is None:
+                return
+            msg_type, length = HEADER.unpack(header)
+            payload = self._read_exact(stream, length) if length else b""
+            if payload is None:
+                raise ProtocolError("Truncated message")
+
+            if msg_type == MSG_TOUCH_UPDATE:
+                if length < TIMESTAMPS.size or (length - TIMESTAMPS.size) % TOUCH_RECORD.size:
+                    raise ProtocolError(f"Malformed touch update of {length} bytes")
+                fingers = {}
+                for slot, tracking_id, x, y in iter_unpack(payload[TIMESTAMPS.size:]):
+                    data = {'x': x, 'y': y}
+                    if tracking_id != NO_TRACKING_ID:
+                        data['id'] = tracking_id
+                    fingers[slot] = data
+                yield self._with_time({"event": "touch_update", "data": fingers}, payload)
+            elif msg_type == MSG_TOUCH_DELTA:
+                if length < TIMESTAMPS.size or (length - TIMESTAMPS.size) % DELTA_RECORD.size:
+                    raise ProtocolError(f"Malformed touch delta of {length} bytes")
+                down, move, up = {}, {}, []
+                for kind, slot, tracking_id, x, y in DELTA_RECORD.iter_unpack(payload[TIMESTAMPS.size:]):
+                    if kind == CONTACT_DOWN:
+                        down[slot] = {'id': tracking_id, 'x': x, 'y': y}
+                    elif kind == CONTACT_MOVE:
+                        move[slot] = {'x': x, 'y': y}
+                    elif kind == CONTACT_UP:
+                        up.append(slot)
+                    else:
+                        raise ProtocolError(f"Unknown touch record kind {kind}")
+                yield self._with_time({"event": "touch_delta", "data": {'down': down, 'move': move, 'up': up}}, payload)
+            elif msg_type in (MSG_DEVICE_INFO, MSG_ERROR, MSG_SHUTDOWN):
+                yield json.loads(payload)
+            else:
+                raise ProtocolError(self._garbage_message("Unknown message type", header + payload, stream))
+
+    @staticmethod
+    def _with_time(event: dict, payload: bytes) -> dict:
+        kernel, emit = TIMESTAMPS.unpack_from(payload)
+        if kernel:
+            event['time'] = {'kernel': kernel, 'emit': emit}
+        return event
+
+    @staticmethod
+    def _read_exact(stream: BinaryIO, size: int):
+        data = stream.read(size)
+        if not data:
+            return None
+        while len(data) < size:
+            chunk = stream.read(size - len(data))
+            if not chunk:
+                raise ProtocolError("Unexpected end of stream")
+            data += chunk
+        return data
+
+    @staticmethod
+    def _garbage_message(reason: str, data: bytes, stream: BinaryIO) -> str:
+        # stderr is merged into stdout, so garbage is usually a traceback or a pkexec message
+        rest = stream.read()
+        return f"{reason}: " + (data + rest).decode(errors="replace")
+
+
+def encode_command(command: dict) -> bytes:
+    return json.dumps(command).encode() + b"\n"
+
+
+class CommandDecoder:
+    """Splits the chunks read from the command pipe into commands."""
+
+    def __init__(self) -> None:
+        self._pending = b""
+
+    def feed(self, data: bytes) -> List[dict]:
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        try:
+            return [json.loads(line) for line in lines if line.strip()]
+        except ValueError as e:
+            raise ProtocolError(f"Invalid command: {e}")
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    BinaryCodec.name: BinaryCodec,
+}
+
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown protocol '{name}', expected one of: {', '.join(CODECS)}")
@@ -1,10 +1,17 @@
 import sys
-import json
 import os
-from typing import Optional, Tuple
+import time
+import fcntl
+import struct
+import argparse
+import selectors
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 from collections import defaultdict
-from evdev import InputDevice, list_devices, ecodes
-import psutil
+from evdev import AbsInfo, InputDevice, InputEvent, list_devices, ecodes
+
+from protocol import CODECS, CommandDecoder, diff_slots, get_codec
+from filters import SlotSmoother
+from recording import RecordedEvent, RecordingWriter, read_recording
 
 
 def find_touchpad() -> Tuple[Optional[str], str]:
@@ -53,75 +60,328 @@ def get_max_xy(device_path: str) -> Tuple[int, int]:
     )
 
 
-def touchpad_positions_generator(device_path: str):
-    """Reads multitouch data (ABS_MT_*) grouped by SYN_REPORT frames."""
-    dev = InputDevice(device_path)
+def get_axes(dev: InputDevice) -> dict:
+    """EV_ABS code -> AbsInfo, for every axis of `dev`."""
+    return dict(dev.capabilities().get(ecodes.EV_ABS, []))
+
+
+EVIOCSCLOCKID = 0x400445a0  # _IOW('E', 0xa0, int)
 
-    frame_data = defaultdict(dict)
-    current_slot = 0
-
-    for event in dev.read_loop():
-        if event.type == ecodes.EV_ABS:
-            if event.code == ecodes.ABS_MT_SLOT:
-                current_slot = event.value
-            elif event.code == ecodes.ABS_MT_TRACKING_ID:
-                if event.value == -1:
-                    frame_data.pop(current_slot, None)
-                else:
-                    frame_data[current_slot]['id'] = event.value
-            elif event.code == ecodes.ABS_MT_POSITION_X:
-                frame_data[current_slot]['x'] = event.value
-            elif event.code == ecodes.ABS_MT_POSITION_Y:
-                frame_data[current_slot]['y'] = event.value
-
-        elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
-            # Yield a copy of positions to avoid mutation issues
-            fingers = {slot: data.copy() for slot, data in frame_data.items() if 'x' in data and 'y' in data}
-            yield fingers
-
-
-def is_parent_alive(parent_pid: int) -> bool:
+
+def use_monotonic_clock(dev: InputDevice) -> bool:
+    """
+    Ask for CLOCK_MONOTONIC event timestamps (evdev defaults to realtime),
+    the clock GLib and time.monotonic() use. Returns False if unsupported.
+    """
     try:
-        p = psutil.Process(parent_pid)
-        return p.is_running() and p.pid == parent_pid
-    except psutil.NoSuchProcess:
-        return False
-    except Exception as e:
-        sys.stderr.write(f"Error checking parent process: {e}\n")
+        fcntl.ioctl(dev.fd, EVIOCSCLOCKID, struct.pack("i", time.CLOCK_MONOTONIC))
+        return True
+    except OSError:
         return False
 
 
+class ParentProcessExited(Exception):
+    pass
+
+
+class _SlotState:
+    """Multitouch slot state, updated by the handlers in `_event_handlers`."""
+
+    def __init__(self) -> None:
+        self.frame_data = defaultdict(dict)
+        self.current_slot = 0
+        self.changed_slots = set()
+
+    def on_slot(self, value: int) -> None:
+        self.current_slot = value
+
+    def on_tracking_id(self, value: int) -> None:
+        if value == -1:
+            self.frame_data.pop(self.current_slot, None)
+        else:
+            self.frame_data[self.current_slot]['id'] = value
+        self.changed_slots.add(self.current_slot)
+
+    def on_x(self, value: int) -> None:
+        self.frame_data[self.current_slot]['x'] = value
+        self.changed_slots.add(self.current_slot)
+
+    def on_y(self, value: int) -> None:
+        self.frame_data[self.current_slot]['y'] = value
+        self.changed_slots.add(self.current_slot)
+
+
+SYN_REPORT = (ecodes.EV_SYN, ecodes.SYN_REPORT)
+
+
+def _event_handlers(state: _SlotState) -> dict:
+    """(type, code) -> handler(value); SYN_REPORT is handled by the caller."""
+    return {
+        (ecodes.EV_ABS, ecodes.ABS_MT_SLOT): state.on_slot,
+        (ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID): state.on_tracking_id,
+        (ecodes.EV_ABS, ecodes.ABS_MT_POSITION_X): state.on_x,
+        (ecodes.EV_ABS, ecodes.ABS_MT_POSITION_Y): state.on_y,
+    }
+
+
+def touchpad_positions_generator(event_batches: Iterable[List[InputEvent]], delta: bool = False, with_time: bool = False):
+    """
+    Reads multitouch data (ABS_MT_*) grouped by SYN_REPORT frames.
+
+    By default yields the full state of every finger, `{slot: {id, x, y}}`.
+    With `delta`, yields only what changed since the previous yield,
+    `{'down': {slot: {id, x, y}}, 'move': {slot: {x, y}}, 'up': [slot]}`,
+    and skips frames where nothing changed.
+    With `with_time`, yields `(timestamp, frame)`, the timestamp (in seconds)
+    being the kernel's for the frame's SYN_REPORT.
+    """
+    state = _SlotState()
+    handlers = _event_handlers(state)
+    frame_data = state.frame_data
+    changed_slots = state.changed_slots
+    sent = {}  # slot -> (id, x, y) as last yielded, delta mode only
+
+    for batch in event_batches:
+        for event in batch:
+            key = (event.type, event.code)
+            handler = handlers.get(key)
+            if handler is not None:
+                handler(event.value)
+                continue
+            if key != SYN_REPORT:
+                continue
+
+            if not delta:
+                # Yield a copy of positions to avoid mutation issues
+                fingers = {slot: data.copy() for slot, data in frame_data.items() if 'x' in data and 'y' in data}
+                yield (event.timestamp(), fingers) if with_time else fingers
+                continue
+
+            if not changed_slots:
+                continue
+            changes = diff_slots(frame_data, sent, changed_slots)
+            changed_slots.clear()
+            if changes:
+                yield (event.timestamp(), changes) if with_time else changes
+
+
+def read_event_batches(
+    dev: InputDevice,
+    parent_pid: int,
+    poll_interval: float = 1.0,
+    command_fd: Optional[int] = None,
+    on_commands: Optional[Callable[[bytes], None]] = None,
+) -> Iterator[List[InputEvent]]:
+    """
+    Yields every event queued on `dev` at each wakeup, as one list.
+
+    Raises ParentProcessExited as soon as `parent_pid` exits, even while the
+    touchpad is idle. Uses a pidfd where available; otherwise falls back to
+    checking for reparenting every `poll_interval` seconds.
+
+    Data arriving on `command_fd` is passed to `on_commands` as it is read,
+    between two batches.
+    """
+    try:
+        parent_fd = os.pidfd_open(parent_pid)
+    except ProcessLookupError:
+        raise ParentProcessExited()
+    except (AttributeError, OSError):
+        parent_fd = None
+
+    try:
+        # The parent may have exited (and we got reparented) before the pidfd was opened
+        if os.getppid() != parent_pid:
+            raise ParentProcessExited()
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(dev.fd, selectors.EVENT_READ)
+            if parent_fd is not None:
+                selector.register(parent_fd, selectors.EVENT_READ)
+            if command_fd is not None:
+                selector.register(command_fd, selectors.EVENT_READ)
+            timeout = None if parent_fd is not None else poll_interval
+
+            while True:
+                ready = selector.select(timeout)
+                if parent_fd is None and os.getppid() != parent_pid:
+                    raise ParentProcessExited()
+
+                for key, _ in ready:
+                    if key.fd == parent_fd:
+                        raise ParentProcessExited()
+                    if key.fd == command_fd:
+                        data = os.read(command_fd, 4096)
+                        if data:
+                            on_commands(data)
+                        else:
+                            selector.unregister(command_fd)
+
+                batch = []
+                while True:
+                    try:
+                        batch.extend(dev.read())
+                    except BlockingIOError:
+                        break
+                if batch:
+                    yield batch
+    finally:
+        if parent_fd is not None:
+            os.close(parent_fd)
+
+
+def replay_event_batches(
+    events: Iterable[RecordedEvent],
+    parent_pid: int,
+    speed: float = 1.0,
+    command_fd: Optional[int] = None,
+    on_commands: Optional[Callable[[bytes], None]] = None,
+) -> Iterator[List[InputEvent]]:
+    """
+    Stands in for `read_event_batches` with a recording: yields the recorded
+    events one SYN_REPORT frame at a time. With `speed` > 0, frames are paced
+    at `speed` times their recorded rate; with 0, they come as fast as they
+    are consumed.
+
+    Raises ParentProcessExited if `parent_pid` exits. Commands are read
+    between frames, as for a device.
+    """
+    with selectors.DefaultSelector() as selector:
+        if command_fd is not None:
+            selector.register(command_fd, selectors.EVENT_READ)
+
+        def wait(until: float) -> None:
+            # Sleep until `until` (monotonic seconds), handling commands meanwhile
+            while True:
+                timeout = max(until - time.monotonic(), 0)
+                for key, _ in selector.select(timeout):
+                    data = os.read(command_fd, 4096)
+                    if data:
+                        on_commands(data)
+                    else:
+                        selector.unregister(command_fd)
+                if not timeout:
+                    return
+
+        start = None  # (monotonic time, recorded timestamp) of the first frame
+        batch = []
+        for timestamp, event_type, code, value in events:
+            batch.append(InputEvent(timestamp // 1_000_000, timestamp % 1_000_000, event_type, code, value))
+            if (event_type, code) != SYN_REPORT:
+                continue
+
+            if speed > 0:
+                if start is None:
+                    start = (time.monotonic(), timestamp)
+                wait(start[0] + (timestamp - start[1]) / 1e6 / speed)
+            else:
+                wait(0)
+            if os.getppid() != parent_pid:
+                raise ParentProcessExited()
+            yield batch
+            batch = []
+
+
+def recorded_event_batches(event_batches: Iterable[List[InputEvent]], writer: RecordingWriter) -> Iterator[List[InputEvent]]:
+    """Passes `event_batches` through, saving their EV_ABS and EV_SYN events with `writer`."""
+    try:
+        for batch in event_batches:
+            writer.write(event for event in batch if event.type in (ecodes.EV_ABS, ecodes.EV_SYN))
+            writer.flush()
+            yield batch
+    finally:
+        writer.close()
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream touchpad frames to stdout.")
+    parser.add_argument("--protocol", choices=CODECS.keys(), default="json")
+    parser.add_argument("--delta", action="store_true", help="send only changed fingers, with explicit contact down/up")
+    parser.add_argument("--commands", action="store_true", help="read commands (e.g. smoothing settings) from stdin")
+    parser.add_argument("--record", metavar="FILE", help="also save the raw touchpad events to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="read events from a recording instead of the touchpad")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor; 0 replays as fast as possible")
+    args = parser.parse_args()
+
+    codec = get_codec(args.protocol)
+    out = sys.stdout.buffer
+
+    def emit(event: dict) -> None:
+        out.write(codec.encode(event))
+        out.flush()
+
+    out.write(codec.preamble())
+
     parent_pid = os.getppid()
-    device_path, match_status = find_touchpad()
+    if args.replay:
+        device_path, match_status = None, "replay"
+    else:
+        device_path, match_status = find_touchpad()
 
-    if not device_path:
-        print(json.dumps({"error": "touchpad_not_found", "message": "No touchpad device found or accessible."}), flush=True)
+    if not device_path and not args.replay:
+        emit({"error": "touchpad_not_found", "message": "No touchpad device found or accessible."})
         sys.exit(1)
     
     try:
-        max_x, max_y = get_max_xy(device_path)
-        print(json.dumps({
+        if args.replay:
+            with open(args.replay, "rb") as file:
+                recording = read_recording(file)
+            axes = {code: AbsInfo(*absinfo) for code, absinfo in recording.axes.items()}
+            if ecodes.ABS_X not in axes or ecodes.ABS_Y not in axes:
+                raise ValueError(f"Recording {args.replay} has no ABS_X/ABS_Y range")
+            max_x, max_y = axes[ecodes.ABS_X].max, axes[ecodes.ABS_Y].max
+        else:
+            max_x, max_y = get_max_xy(device_path)
+        emit({
             "event": "device_info",
             "data": {
                 "max_x": max_x,
                 "max_y": max_y,
                 "detection_status": match_status
             }
-        }), flush=True)
-
-        for fingers in touchpad_positions_generator(device_path):
-            if not is_parent_alive(parent_pid):
-                print(json.dumps({"event": "shutdown", "reason": "parent_process_terminated"}), flush=True)
-                break
-            print(json.dumps({
-                "event": "touch_update",
-                "data": fingers
-            }), flush=True)
-        
+        })
+
+        smoother = SlotSmoother()
+        commands = CommandDecoder()
+
+        def on_commands(data: bytes) -> None:
+            for command in commands.feed(data):
+                if command.get("command") == "set_smoothing":
+                    smoother.configure(command.get("config"))
+
+        command_fd = sys.stdin.fileno() if args.commands else None
+        if args.replay:
+            event_batches = replay_event_batches(recording.events, parent_pid, args.speed, command_fd, on_commands)
+        else:
+            dev = InputDevice(device_path)
+            # Realtime timestamps are moved onto the monotonic timeline (ignoring clock jumps)
+            clock_offset = 0 if use_monotonic_clock(dev) else time.time() - time.monotonic()
+            event_batches = read_event_batches(dev, parent_pid, command_fd=command_fd, on_commands=on_commands)
+            if args.record:
+                writer = RecordingWriter(open(args.record, "wb"), dev.name, get_axes(dev))
+                event_batches = recorded_event_batches(event_batches, writer)
+
+        update_event = "touch_delta" if args.delta else "touch_update"
+        smooth = smoother.smooth_delta if args.delta else smoother.smooth_update
+        for timestamp, fingers in touchpad_positions_generator(event_batches, delta=args.delta, with_time=True):
+            # A replayed frame is traced from its release; filters still see the recorded timestamps
+            kernel_time = time.monotonic() if args.replay else timestamp - clock_offset
+            lift = smooth(fingers, timestamp)
+            # contacts lifting in this frame first catch up with the finger
+            for data in ([lift] if lift else []) + [fingers]:
+                emit({
+                    "event": update_event,
+                    "data": data,
+                    "time": {
+                        "kernel": int(kernel_time * 1e6),
+                        "emit": int(time.monotonic() * 1e6),
+                    },
+                })
+
+    except ParentProcessExited:
+        emit({"event": "shutdown", "reason": "parent_process_terminated"})
     except Exception as e:
-        print(json.dumps({"error": "evdev_reader_error", "message": str(e)}), flush=True)
+        emit({"error": "evdev_reader_error", "message": str(e)})
         sys.exit(1)
     finally:
-        print(json.dumps({"event": "shutdown", "reason": "reader_finished"}), flush=True)
-        sys.stdout.flush()
+        emit({"event": "shutdown", "reason": "reader_finished"})
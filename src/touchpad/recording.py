@@ -0,0 +1,93 @@
+"""
+Recordings of raw touchpad sessions, so the input pipeline can be replayed,
+tested and timed without a device (see `reader.py --record/--replay`).
+
+Layout, little-endian:
+
+    header   b"TPRC", u16 version, u16 name length, name (UTF-8), u16 axis count
+    axes     i32 code, value, min, max, fuzz, flat, resolution    (per EV_ABS axis)
+    events   i64 timestamp (µs), u16 type, u16 code, i32 value     (until EOF)
+
+Events are stored as read, 16 bytes each; only the types the reader
+consumes (EV_ABS, EV_SYN) are worth recording. A recording cut short
+mid-event (e.g. the reader was killed) is read up to its last full event.
+"""
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, Tuple
+
+
+MAGIC = b"TPRC"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHH")
+AXIS_COUNT = struct.Struct("<H")
+AXIS = struct.Struct("<7i")
+EVENT = struct.Struct("<qHHi")
+
+AbsInfo = Tuple[int, int, int, int, int, int]  # value, min, max, fuzz, flat, resolution
+RecordedEvent = Tuple[int, int, int, int]  # timestamp (µs), type, code, value
+
+
+@dataclass
+class Recording:
+    name: str
+    axes: Dict[int, AbsInfo] = field(default_factory=dict)  # EV_ABS code -> absinfo
+    events: Iterable[RecordedEvent] = ()
+
+
+class RecordingWriter:
+    """Writes the header on creation; events are appended as they are read from the device."""
+
+    def __init__(self, file: BinaryIO, name: str, axes: Dict[int, AbsInfo]) -> None:
+        self.file = file
+        encoded_name = name.encode()
+        file.write(HEADER.pack(MAGIC, VERSION, len(encoded_name)))
+        file.write(encoded_name)
+        file.write(AXIS_COUNT.pack(len(axes)))
+        for code, absinfo in axes.items():
+            file.write(AXIS.pack(code, *absinfo))
+
+    def write(self, events: Iterable) -> None:
+        """Appends evdev events (anything with sec, usec, type, code and value)."""
+        self.file.write(b"".join(
+            EVENT.pack(event.sec * 1_000_000 + event.usec, event.type, event.code, event.value)
+            for event in events
+        ))
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_recording(file: BinaryIO) -> Recording:
+    """Reads a whole recording; raises ValueError if `file` is not one."""
+    data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError("Not a touchpad recording: file too short")
+    magic, version, name_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a touchpad recording: bad magic")
+    if version != VERSION:
+        raise ValueError(f"Unsupported recording version {version}, expected {VERSION}")
+
+    offset = HEADER.size
+    name = data[offset:offset + name_length].decode(errors="replace")
+    offset += name_length
+    if len(data) < offset + AXIS_COUNT.size:
+        raise ValueError("Truncated recording header")
+    (axis_count,) = AXIS_COUNT.unpack_from(data, offset)
+    offset += AXIS_COUNT.size
+    if len(data) < offset + axis_count * AXIS.size:
+        raise ValueError("Truncated recording header")
+
+    axes = {}
+    for _ in range(axis_count):
+        code, *absinfo = AXIS.unpack_from(data, offset)
+        axes[code] = tuple(absinfo)
+        offset += AXIS.size
+
+    end = offset + (len(data) - offset) // EVENT.size * EVENT.size
+    return Recording(name, axes, EVENT.iter_unpack(memoryview(data)[offset:end]))
@@ -1,10 +1,10 @@
 import os
 import sys
-import json
+import time
 import threading
 import subprocess
 import shutil
-from typing import Optional, Callable, Any, Optional
+from typing import Optional, Callable
 
 import gi
 gi.require_version('Gtk', '4.0')
@@ -12,6 +12,10 @@ gi.require_version('Adw', '1')
 from gi.repository import GLib
 
 from vec2 import Vec2
+from instrumentation import instruments
+from touchpad.protocol import ProtocolError, diff_slots, encode_command, get_codec
+from touchpad.filters import filter_factory
+from touchpad.frame_queue import TouchFrameQueue, MERGE
 
 
 
@@ -22,18 +26,51 @@ PKEXEC_EXIT_CODE_MESSAGES = {
 
 
 class TouchpadReaderThread:
-    def __init__(self, on_device_init: Callable[[], None], on_event: Callable[[Any], None], on_error: Callable[[str], None]) -> None:
+    def __init__(
+        self,
+        on_device_init: Callable[[], None],
+        on_frames_ready: Callable[[], None],
+        on_error: Callable[[str], None],
+        protocol: str = "binary",
+        delta: bool = True,
+        max_pending_frames: int = 64,
+        backpressure: str = MERGE,
+        replay: Optional[str] = None,
+        replay_speed: float = 1.0,
+        record: Optional[str] = None,
+    ) -> None:
+        """
+        Touch frames are not delivered one by one: they are queued in `frames`,
+        and `on_frames_ready` is scheduled on the main loop whenever the queue
+        turns non-empty. The consumer then drains `frames` at its own pace.
+
+        Queued frames are always touch deltas. With `delta=False` the reader
+        sends full snapshots, which are diffed here, off the main loop.
+
+        With `replay`, frames come from a recording (see touchpad.recording)
+        at `replay_speed` times real time (0: as fast as possible), and the
+        reader runs without pkexec. With `record`, a live session is saved to
+        that file.
+        """
         self.on_device_init = on_device_init
-        self.on_event = on_event
+        self.on_frames_ready = on_frames_ready
         self.on_error = on_error
+        self.codec = get_codec(protocol)
+        self.delta = delta
+        self.replay = replay
+        self.replay_speed = replay_speed
+        self.record = record
+        self.frames = TouchFrameQueue(max_pending_frames, backpressure)
         self.reader_process = None
         self.reader_thread = None
         self.max = None  # Vec2(max_x, max_y)
+        self.smoothing: Optional[dict] = None
         self._should_stop = threading.Event()
+        self._command_lock = threading.Lock()
 
     def start(self) -> None:
-        # check pkexec available
-        if not shutil.which("pkexec"):
+        # check pkexec available (replays need no device access)
+        if not self.replay and not shutil.which("pkexec"):
             GLib.idle_add(self.on_error, "pkexec is not installed or not found in PATH. Please install pkexec to continue.")
             return
 
@@ -41,9 +78,19 @@ class TouchpadReaderThread:
         script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'reader.py'))
         python_exe = os.environ.get("PYTHON_NIX", sys.executable)
 
-        self.reader_process = subprocess.Popen([
-            'pkexec', python_exe, script_path
-        ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        args = [python_exe, script_path, '--protocol', self.codec.name, '--commands']
+        if self.delta:
+            args.append('--delta')
+        if self.replay:
+            args += ['--replay', os.path.abspath(self.replay), '--speed', str(self.replay_speed)]
+        else:
+            args.insert(0, 'pkexec')
+            if self.record:
+                args += ['--record', os.path.abspath(self.record)]
+
+        self.reader_process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if self.smoothing:
+            self._send_command({"command": "set_smoothing", "config": self.smoothing})
         
         self.reader_thread = threading.Thread(target=self._read_output, daemon=True)
         self.reader_thread.start()
@@ -69,41 +116,72 @@ class TouchpadReaderThread:
             return
         
         error_to_report = None
-
-        for line in self.reader_process.stdout:
-            if self._should_stop.is_set():
-                break
-                
-            line = line.strip()
-            if not line:
-                continue
-
-            try:
-                event = json.loads(line)
-            except Exception:
-                error_to_report = f"Invalid JSON: {line}" + "\n".join(self.reader_process.stdout.readlines())
-                break
-
-            if 'error' in event:
-                error_code = event.get('error', 'Error')
-                error_msg = event.get('message', '')
-                error_to_report = f"{error_code}: {error_msg}"
-                break
-            elif event.get('event') == 'device_info':
-                data = event.get('data', {})
-                self.max = Vec2(data.get('max_x'), data.get('max_y'))
-                if self.on_device_init:
-                    GLib.idle_add(self.on_device_init)
-            elif event.get('event') == 'touch_update':
-                GLib.idle_add(self.on_event, event['data'])
-            
+        sent = {}  # slot -> (id, x, y), for diffing full snapshots
+
+        try:
+            for event in self.codec.iter_events(self.reader_process.stdout):
+                if self._should_stop.is_set():
+                    break
+
+                if 'error' in event:
+                    error_code = event.get('error', 'Error')
+                    error_msg = event.get('message', '')
+                    error_to_report = f"{error_code}: {error_msg}"
+                    break
+                elif event.get('event') == 'device_info':
+                    data = event.get('data', {})
+                    self.max = Vec2(data.get('max_x'), data.get('max_y'))
+                    if self.on_device_init:
+                        GLib.idle_add(self.on_device_init)
+                elif event.get('event') == 'touch_delta':
+                    self._push_frame(self._trace(event['data'], event))
+                elif event.get('event') == 'touch_update':
+                    changes = diff_slots(event['data'], sent, set(sent) | set(event['data']))
+                    if changes:
+                        self._push_frame(self._trace(changes, event))
+        except ProtocolError as e:
+            error_to_report = str(e)
 
         if self.reader_process.stdout:
             self.reader_process.stdout.close()
         
         # After reading loop, check for pkexec exit code, and those take priority
         if not self._handle_pkexec_exit_code() and error_to_report:
-            self._report_error(error_to_report)
+            GLib.idle_add(self.on_error, error_to_report)
+
+    @staticmethod
+    def _trace(frame: dict, event: dict) -> dict:
+        """Record the reader and pipe latency of `event`, and keep its kernel timestamp (µs) on the frame as 'time'."""
+        timestamps = event.get('time')
+        if timestamps:
+            received = int(time.monotonic() * 1e6)
+            instruments.record("latency.emit", timestamps['emit'] - timestamps['kernel'])
+            instruments.record("latency.receive", received - timestamps['kernel'])
+            frame['time'] = timestamps['kernel']
+        return frame
+
+    def set_smoothing(self, config: Optional[dict]) -> None:
+        """
+        Smoothing filter the reader applies to contacts starting from now on
+        (see touchpad.filters); None for raw positions. Raises ValueError for
+        an invalid config.
+        """
+        filter_factory(config)
+        self.smoothing = config
+        if self.reader_process:
+            self._send_command({"command": "set_smoothing", "config": config})
+
+    def _send_command(self, command: dict) -> None:
+        with self._command_lock:
+            try:
+                self.reader_process.stdin.write(encode_command(command))
+                self.reader_process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass  # the reader is gone; its exit is reported by _read_output
+
+    def _push_frame(self, changes: dict) -> None:
+        if self.frames.push(changes):
+            GLib.idle_add(self.on_frames_ready)
 
     def stop(self):
         # TODO: (LATER) understand how the multithreading work here; then review this function
@@ -118,3 +196,11 @@ class TouchpadReaderThread:
     def dimensions(self) -> Optional[Vec2]:
         return self.max
 
+    @property
+    def dropped_frames(self) -> int:
+        return self.frames.dropped
+
+    @property
+    def merged_frames(self) -> int:
+        return self.frames.merged
+
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+pytest.importorskip("cairo")
+pytest.importorskip("gi")
+
+from vec2 import Vec2
+from drawing import CalligraphyPen, Pen, Stroke
+from document import Document, HEADER
+
+SIZE = Vec2(1000, 600)
+PENS = [Pen("red", color=(1, 0, 0, 1), width=2), CalligraphyPen(width=10, angle=30)]
+
+
+def make_stroke(pen, points, times=True):
+    stroke = Stroke(pen)
+    for i, (x, y) in enumerate(points):
+        stroke.add_point(Vec2(x, y), 1_000_000 + 8_333 * i if times else None)
+    return stroke
+
+
+def coords(stroke):
+    return [(round(x, 3), round(y, 3)) for x, y in stroke.points.coords()]
+
+
+@pytest.fixture
+def strokes():
+    return [
+        make_stroke(PENS[0], [(10, 20), (15.5, 22.25), (40, 80)]),
+        make_stroke(PENS[1], [(300, 300), (310, 290)], times=False),
+        make_stroke(PENS[0], [(999, 599)]),
+    ]
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / "drawing.tpad")
+
+
+def test_round_trip(strokes, filename):
+    Document(filename).save(strokes, SIZE)
+    document = Document.open(filename, PENS)
+    assert document.size == SIZE
+    assert [stroke.pen for stroke in document.strokes] == [stroke.pen for stroke in strokes]
+    assert not any(stroke.loaded for stroke in document.strokes)
+    for opened, saved in zip(document.strokes, strokes):
+        assert coords(opened) == coords(saved)
+        assert (opened.times is None) == (saved.times is None)
+        if saved.times is not None:
+            assert list(opened.times) == list(saved.times)
+
+
+def test_unknown_pens_are_recreated(strokes, filename):
+    Document(filename).save(strokes, SIZE)
+    document = Document.open(filename)
+    pen = document.strokes[1].pen
+    assert isinstance(pen, CalligraphyPen)
+    assert (pen.width, pen.angle) == (10, 30)
+
+
+def test_save_appends_only_changed_strokes(strokes, filename):
+    document = Document(filename)
+    document.save(strokes, SIZE)
+    document = Document.open(filename, PENS)
+    size = os.path.getsize(filename)
+
+    document.save(document.strokes[:2], SIZE)
+    grown = os.path.getsize(filename)
+    assert size < grown < 2 * size  # a new index, no stroke records
+
+    added = make_stroke(PENS[0], [(1, 1), (2, 2)])
+    document.save(document.strokes[:2] + [added], SIZE)
+    reopened = Document.open(filename, PENS)
+    assert [coords(stroke) for stroke in reopened.strokes] == [coords(stroke) for stroke in strokes[:2] + [added]]
+
+
+def test_dead_space_is_reclaimed_by_rewriting(filename):
+    many = [make_stroke(PENS[0], [(i, i), (i + 50, i + 20), (i, i + 40)]) for i in range(50)]
+    document = Document(filename)
+    document.save(many, SIZE)
+    full = os.path.getsize(filename)
+    document.save(many[:5], SIZE)
+    assert os.path.getsize(filename) < full / 2
+    assert [coords(stroke) for stroke in Document.open(filename, PENS).strokes] == [coords(stroke) for stroke in many[:5]]
+
+
+def test_a_file_changed_elsewhere_is_rewritten(strokes, filename):
+    document = Document(filename)
+    document.save(strokes, SIZE)
+    Document(filename).save(strokes[:1], SIZE)
+    document.save(strokes, SIZE)
+    assert len(Document.open(filename).strokes) == len(strokes)
+
+
+def test_open_scales_to_the_page(strokes, filename):
+    Document(filename).save(strokes, SIZE)
+    document = Document.open(filename, PENS, Vec2(500, 400))
+    assert document.size == Vec2(500, 400)
+    for opened, saved in zip(document.strokes, strokes):
+        assert coords(opened) == pytest.approx([(x / 2, y / 2) for x, y in coords(saved)], abs=0.05)
+
+    # the scaled strokes are written anew
+    Document(filename).save(document.strokes, document.size)
+    rescaled = Document.open(filename, PENS)
+    assert rescaled.size == Vec2(500, 400)
+    assert coords(rescaled.strokes[0]) == pytest.approx(coords(document.strokes[0]), abs=0.05)
+
+
+def test_temporary_strokes_are_not_saved(strokes, filename):
+    pointer = Pen("pointer", is_temporary=True)
+    Document(filename).save(strokes + [make_stroke(pointer, [(5, 5), (6, 6)])], SIZE)
+    assert len(Document.open(filename).strokes) == len(strokes)
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"TPAD", "too short"),
+    (HEADER.pack(b"NOPE", 1, 0, 0, 0), "bad magic"),
+    (HEADER.pack(b"TPAD", 99, 0, 0, 0), "version"),
+    (HEADER.pack(b"TPAD", 1, 0, 1000, 10), "Truncated"),
+])
+def test_invalid_documents(tmp_path, data, message):
+    path = tmp_path / "invalid.tpad"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        Document.open(str(path))
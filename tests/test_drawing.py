@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("cairo")
+pytest.importorskip("gi")
+
+from vec2 import Vec2
+from drawing import Eraser, Pen, PointerPen, StrokeManager
+
+BALLPOINT = Pen("ballpoint", color=(0, 0, 0, 1), width=2)
+
+
+def draw(manager, points, pen=BALLPOINT, slot=0):
+    manager.start_stroke(slot, Vec2(*points[0]), pen)
+    for point in points[1:]:
+        manager.update_stroke(slot, Vec2(*point))
+    stroke = manager.current_strokes[slot]
+    manager.end_stroke(slot)
+    return stroke
+
+
+@pytest.fixture
+def manager():
+    manager = StrokeManager()
+    yield manager
+    manager.clear()
+
+
+def test_completed_strokes_damage_their_ink_bounds(manager):
+    assert manager.take_damage() is None
+    first = draw(manager, [(10, 10), (50, 10)])
+    assert manager.take_damage() == first.ink_bounds()
+    assert manager.take_damage() is None
+
+    second = draw(manager, [(100, 100), (120, 140)])
+    third = draw(manager, [(200, 10), (210, 20)])
+    assert manager.take_damage() == second.ink_bounds().union(third.ink_bounds())
+    assert manager.take_invalidated_from() is None
+
+
+def test_temporary_strokes_damage_nothing(manager):
+    draw(manager, [(10, 10), (50, 10)], pen=PointerPen())
+    assert manager.completed_strokes == []
+    assert manager.take_damage() is None
+
+
+def test_undo_redo_damage_and_invalidate_from_the_stroke(manager):
+    strokes = [draw(manager, [(10 * i, 0), (10 * i, 50)]) for i in range(4)]
+    manager.take_damage()
+
+    assert manager.undo()
+    assert manager.completed_strokes == strokes[:3]
+    assert manager.take_damage() == strokes[3].ink_bounds()
+    assert manager.take_invalidated_from() == 3
+
+    assert manager.redo()
+    assert manager.completed_strokes == strokes
+    assert manager.take_damage() == strokes[3].ink_bounds()
+    assert manager.take_invalidated_from() is None
+    assert manager.undoable_from() == 0
+
+
+def test_erasing_damages_and_invalidates_from_the_erased_stroke(manager):
+    strokes = [draw(manager, [(0, 20 * i), (100, 20 * i)]) for i in range(3)]
+    manager.take_damage()
+    draw(manager, [(50, 15), (50, 25)], pen=Eraser())
+    assert manager.completed_strokes == [strokes[0], strokes[2]]
+    assert manager.take_damage() == strokes[1].ink_bounds()
+    assert manager.take_invalidated_from() == 1
+
+    # undoing the erase puts the stroke back on top
+    assert manager.undo()
+    assert manager.completed_strokes == [strokes[0], strokes[2], strokes[1]]
+    assert manager.completed_index(strokes[1]) == 2
+    assert manager.completed_index(strokes[2]) == 1
+
+
+def test_clear_damages_everything(manager):
+    strokes = [draw(manager, [(0, 0), (10, 10)]), draw(manager, [(300, 300), (310, 320)])]
+    manager.take_damage()
+    manager.clear()
+    assert manager.take_damage() == strokes[0].ink_bounds().union(strokes[1].ink_bounds())
+    assert manager.take_invalidated_from() == 0
+    assert manager.completed_index(strokes[0]) is None
@@ -0,0 +1,97 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("cairo")
+pytest.importorskip("gi")
+
+from vec2 import Vec2
+from drawing import Pen, PointerPen, StrokeManager
+from export import ExportCancelled, ExportJob
+
+
+def write_chunks(stroke_manager, filename, chunks, progress=None, gate=None):
+    """An export writing `chunks` one progress step at a time, waiting on `gate` before the last."""
+    with open(filename, "wb") as file:
+        for i, chunk in enumerate(chunks):
+            if gate and i == len(chunks) - 1:
+                gate.wait()
+            file.write(chunk)
+            progress((i + 1) / len(chunks))
+
+
+def run(job):
+    done = threading.Event()
+    errors = []
+    job.on_done = lambda error: (errors.append(error), done.set())
+    job.start()
+    return done, errors
+
+
+def test_export_is_moved_into_place(tmp_path):
+    filename = str(tmp_path / "drawing.bin")
+    fractions = []
+    done, errors = run(ExportJob(write_chunks, StrokeManager(), filename, [b"a", b"b"], on_progress=fractions.append))
+    assert done.wait(5)
+    assert errors == [None]
+    assert fractions == [0.5, 1.0]
+    assert open(filename, "rb").read() == b"ab"
+    assert os.listdir(tmp_path) == ["drawing.bin"]
+
+
+def test_cancelled_export_leaves_the_previous_file(tmp_path):
+    filename = tmp_path / "drawing.bin"
+    filename.write_bytes(b"previous")
+    gate = threading.Event()
+    job = ExportJob(write_chunks, StrokeManager(), str(filename), [b"a", b"b"], gate=gate)
+    done, errors = run(job)
+    job.cancel()
+    gate.set()
+    assert done.wait(5)
+    assert isinstance(errors[0], ExportCancelled)
+    assert filename.read_bytes() == b"previous"
+    assert os.listdir(tmp_path) == ["drawing.bin"]
+
+
+def test_a_cancelled_job_does_not_touch_a_newer_export(tmp_path):
+    filename = str(tmp_path / "drawing.bin")
+    gate = threading.Event()
+    old = ExportJob(write_chunks, StrokeManager(), filename, [b"old", b"old"], gate=gate)
+    old_done, _ = run(old)
+    old.cancel()
+    new_done, errors = run(ExportJob(write_chunks, StrokeManager(), filename, [b"new"]))
+    assert new_done.wait(5)
+    gate.set()
+    assert old_done.wait(5)
+    assert errors == [None]
+    assert open(filename, "rb").read() == b"new"
+
+
+def test_failed_export_reports_its_error(tmp_path):
+    def fail(stroke_manager, filename, progress=None):
+        open(filename, "w").close()
+        raise OSError("disk full")
+
+    done, errors = run(ExportJob(fail, StrokeManager(), str(tmp_path / "drawing.bin")))
+    assert done.wait(5)
+    assert str(errors[0]) == "disk full"
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshot_leaves_out_temporary_strokes():
+    manager = StrokeManager()
+    pen = Pen("ballpoint", color=(0, 0, 0, 1), width=2)
+    manager.start_stroke(0, Vec2(0, 0), pen)
+    manager.update_stroke(0, Vec2(10, 10))
+    manager.end_stroke(0)
+    manager.start_stroke(0, Vec2(20, 20), pen)
+    manager.update_stroke(0, Vec2(30, 30))
+    manager.start_stroke(1, Vec2(50, 50), PointerPen())
+    manager.update_stroke(1, Vec2(60, 60))
+
+    snapshot = manager.snapshot()
+    assert snapshot.current_strokes == {}
+    assert [list(stroke.points.coords()) for stroke in snapshot.completed_strokes] == [[(0, 0), (10, 10)], [(20, 20), (30, 30)]]
+    assert snapshot.completed_strokes[0].pen is not pen
+
@@ -0,0 +1,112 @@
+import pytest
+
+from touchpad.filters import KalmanFilter, OneEuroFilter, SlotSmoother, filter_factory
+
+ONE_EURO = {"type": "one_euro", "min_cutoff": 1.0, "beta": 0.007}
+RATE = 120  # samples per second
+
+
+def samples(speed: float, n: int):
+    """(x, t) of a contact moving at `speed` units/s."""
+    return [(speed * i / RATE, i / RATE) for i in range(n)]
+
+
+@pytest.mark.parametrize("kind", [OneEuroFilter, KalmanFilter])
+def test_filters_settle_on_a_resting_contact(kind):
+    axis_filter = kind()
+    assert axis_filter(100, 0) == 100
+    for i in range(1, 2 * RATE):
+        x = axis_filter(100 + (-1) ** i, i / RATE)  # jitter around 100
+    assert abs(x - 100) < 1
+
+
+@pytest.mark.parametrize("kind", [OneEuroFilter, KalmanFilter])
+def test_filters_follow_a_moving_contact(kind):
+    axis_filter = kind()
+    for x, t in samples(1000, RATE):
+        out = axis_filter(x, t)
+    assert abs(x - out) < 20
+
+
+def test_filters_ignore_samples_without_elapsed_time():
+    axis_filter = OneEuroFilter()
+    axis_filter(0, 1)
+    axis_filter(10, 1.1)
+    assert axis_filter(1000, 1.1) == axis_filter(-1000, 1.0)
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        OneEuroFilter(min_cutoff=0)
+    with pytest.raises(ValueError):
+        KalmanFilter(measurement_noise=-1)
+
+
+def test_filter_factory():
+    assert filter_factory(None) is None
+    assert isinstance(filter_factory(ONE_EURO)(), OneEuroFilter)
+    assert isinstance(filter_factory({"type": "kalman"})(), KalmanFilter)
+    with pytest.raises(ValueError, match="Unknown smoothing"):
+        filter_factory({"type": "median"})
+    with pytest.raises(ValueError, match="Invalid parameters"):
+        filter_factory({"type": "one_euro", "cutoff": 1})
+
+
+def delta(down=None, move=None, up=()):
+    return {'down': down or {}, 'move': move or {}, 'up': list(up)}
+
+
+def test_delta_stroke_ends_at_the_lift_position():
+    smoother = SlotSmoother(ONE_EURO)
+    positions = samples(1000, 30)
+    assert smoother.smooth_delta(delta(down={0: {'id': 1, 'x': 0, 'y': 0}}), 0) is None
+    for x, t in positions[1:]:
+        frame = delta(move={0: {'x': round(x), 'y': 0}})
+        assert smoother.smooth_delta(frame, t) is None
+    assert frame['move'][0]['x'] < round(x)
+
+    lift = smoother.smooth_delta(delta(up=[0]), t + 1 / RATE)
+    assert lift == delta(move={0: {'x': round(x), 'y': 0}})
+    # the slot starts over for the next contact
+    assert smoother.smooth_delta(delta(down={0: {'id': 2, 'x': 500, 'y': 500}}), t + 2 / RATE) is None
+
+
+def test_update_stroke_ends_at_the_lift_position():
+    smoother = SlotSmoother(ONE_EURO)
+    for x, t in samples(1000, 30):
+        fingers = {0: {'id': 1, 'x': round(x), 'y': 0}, 1: {'id': 2, 'x': 5, 'y': 5}}
+        assert smoother.smooth_update(fingers, t) is None
+    assert fingers[0]['x'] < round(x)
+
+    lift = smoother.smooth_update({1: {'id': 2, 'x': 5, 'y': 5}}, t + 1 / RATE)
+    assert lift == {0: {'id': 1, 'x': round(x), 'y': 0}, 1: {'id': 2, 'x': 5, 'y': 5}}
+
+
+def test_update_new_tracking_id_restarts_the_slot():
+    smoother = SlotSmoother(ONE_EURO)
+    smoother.smooth_update({0: {'id': 1, 'x': 0, 'y': 0}}, 0)
+    smoother.smooth_update({0: {'id': 1, 'x': 100, 'y': 0}}, 1 / RATE)
+    fingers = {0: {'id': 2, 'x': 500, 'y': 500}}
+    assert smoother.smooth_update(fingers, 2 / RATE) == {0: {'id': 1, 'x': 100, 'y': 0}}
+    assert fingers == {0: {'id': 2, 'x': 500, 'y': 500}}
+
+
+def test_without_smoothing_frames_are_untouched():
+    smoother = SlotSmoother()
+    frame = delta(down={0: {'id': 1, 'x': 3, 'y': 4}})
+    assert smoother.smooth_delta(frame, 0) is None
+    assert smoother.smooth_delta(delta(move={0: {'x': 9, 'y': 9}}), 0.01) is None
+    assert smoother.smooth_delta(delta(up=[0]), 0.02) is None
+    assert frame == delta(down={0: {'id': 1, 'x': 3, 'y': 4}})
+
+
+def test_configure_applies_to_new_contacts():
+    smoother = SlotSmoother()
+    smoother.smooth_delta(delta(down={0: {'id': 1, 'x': 0, 'y': 0}}), 0)
+    smoother.configure(ONE_EURO)
+    frame = delta(move={0: {'x': 100, 'y': 0}}, down={1: {'id': 2, 'x': 0, 'y': 0}})
+    smoother.smooth_delta(frame, 1 / RATE)
+    assert frame['move'][0] == {'x': 100, 'y': 0}
+    frame = delta(move={1: {'x': 100, 'y': 0}})
+    smoother.smooth_delta(frame, 2 / RATE)
+    assert frame['move'][1]['x'] < 100
@@ -0,0 +1,73 @@
+import pytest
+
+from touchpad.frame_queue import DROP_NEWEST, DROP_OLDEST, MERGE, TouchFrameQueue
+
+
+def move(slot, x, y=0, **extra):
+    return {'down': {}, 'move': {slot: {'x': x, 'y': y}}, 'up': [], **extra}
+
+
+def down(slot, x, y=0):
+    return {'down': {slot: {'id': slot + 100, 'x': x, 'y': y}}, 'move': {}, 'up': []}
+
+
+def up(slot):
+    return {'down': {}, 'move': {}, 'up': [slot]}
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        TouchFrameQueue(policy="block")
+    with pytest.raises(ValueError):
+        TouchFrameQueue(max_frames=0)
+
+
+def test_wakes_once_until_drained_empty():
+    queue = TouchFrameQueue()
+    assert queue.push(move(0, 1))
+    assert not queue.push(move(0, 2))
+    assert queue.drain() == [move(0, 1), move(0, 2)]
+    # still armed: the consumer drains again on its next tick
+    assert not queue.push(move(0, 3))
+    assert queue.drain() == [move(0, 3)]
+    assert queue.drain() == []
+    assert queue.push(move(0, 4))
+
+
+def test_drop_oldest_keeps_pinned_frames():
+    queue = TouchFrameQueue(max_frames=2, policy=DROP_OLDEST)
+    for frame in (down(0, 0), move(0, 1), move(0, 2), move(0, 3)):
+        queue.push(frame)
+    assert queue.drain() == [down(0, 0), move(0, 3)]
+    assert queue.dropped == 2
+
+
+def test_drop_newest_keeps_pinned_frames():
+    queue = TouchFrameQueue(max_frames=1, policy=DROP_NEWEST)
+    for frame in (move(0, 1), move(0, 2), down(1, 5), up(0)):
+        queue.push(frame)
+    assert queue.drain() == [move(0, 1), down(1, 5), up(0)]
+    assert queue.dropped == 1
+
+
+def test_merge_folds_moves_and_downs():
+    queue = TouchFrameQueue(max_frames=1, policy=MERGE)
+    queue.push(move(0, 1, time={'kernel': 10, 'emit': 11}))
+    queue.push(down(1, 5))
+    queue.push(move(1, 6))
+    queue.push(move(0, 2))
+    [merged] = queue.drain()
+    assert merged == {
+        'down': {1: {'id': 101, 'x': 6, 'y': 0}},
+        'move': {0: {'x': 2, 'y': 0}},
+        'up': [],
+        'time': {'kernel': 10, 'emit': 11},
+    }
+    assert queue.merged == 3
+
+
+def test_merge_never_folds_across_a_lift():
+    queue = TouchFrameQueue(max_frames=1, policy=MERGE)
+    for frame in (move(0, 1), up(0), down(0, 5), move(0, 6)):
+        queue.push(frame)
+    assert queue.drain() == [move(0, 1), up(0), {'down': {0: {'id': 100, 'x': 6, 'y': 0}}, 'move': {}, 'up': []}]
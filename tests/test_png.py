@@ -0,0 +1,67 @@
+import io
+import struct
+import zlib
+
+import pytest
+
+pytest.importorskip("cairo")
+pytest.importorskip("gi")
+
+from vec2 import Vec2
+from tiles import TiledSurface
+from png_writer import PNG_SIGNATURE, PngWriter
+
+
+def read_png(data: bytes):
+    """(width, height, raw scanlines) of an 8-bit RGBA PNG, checking every chunk's CRC."""
+    assert data.startswith(PNG_SIGNATURE)
+    offset = len(PNG_SIGNATURE)
+    chunks = []
+    while offset < len(data):
+        (length,) = struct.unpack_from(">I", data, offset)
+        kind = data[offset + 4:offset + 8]
+        payload = data[offset + 8:offset + 8 + length]
+        (crc,) = struct.unpack_from(">I", data, offset + 8 + length)
+        assert crc == zlib.crc32(payload, zlib.crc32(kind))
+        chunks.append((kind, payload))
+        offset += length + 12
+    assert chunks[0][0] == b"IHDR" and chunks[-1] == (b"IEND", b"")
+    width, height, depth, color_type, _, _, _ = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert (depth, color_type) == (8, 6)
+    return width, height, zlib.decompress(b"".join(payload for kind, payload in chunks if kind == b"IDAT"))
+
+
+def test_png_writer_streams_rows():
+    file = io.BytesIO()
+    writer = PngWriter(file, 3, 4)
+    pixels = bytes(range(3 * 4 * 2))
+    writer.write_rows(pixels + b"padding", 3 * 4, 2)
+    writer.write_blank_rows(2)
+    writer.close()
+
+    width, height, raw = read_png(file.getvalue())
+    assert (width, height) == (3, 4)
+    row = 1 + 3 * 4
+    assert raw == b"\x00" + pixels[:12] + b"\x00" + pixels[12:] + (b"\x00" + bytes(12)) * 2
+    assert len(raw) == 4 * row
+
+
+def test_png_writer_rejects_missing_rows():
+    writer = PngWriter(io.BytesIO(), 3, 4)
+    writer.write_blank_rows(3)
+    with pytest.raises(ValueError):
+        writer.close()
+
+
+def test_write_png_renders_band_by_band_and_reports_progress():
+    canvas = TiledSurface(Vec2(100, 70), scale=2, tile_size=64)
+    bands, steps = [], []
+    file = io.BytesIO()
+    canvas.write_png(file, progress=lambda done, total: steps.append((done, total)), render=bands.append)
+
+    assert steps == [(1, 3), (2, 3), (3, 3)]
+    assert [(band.y0, band.y1) for band in bands] == [(0, 32), (32, 64), (64, 70)]
+    assert all((band.x0, band.x1) == (0, 100) for band in bands)
+    width, height, raw = read_png(file.getvalue())
+    assert (width, height) == (200, 140)
+    assert raw == (b"\x00" + bytes(200 * 4)) * 140
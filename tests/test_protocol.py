@@ -0,0 +1,110 @@
+import io
+
+import pytest
+
+from touchpad.protocol import (
+    MAGIC, PROTOCOL_VERSION, HEADER, MSG_TOUCH_UPDATE,
+    BinaryCodec, CommandDecoder, JsonCodec, ProtocolError, diff_slots, encode_command, get_codec,
+)
+
+
+TIME = {'kernel': 1_000_000, 'emit': 1_000_250}
+
+EVENTS = [
+    {"event": "device_info", "data": {"max_x": 1200, "max_y": 800, "detection_status": "ok"}},
+    {"event": "touch_update", "data": {0: {'id': 7, 'x': 10, 'y': 20}, 1: {'id': 8, 'x': -3, 'y': 4}}, "time": TIME},
+    {"event": "touch_delta", "data": {'down': {2: {'id': 9, 'x': 1, 'y': 2}}, 'move': {0: {'x': 11, 'y': 21}}, 'up': [1]}},
+    {"error": "evdev_reader_error", "message": "no touchpad"},
+    {"event": "shutdown", "reason": "reader_finished"},
+]
+
+
+def stream(codec, events) -> io.BytesIO:
+    return io.BytesIO(codec.preamble() + b"".join(codec.encode(event) for event in events))
+
+
+@pytest.mark.parametrize("name", ["json", "binary"])
+def test_round_trip(name):
+    codec = get_codec(name)
+    assert list(codec.iter_events(stream(codec, EVENTS))) == EVENTS
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("xml")
+
+
+def test_binary_long_error_message():
+    codec = BinaryCodec()
+    event = {"error": "evdev_reader_error", "message": "x" * 200_000}
+    assert list(codec.iter_events(stream(codec, [event]))) == [event]
+
+
+def test_binary_without_time():
+    codec = BinaryCodec()
+    event = {"event": "touch_update", "data": {0: {'id': 1, 'x': 5, 'y': 6}}}
+    [decoded] = codec.iter_events(stream(codec, [event]))
+    assert 'time' not in decoded
+
+
+def test_binary_empty_stream():
+    assert list(BinaryCodec().iter_events(io.BytesIO(b""))) == []
+
+
+def test_binary_garbage_reports_the_stream():
+    with pytest.raises(ProtocolError, match="Traceback"):
+        list(BinaryCodec().iter_events(io.BytesIO(b"Traceback (most recent call last):\n")))
+
+
+def test_binary_wrong_version():
+    with pytest.raises(ProtocolError, match="version"):
+        list(BinaryCodec().iter_events(io.BytesIO(MAGIC + bytes((PROTOCOL_VERSION + 1,)))))
+
+
+@pytest.mark.parametrize("cut", [1, HEADER.size + 3])
+def test_binary_truncated(cut):
+    data = stream(BinaryCodec(), EVENTS[1:2]).getvalue()
+    with pytest.raises(ProtocolError):
+        list(BinaryCodec().iter_events(io.BytesIO(data[:-cut])))
+
+
+def test_binary_malformed_touch_update():
+    codec = BinaryCodec()
+    data = codec.preamble() + HEADER.pack(MSG_TOUCH_UPDATE, 3) + b"abc"
+    with pytest.raises(ProtocolError, match="Malformed"):
+        list(codec.iter_events(io.BytesIO(data)))
+
+
+def test_binary_unknown_message_type():
+    codec = BinaryCodec()
+    data = codec.preamble() + HEADER.pack(0x7f, 0)
+    with pytest.raises(ProtocolError, match="Unknown message type"):
+        list(codec.iter_events(io.BytesIO(data)))
+
+
+def test_json_invalid_line():
+    with pytest.raises(ProtocolError, match="Invalid JSON"):
+        list(JsonCodec().iter_events(io.BytesIO(b"not json\n")))
+
+
+def test_diff_slots():
+    sent = {}
+    assert diff_slots({0: {'id': 1, 'x': 0, 'y': 0}}, sent, [0]) == {'down': {0: {'id': 1, 'x': 0, 'y': 0}}, 'move': {}, 'up': []}
+    assert diff_slots({0: {'id': 1, 'x': 0, 'y': 0}}, sent, [0]) is None
+    assert diff_slots({0: {'id': 1, 'x': 5, 'y': 0}}, sent, [0]) == {'down': {}, 'move': {0: {'x': 5, 'y': 0}}, 'up': []}
+    # a new tracking id in the same slot lifts the old contact first
+    assert diff_slots({0: {'id': 2, 'x': 5, 'y': 0}}, sent, [0]) == {'down': {0: {'id': 2, 'x': 5, 'y': 0}}, 'move': {}, 'up': [0]}
+    assert diff_slots({}, sent, [0]) == {'down': {}, 'move': {}, 'up': [0]}
+    assert sent == {}
+
+
+def test_command_decoder_splits_chunks():
+    decoder = CommandDecoder()
+    data = encode_command({"command": "set_smoothing", "config": None}) + encode_command({"command": "x"})
+    assert decoder.feed(data[:10]) == []
+    assert decoder.feed(data[10:]) == [{"command": "set_smoothing", "config": None}, {"command": "x"}]
+
+
+def test_command_decoder_invalid():
+    with pytest.raises(ProtocolError):
+        CommandDecoder().feed(b"{oops\n")
@@ -0,0 +1,61 @@
+import io
+from collections import namedtuple
+
+import pytest
+
+from touchpad.recording import EVENT, HEADER, MAGIC, RecordingWriter, read_recording
+
+InputEvent = namedtuple("InputEvent", "sec usec type code value")
+
+AXES = {0x35: (0, 0, 1200, 0, 0, 12), 0x36: (0, 0, 800, 0, 0, 12)}
+EVENTS = [
+    InputEvent(10, 500, 3, 0x35, 100),
+    InputEvent(10, 500, 3, 0x36, 200),
+    InputEvent(10, 500, 0, 0, 0),
+    InputEvent(10, 8_833, 3, 0x35, 110),
+    InputEvent(10, 8_833, 0, 0, 0),
+]
+
+
+def record(events=EVENTS, name="Synaptics TM3276") -> bytes:
+    file = io.BytesIO()
+    writer = RecordingWriter(file, name, AXES)
+    writer.write(events[:2])
+    writer.write(events[2:])
+    return file.getvalue()
+
+
+def test_round_trip():
+    recording = read_recording(io.BytesIO(record()))
+    assert recording.name == "Synaptics TM3276"
+    assert recording.axes == AXES
+    assert list(recording.events) == [(e.sec * 1_000_000 + e.usec, e.type, e.code, e.value) for e in EVENTS]
+
+
+def test_cut_short_recording_is_read_up_to_its_last_full_event():
+    data = record()
+    recording = read_recording(io.BytesIO(data[:-EVENT.size // 2]))
+    assert len(list(recording.events)) == len(EVENTS) - 1
+
+
+def test_recording_without_events():
+    recording = read_recording(io.BytesIO(record(events=[], name="")))
+    assert recording.name == ""
+    assert list(recording.events) == []
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"TP", "too short"),
+    (HEADER.pack(b"NOPE", 1, 0), "bad magic"),
+    (HEADER.pack(MAGIC, 99, 0), "version"),
+    (HEADER.pack(MAGIC, 1, 0), "Truncated"),
+])
+def test_invalid_recordings(data, message):
+    with pytest.raises(ValueError, match=message):
+        read_recording(io.BytesIO(data))
+
+
+def test_truncated_axes():
+    data = record()
+    with pytest.raises(ValueError, match="Truncated"):
+        read_recording(io.BytesIO(data[:HEADER.size + len("Synaptics TM3276") + 2 + 10]))
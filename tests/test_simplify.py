@@ -0,0 +1,49 @@
+import math
+from array import array
+
+from simplify import rdp_indices, simplify
+
+
+def interleave(points) -> array:
+    return array('f', [c for point in points for c in point])
+
+
+def test_short_strokes_are_kept():
+    assert rdp_indices(array('f'), 1) == []
+    assert rdp_indices(interleave([(0, 0), (5, 5)]), 1) == [0, 1]
+
+
+def test_collinear_points_are_dropped():
+    line = interleave([(x, 2 * x) for x in range(10)])
+    assert rdp_indices(line, 0.1) == [0, 9]
+
+
+def test_corners_within_tolerance_are_dropped():
+    points = [(0, 0), (5, 0.5), (10, 0), (10, 10)]
+    assert rdp_indices(interleave(points), 1) == [0, 2, 3]
+    assert rdp_indices(interleave(points), 0.1) == [0, 1, 2, 3]
+
+
+def test_turning_points_of_a_stroke_doubling_back_are_kept():
+    # first and last points coincide: every point is on the line through them
+    points = [(0, 0), (5, 0), (10, 0), (5, 0), (0, 0)]
+    assert rdp_indices(interleave(points), 1) == [0, 2, 4]
+
+
+def test_no_dropped_point_is_further_than_the_tolerance():
+    points = [(x, 10 * math.sin(x / 5)) for x in range(100)]
+    tolerance = 0.5
+    kept = rdp_indices(interleave(points), tolerance)
+    for a, b in zip(kept, kept[1:]):
+        (ax, ay), (bx, by) = points[a], points[b]
+        for px, py in points[a + 1:b]:
+            t = ((px - ax) * (bx - ax) + (py - ay) * (by - ay)) / ((bx - ax) ** 2 + (by - ay) ** 2)
+            t = max(0, min(1, t))
+            assert math.hypot(px - ax - t * (bx - ax), py - ay - t * (by - ay)) <= tolerance + 1e-6
+
+
+def test_simplify_keeps_the_matching_times():
+    points, times = simplify(interleave([(0, 0), (1, 0), (2, 0), (2, 5)]), 0.1, array('d', [0, 1, 2, 3]))
+    assert list(points.coords()) == [(0, 0), (2, 0), (2, 5)]
+    assert list(times) == [0, 2, 3]
+    assert simplify(interleave([(0, 0)]), 1)[1] is None
@@ -0,0 +1,120 @@
+import pytest
+
+pytest.importorskip("cairo")
+
+from vec2 import Vec2
+from rect import Rect
+from tiles import TILE_SIZE, TiledSurface
+from snapshots import SnapshotCache
+
+SIZE = Vec2(4 * TILE_SIZE, TILE_SIZE)
+TILE_BYTES = TILE_SIZE * TILE_SIZE * 4
+
+
+def draw_strokes(canvas: TiledSurface, first: int, last: int) -> None:
+    """Stroke `i` inks the `i % 4`-th tile."""
+    for i in range(first, last):
+        x = i % 4 * TILE_SIZE
+        canvas.draw(Rect(x, 0, x + TILE_SIZE, TILE_SIZE), lambda cr: cr.paint())
+
+
+def checkpoint(cache: SnapshotCache, count: int, max_strokes: int = 1000) -> bool:
+    cache.begin(count)
+    while True:
+        kept = cache.step(draw_strokes, max_strokes)
+        if not cache.rendering:
+            return kept
+
+
+def test_nearest():
+    cache = SnapshotCache(SIZE, interval=2)
+    assert cache.nearest(10) == (0, None)
+    checkpoint(cache, 2)
+    checkpoint(cache, 6)
+    assert cache.nearest(5)[0] == 2
+    assert cache.nearest(6)[0] == 6
+    assert cache.nearest(1) == (0, None)
+    assert cache.latest() == 6
+
+
+def test_render_resumes_a_few_strokes_at_a_time():
+    cache = SnapshotCache(SIZE, interval=2)
+    calls = []
+    cache.begin(7)
+    while cache.rendering:
+        cache.step(lambda canvas, first, last: calls.append((first, last)), 3)
+    assert calls == [(0, 3), (3, 6), (6, 7)]
+    assert cache.latest() == 7
+
+    # a new checkpoint starts from the nearest one
+    calls.clear()
+    cache.begin(9)
+    cache.step(lambda canvas, first, last: calls.append((first, last)), 3)
+    assert calls == [(7, 9)]
+
+
+def test_invalidated_render_is_dropped():
+    cache = SnapshotCache(SIZE, interval=2)
+    cache.begin(8)
+    cache.step(draw_strokes, 3)
+    cache.invalidate_from(8)
+    assert cache.rendering
+    cache.invalidate_from(5)
+    assert not cache.rendering
+    assert cache.latest() == 0
+
+
+def test_checkpoints_share_unchanged_tiles():
+    cache = SnapshotCache(SIZE, interval=2)
+    checkpoint(cache, 2)
+    assert cache.memory_used == 2 * TILE_BYTES
+    checkpoint(cache, 3)
+    assert cache.memory_used == 3 * TILE_BYTES
+
+
+def test_least_recently_used_checkpoints_are_evicted():
+    def repaint_first_tile(canvas, first, last):
+        # each checkpoint gets a copy of the tile of its own
+        draw_strokes(canvas, 0, 1)
+
+    cache = SnapshotCache(SIZE, interval=1, memory_budget=3 * TILE_BYTES)
+    for count in (1, 2, 3):
+        cache.begin(count)
+        assert cache.step(repaint_first_tile, 10)
+    assert cache.nearest(1)[0] == 1
+    cache.begin(4)  # from 3, which is used again
+    assert cache.step(repaint_first_tile, 10)
+    assert cache.nearest(2)[0] == 1
+    assert cache.nearest(3)[0] == 3
+    assert cache.memory_used == 3 * TILE_BYTES
+
+
+def test_a_checkpoint_over_the_budget_stops_further_ones():
+    cache = SnapshotCache(SIZE, interval=2, memory_budget=TILE_BYTES)
+    assert cache.next_checkpoint(4) == 4
+    assert not checkpoint(cache, 4)
+    assert cache.next_checkpoint(4) is None
+    assert cache.next_checkpoint(40) is None
+    # strokes after it changing don't help
+    cache.invalidate_from(4)
+    assert cache.next_checkpoint(40) is None
+    cache.invalidate_from(3)
+    assert cache.next_checkpoint(40) == 40
+
+
+def test_base_layer():
+    cache = SnapshotCache(SIZE, interval=2)
+    checkpoint(cache, 2)
+    checkpoint(cache, 4)
+    checkpoint(cache, 6)
+    cache.begin(4, base=True)
+    assert cache.step(draw_strokes, 10)
+    assert cache.base[0] == 4
+    assert cache.nearest(5)[0] == 4
+    assert cache.nearest(6)[0] == 6
+    assert cache.nearest(3) == (0, None)
+    # the base layer is never evicted, only invalidated
+    cache.invalidate_from(4)
+    assert cache.base is not None
+    cache.invalidate_from(3)
+    assert cache.base is None
@@ -0,0 +1,64 @@
+from vec2 import Vec2
+from rect import Rect
+from points import PointBuffer
+from spatial_index import SegmentGrid
+
+
+class FakeStroke:
+    """The part of `drawing.Stroke` the grid reads."""
+
+    def __init__(self, *points) -> None:
+        self.points = PointBuffer(Vec2(x, y) for x, y in points)
+
+
+def test_query_finds_committed_strokes_near_a_segment():
+    grid = SegmentGrid(cell_size=10)
+    horizontal = FakeStroke((0, 0), (100, 0))
+    vertical = FakeStroke((50, 20), (50, 80))
+    grid.add(horizontal, committed=True)
+    grid.add(vertical, committed=True)
+
+    assert grid.query(Vec2(70, 3), 4) == {horizontal}
+    assert grid.query(Vec2(52, 50), 4) == {vertical}
+    assert grid.query(Vec2(50, 10), 10) == {horizontal, vertical}
+    assert grid.query(Vec2(70, 40), 4) == set()
+
+
+def test_strokes_in_progress_are_not_returned_until_committed():
+    grid = SegmentGrid(cell_size=10)
+    stroke = FakeStroke((0, 0))
+    grid.add(stroke)
+    stroke.points.append(30, 0)
+    grid.extend(stroke)
+    assert grid.query(Vec2(15, 0), 1) == set()
+
+    stroke.points.append(30, 30)
+    grid.commit(stroke)
+    assert grid.query(Vec2(30, 15), 1) == {stroke}
+
+
+def test_remove_and_clear():
+    grid = SegmentGrid(cell_size=10)
+    a, b = FakeStroke((0, 0), (20, 0)), FakeStroke((0, 5), (20, 5))
+    grid.add(a, committed=True)
+    grid.add(b, committed=True)
+    grid.remove(a)
+    assert a not in grid
+    assert grid.query(Vec2(10, 2), 3) == {b}
+    grid.clear()
+    assert len(grid) == 0
+    assert grid.query(Vec2(10, 2), 3) == set()
+
+
+def test_deferred_strokes_are_indexed_when_a_query_comes_near():
+    grid = SegmentGrid(cell_size=10)
+    near, far = FakeStroke((0, 0), (20, 0)), FakeStroke((200, 200), (220, 200))
+    grid.defer(near, Rect(0, 0, 20, 0))
+    grid.defer(far, Rect(200, 200, 220, 200))
+    assert len(grid) == 2
+
+    assert grid.query(Vec2(10, 1), 2) == {near}
+
+    grid.remove(far)
+    assert far not in grid
+    assert grid.query(Vec2(210, 200), 2) == set()